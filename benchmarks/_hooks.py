@@ -0,0 +1,143 @@
+"""
+Instrumentation for benchmarked `cloudie` processes.
+
+This module is imported by the child processes spawned by
+`benchmarks.startup`.  It wraps the functions that make up the
+different phases of a `cloudie` invocation and writes the accumulated
+time for each phase as JSON to the file named by `$CLOUDIE_BENCH_PHASES`
+when the process exits.
+
+It is kept free of heavy imports so that it doesn't skew the import
+time measurements.
+"""
+
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+from typing import Any, Callable
+
+PHASES = {}  # type: dict
+
+# Modules from `cloudie` whose phases have been wrapped.
+WRAPPED = set()  # type: set
+
+LIST_METHODS = [
+    "list_images",
+    "list_key_pairs",
+    "list_locations",
+    "list_nodes",
+    "list_sizes",
+]
+
+
+def install() -> None:
+    """
+    Wrap each phase of `cloudie` with a timer.
+
+    Only `cloudie.group` (which merely imports `click`) is imported
+    here.  The other modules are wrapped once they've been imported by
+    the entry point, when a command is looked up, so that the import
+    order of the entry point is kept.
+    """
+    start = time.perf_counter()
+
+    from cloudie import group
+
+    get_command = group.Group.get_command
+
+    @functools.wraps(get_command)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        command = get_command(*args, **kwargs)
+        _wrap_loaded()
+        return command
+
+    group.Group.get_command = wrapper  # type: ignore
+
+    def dump() -> None:
+        PHASES["total"] = time.perf_counter() - start
+        path = os.environ.get("CLOUDIE_BENCH_PHASES")
+        if path:
+            with open(path, "w") as f:
+                json.dump(PHASES, f)
+
+    atexit.register(dump)
+
+
+def _wrap_loaded() -> None:
+    """
+    Wrap the phases of the `cloudie` modules that have been imported.
+    """
+    config = sys.modules.get("cloudie.config")
+    if config and config.__name__ not in WRAPPED:
+        WRAPPED.add(config.__name__)
+        config.load = _timed("config", config.load)  # type: ignore
+
+    table = sys.modules.get("cloudie.table")
+    if table and table.__name__ not in WRAPPED:
+        WRAPPED.add(table.__name__)
+        table.show = _timed("render", table.show)  # type: ignore
+
+    option = sys.modules.get("cloudie.option")
+    if option and option.__name__ not in WRAPPED:
+        WRAPPED.add(option.__name__)
+        option._driver = _timed_driver(option._driver)  # type: ignore
+
+
+def _timed(phase: str, func: Callable) -> Callable:
+    """
+    Accumulate the time spent in `func` to `phase`.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            PHASES[phase] = PHASES.get(phase, 0.0) + elapsed
+
+    return wrapper
+
+
+def _timed_driver(func: Callable) -> Callable:
+    """
+    Time driver construction and wrap the API calls of each driver.
+
+    Every driver is instantiated by `option._driver()`, whether it's
+    passed with `pass_driver` or `pass_drivers`.  The dummy drivers from
+    `tests.helpers` are registered as part of the driver phase, since
+    that is where `libcloud` is imported in a regular invocation.
+    """
+
+    def register() -> None:
+        from libcloud.compute.providers import get_driver, set_driver
+
+        try:
+            get_driver("dummy-extended")
+        except AttributeError:
+            set_driver(
+                "dummy-extended",
+                "tests.helpers",
+                "ExtendedDummyNodeDriver",
+            )
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        register()
+        driver = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        PHASES["driver"] = PHASES.get("driver", 0.0) + elapsed
+
+        # Drivers are cached, so they may already be wrapped.
+        for name in LIST_METHODS:
+            method = getattr(driver, name, None)
+            if method and not hasattr(method, "__wrapped__"):
+                setattr(driver, name, _timed("api", method))
+        return driver
+
+    return wrapper
@@ -0,0 +1,310 @@
+"""
+Startup benchmarks for `cloudie`.
+
+Every scenario is run in a fresh interpreter, both through the console
+script entry point (`cloudie.cli:cli`) and through `python -m cloudie`.
+
+- A cold run uses an empty bytecode cache, so that every module is
+  compiled from source (Python 3.8+, see `PYTHONPYCACHEPREFIX`).
+- Warm runs share a bytecode cache that has been populated by a
+  discarded run.
+
+For each run, the wall time, the time spent in each phase of the
+invocation (see `benchmarks._hooks`) and the import time of each module
+(from `-X importtime`) is recorded.  The results are written as JSON and
+may be compared against a previously saved baseline.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRIES = {
+    "cli": "from cloudie.cli import cli\ncli()",
+    "main": "import runpy\nrunpy.run_module('cloudie', run_name='__main__')",
+}
+
+# A default role is required for `--help` on commands that use
+# `option.pass_driver` with click 7.0, since it processes the eager
+# `--role` option before `--help`.
+CONFIG = """
+[role]
+default = "dummy"
+
+[role.dummy]
+provider = "dummy-extended"
+key = "abcd"
+"""
+
+
+@click.group()
+def cli() -> None:
+    pass
+
+
+@cli.command()
+@click.option("--repeat", default=10, help="Number of warm runs.")
+@click.option("--output", type=click.File("w"), help="Save results here.")
+@click.option("--baseline", type=click.File("r"), help="Compare to this.")
+@click.option(
+    "--tolerance",
+    default=0.2,
+    help="Allowed relative slowdown compared to the baseline.",
+)
+@click.option("--top", default=15, help="Number of packages to show.")
+@click.option("--match", default="", help="Only run matching scenarios.")
+def run(
+        repeat: int,
+        output: Optional[Any],
+        baseline: Optional[Any],
+        tolerance: float,
+        top: int,
+        match: str,
+) -> None:
+    """
+    Run the startup benchmarks.
+    """
+    from cloudie import table
+
+    with tempfile.NamedTemporaryFile("w", suffix=".toml") as config:
+        config.write(CONFIG)
+        config.flush()
+
+        results = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "scenarios": {
+                name: _bench(entry, args, config.name, repeat)
+                for name, entry, args in _scenarios()
+                if match in name
+            },
+        }  # type: Dict[str, Any]
+
+    rows = [
+        dict(scenario=k, **_summary(v))
+        for k, v in results["scenarios"].items()
+    ]  # type: List[object]
+    table.show([
+        ["Scenario", "scenario"],
+        ["Cold (ms)", "cold"],
+        ["Warm (ms)", "warm"],
+        ["Config", "config"],
+        ["Driver", "driver"],
+        ["API", "api"],
+        ["Render", "render"],
+    ], rows)
+
+    name, scenario = next(iter(results["scenarios"].items()))
+    packages = scenario["warm"]["packages"]
+    table.show([
+        ["Package ({})".format(name), "name"],
+        ["Self (ms)", "ms"],
+    ], [
+        dict(name=k, ms=_ms(v))
+        for k, v in sorted(packages.items(), key=lambda kv: -kv[1])[:top]
+    ])
+
+    if output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+    if baseline:
+        regressions = _compare(json.load(baseline), results, tolerance)
+        if regressions:
+            raise click.ClickException(
+                "regression in {}".format(", ".join(regressions))
+            )
+
+
+def _scenarios() -> List[Tuple[str, str, List[str]]]:
+    """
+    Return a list of (name, entry, arguments) to benchmark.
+    """
+    from cloudie import compute
+
+    names = sorted(compute.compute.commands)
+    commands = [["--help"], ["compute", "--help"]]
+    commands += [["compute", name, "--help"] for name in names]
+
+    scenarios = []
+    for entry in sorted(ENTRIES):
+        for args in commands:
+            name = " ".join([entry] + args)
+            scenarios.append((name, entry, args))
+
+    args = ["compute", "list-nodes", "--role", "dummy"]
+    scenarios.append((" ".join(["cli"] + args), "cli", args))
+
+    return scenarios
+
+
+def _bench(entry: str, args: List[str], config: str, repeat: int) -> Dict:
+    """
+    Benchmark a single scenario.
+    """
+    with tempfile.TemporaryDirectory() as cold:
+        cold_run = _run(entry, args, config, cold)
+
+    with tempfile.TemporaryDirectory() as warm:
+        _run(entry, args, config, warm)
+        warm_runs = [_run(entry, args, config, warm) for _ in range(repeat)]
+
+    return {
+        "entry": entry,
+        "args": args,
+        "cold": cold_run,
+        "warm": {
+            "wall": {
+                "min": min(r["wall"] for r in warm_runs),
+                "median": statistics.median(r["wall"] for r in warm_runs),
+                "max": max(r["wall"] for r in warm_runs),
+            },
+            "phases": _median(r["phases"] for r in warm_runs),
+            "modules": _median(r["modules"] for r in warm_runs),
+            "packages": _median(r["packages"] for r in warm_runs),
+        },
+    }
+
+
+def _run(entry: str, args: List[str], config: str, pycache: str) -> Dict:
+    """
+    Run `cloudie` once in a new interpreter.
+    """
+    with tempfile.NamedTemporaryFile("r") as phases:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = ROOT
+        env["PYTHONPYCACHEPREFIX"] = pycache
+        env["CLOUDIE_BENCH_PHASES"] = phases.name
+
+        code = "from benchmarks import _hooks\n_hooks.install()\n{}".format(
+            ENTRIES[entry]
+        )
+        cmd = [sys.executable, "-X", "importtime", "-c", code]
+        cmd += ["--config-file", config] + args
+
+        start = time.perf_counter()
+        proc = subprocess.run(
+            cmd,
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        wall = time.perf_counter() - start
+
+        if proc.returncode != 0:
+            raise click.ClickException(
+                "{} failed:\n{}".format(" ".join(args), proc.stderr.decode())
+            )
+
+        modules = _parse_importtime(proc.stderr.decode())
+        cumulative = {k: v[1] for k, v in modules.items()}
+        return {
+            "wall": wall,
+            "phases": json.loads(phases.read() or "{}"),
+            "modules": cumulative,
+            "packages": _packages(modules),
+        }
+
+
+def _parse_importtime(data: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse the output from `-X importtime`.
+
+    :returns: A dictionary with (self, cumulative) time in seconds for
+        each imported module.
+    """
+    modules = {}
+    for line in data.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            self_us, cumulative_us, name = line[12:].split("|")
+            modules[name.strip()] = (
+                int(self_us) / 1000000,
+                int(cumulative_us) / 1000000,
+            )
+        except ValueError:
+            continue  # header
+    return modules
+
+
+def _packages(modules: Dict[str, Tuple[float, float]]) -> Dict[str, float]:
+    """
+    Sum the self time of each module by top-level package.
+    """
+    packages = {}  # type: Dict[str, float]
+    for name, (self_time, _cumulative) in modules.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_time
+    return packages
+
+
+def _median(values: Any) -> Dict[str, float]:
+    """
+    Calculate the median for each key in an iterable of dictionaries.
+    """
+    values = list(values)
+    keys = {k for v in values for k in v}
+    return {
+        k: statistics.median(v.get(k, 0.0) for v in values)
+        for k in sorted(keys)
+    }
+
+
+def _summary(scenario: Dict) -> Dict[str, str]:
+    phases = scenario["warm"]["phases"]
+    return {
+        "cold": _ms(scenario["cold"]["wall"]),
+        "warm": _ms(scenario["warm"]["wall"]["median"]),
+        "config": _ms(phases.get("config")),
+        "driver": _ms(phases.get("driver")),
+        "api": _ms(phases.get("api")),
+        "render": _ms(phases.get("render")),
+    }
+
+
+def _compare(baseline: Dict, results: Dict, tolerance: float) -> List[str]:
+    """
+    Return the scenarios that are slower than `baseline`.
+    """
+    regressions = []
+    for name, scenario in sorted(results["scenarios"].items()):
+        try:
+            before = baseline["scenarios"][name]["warm"]["wall"]["median"]
+        except KeyError:
+            continue
+
+        after = scenario["warm"]["wall"]["median"]
+        ratio = after / before
+        status = "ok"
+        if ratio > 1 + tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+
+        click.echo(
+            "{}: {} -> {} ms ({:+.1f}%) {}".format(
+                name, _ms(before), _ms(after), (ratio - 1) * 100, status
+            )
+        )
+    return regressions
+
+
+def _ms(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return ""
+    return "{:.1f}".format(seconds * 1000)
+
+
+if __name__ == "__main__":
+    cli()  # pylint: disable=no-value-for-parameter
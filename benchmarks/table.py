@@ -0,0 +1,220 @@
+"""
+Table benchmarks for `cloudie`.
+
+Rows are synthetic `NodeImage` objects, copied from the images of the
+dummy driver in `libcloud`, and each of them is wrapped the same way
+as in the `list-*` commands (see `compute._Row`).
+
+The "values" scenarios retrieve the values of every row, and the
+"render" scenarios draw the whole table, either with `texttable` (as
+`table.show()` used to) or with the layout engine in `table`.  Each
+scenario is run `--repeat` times and the fastest run is reported as the
+cost per row.
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import click
+
+# The columns of `list-images`, with the role column added by
+# `compute._show_all()` and a couple of nested names with fallbacks.
+COLUMNS = [
+    ["Role", "role"],
+    ["ID", "id"],
+    ["Name", "name"],
+    ["Distribution", "extra.distribution", "extra.os"],
+    ["Public", "extra.public"],
+    ["Description", "extra.description"],
+]
+
+# A scenario retrieves the values of the rows or draws them.
+Scenario = Callable[[List[object]], None]
+
+
+@click.group()
+def cli() -> None:
+    pass
+
+
+@cli.command()
+@click.option("--rows", default=50000, help="Number of images.")
+@click.option("--repeat", default=5, help="Number of runs.")
+@click.option("--columns", default=80, help="Width of the terminal.")
+@click.option("--output", type=click.File("w"), help="Save results here.")
+def run(rows: int, repeat: int, columns: int, output: Optional[Any]) -> None:
+    """
+    Run the table benchmarks.
+    """
+    from cloudie import table
+
+    # See `shutil.get_terminal_size()`.
+    os.environ["COLUMNS"] = str(columns)
+
+    images = _images(rows)
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rows": rows,
+        "repeat": repeat,
+        "columns": columns,
+        "scenarios": {
+            name: _bench(func, images, repeat)
+            for name, func in sorted(_scenarios().items())
+        },
+    }  # type: Dict[str, Any]
+
+    table.show([
+        ["Scenario", "scenario"],
+        ["Total (ms)", "total"],
+        ["Per row (us)", "row"],
+    ], [
+        dict(
+            scenario=k,
+            total="{:.1f}".format(v * 1000),
+            row="{:.2f}".format(v / rows * 1000000),
+        ) for k, v in results["scenarios"].items()
+    ])
+
+    if output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+
+def _images(count: int) -> List[object]:
+    """
+    Create `count` rows from the images of the dummy driver.
+    """
+    # pylint: disable=protected-access
+    from libcloud.compute.base import NodeImage
+    from libcloud.compute.drivers.dummy import DummyNodeDriver
+
+    from cloudie import compute
+
+    driver = DummyNodeDriver(0)
+    templates = driver.list_images()
+
+    rows = []  # type: List[object]
+    for i in range(count):
+        template = templates[i % len(templates)]
+        description = "{} image {} for the dummy driver".format(
+            template.name, i
+        )
+        extra = {
+            "public": bool(i % 2),
+            "description": description,
+        }  # type: Dict[str, Any]
+        if i % 3:
+            extra["distribution"] = template.name.split()[0]
+        image = NodeImage(str(i), template.name, driver, extra)
+        rows.append(compute._Row(image, role="dummy"))
+    return rows
+
+
+def _scenarios() -> Dict[str, Scenario]:
+    """
+    Return the implementations to benchmark by name.
+    """
+    # pylint: disable=protected-access
+    from cloudie import table
+
+    def get_value(rows: List[object]) -> None:
+        # The implementation of `table._values()` prior to `_compile()`.
+        for row in rows:
+            for column in COLUMNS:
+                found = (_get_value(row, name) for name in column[1:])
+                next((v for v in found if v), None)
+
+    def compiled(rows: List[object]) -> None:
+        values = table._compile(COLUMNS)
+        for row in rows:
+            values(row)
+
+    def cells(rows: List[object]) -> None:
+        values = table._compile(COLUMNS)
+        for row in rows:
+            table._cells(values(row))
+
+    def texttable(rows: List[object]) -> None:
+        import texttable as tt
+
+        size = shutil.get_terminal_size()
+        t = tt.Texttable(max_width=size.columns)
+        t.set_deco(t.VLINES | t.HEADER)
+        t.header([column[0] for column in COLUMNS])
+        t.set_cols_dtype(["t" for _ in range(len(COLUMNS))])
+        values = table._compile(COLUMNS)
+        t.add_rows([table._cells(values(row)) for row in rows], False)
+        print(t.draw())
+
+    def layout(rows: List[object]) -> None:
+        table.show(COLUMNS, rows)
+
+    def truncate(rows: List[object]) -> None:
+        table.TRUNCATE = True
+        try:
+            table.show(COLUMNS, rows)
+        finally:
+            table.TRUNCATE = False
+
+    return {
+        "values:get_value": get_value,
+        "values:compiled": compiled,
+        "values:cells": cells,
+        "render:texttable": _quiet(texttable),
+        "render:layout": _quiet(layout),
+        "render:truncate": _quiet(truncate),
+    }
+
+
+def _get_value(obj: object, name: str, default: Any = None) -> Any:
+    """
+    Recursively retrieve a value from an object.
+
+    This is how `table` used to retrieve each value, and it's only kept
+    here as a baseline for `table._compile()`.
+    """
+    for elem in name.split("."):
+        if isinstance(obj, dict):
+            obj = obj.get(elem, default)
+        else:
+            obj = getattr(obj, elem, default)
+
+    return obj or default
+
+
+def _quiet(func: Scenario) -> Scenario:
+    """
+    Discard the output of `func`.
+    """
+
+    def wrapper(rows: List[object]) -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(rows)
+
+    return wrapper
+
+
+def _bench(
+        func: Scenario,
+        rows: List[object],
+        repeat: int,
+) -> float:
+    """
+    Return the fastest of `repeat` runs of `func` in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(rows)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    cli()  # pylint: disable=no-value-for-parameter
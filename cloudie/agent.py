@@ -0,0 +1,146 @@
+import contextlib
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import struct
+import time
+from typing import Any, cast
+
+import click
+
+from . import config
+
+
+class Agent(socketserver.UnixStreamServer):
+    """
+    Hold the output of command substitutions in memory.
+
+    Clients (see `config.ConfigAgent`) send a single JSON request per
+    connection and receive a single JSON response.  Entries are grouped
+    by configuration file, and every entry for a file is dropped once a
+    request is made with a different SHA256 message digest for it.
+
+    Only connections from the current user are accepted.  The agent
+    stops serving after `timeout` seconds without requests.
+    """
+
+    def __init__(self, path: str, timeout: float) -> None:
+        # The socket is created with permissions based on the umask.
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(umask)
+
+        self.timeout = timeout
+        self.expired = False
+        self._configs = {}  # type: dict
+
+    def serve(self) -> None:
+        """
+        Handle requests until the agent times out.
+        """
+        while not self.expired:
+            self.handle_request()
+
+    def handle_timeout(self) -> None:
+        self.expired = True
+
+    def verify_request(self, request: Any, client_address: Any) -> bool:
+        if not hasattr(socket, "SO_PEERCRED"):  # pragma: no cover
+            return True
+
+        size = struct.calcsize("3i")
+        creds = request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, size)
+        _pid, uid, _gid = struct.unpack("3i", creds)
+        return bool(uid == os.getuid())
+
+    def process(self, request: dict) -> dict:
+        """
+        Process a request and return the response.
+        """
+        digest, entries = self._configs.get(request["config"], (None, {}))
+        if digest != request["digest"]:
+            entries = {}
+            self._configs[request["config"]] = (request["digest"], entries)
+
+        now = time.monotonic()
+        name = request["name"]
+        if request["op"] == "get":
+            expiry, output = entries.get(name, (now, None))
+            if expiry is None or expiry > now:
+                return {"output": output}
+            entries.pop(name, None)
+            return {"output": None}
+
+        if request["op"] == "put":
+            ttl = request["ttl"]
+            expiry = now + ttl if ttl else None
+            entries[name] = (expiry, str(request["output"]))
+            return {}
+
+        raise ValueError("invalid operation")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # Requests are handled one at a time, so a client that stalls must
+    # not block the agent.
+    timeout = 5
+
+    def handle(self) -> None:
+        agent = cast(Agent, self.server)
+        try:
+            request = json.loads(self.rfile.readline().decode())
+            response = agent.process(request)
+        except OSError:
+            return
+        except (ValueError, KeyError, TypeError):
+            response = {"error": "invalid request"}
+
+        # The client may have given up already.
+        with contextlib.suppress(OSError):
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+@click.command()
+@click.option(
+    "--timeout",
+    default=3600,
+    type=click.IntRange(min=1),
+    help="Exit after this many seconds without requests.",
+)
+def agent(timeout: int) -> None:
+    """
+    Hold the output of config commands in memory.
+
+    Commands in the configuration are executed by `cloudie` as usual,
+    but their output is kept by the agent and reused by later
+    invocations until the agent exits or the configuration changes.
+    """
+    path = config.ConfigAgent.path()
+    if path.is_socket():
+        if _running(path):
+            raise click.ClickException("agent is already running")
+        path.unlink()
+
+    server = Agent(str(path), timeout)
+    try:
+        server.serve()
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            path.unlink()
+
+
+def _running(path: pathlib.Path) -> bool:
+    """
+    Check if an agent is listening on `path`.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,231 @@
+import contextlib
+import hashlib
+import marshal
+import pathlib
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, List, Mapping, Optional
+
+import click
+
+from . import config, paging, utils
+
+if TYPE_CHECKING:  # pragma: no cover
+    from libcloud.common.base import BaseDriver
+
+# Catalogs that are cached, by the name of the driver method.
+CATALOGS = ("list_images", "list_locations", "list_sizes")
+
+# Default number of seconds that a catalog is fresh.
+TTL = 24 * 60 * 60
+
+# Attributes of a driver that identify the account it's used with,
+# along with the host of its connection.
+CREDENTIALS = ("key", "secret", "region", "api_version")
+
+# Attributes that are serialized for each class in `libcloud`.  Any
+# other class (e.g. a driver-specific subclass) prevents a catalog from
+# being cached.
+FIELDS = {
+    "NodeImage": ("id", "name"),
+    "NodeLocation": ("id", "name", "country"),
+    "NodeSize": ("id", "name", "ram", "disk", "bandwidth", "price"),
+}
+
+
+class CatalogCache:
+    """
+    On-disk cache for the catalogs of a role.
+
+    Catalogs are cached for `ttl` seconds.  Once a catalog is stale it
+    is still returned for another `ttl` seconds, but it's fetched again
+    in a background thread (with a separate connection) to be up to date
+    for the next lookup.  The thread doesn't delay the exit of the
+    interpreter, so a refresh is abandoned if the command finishes
+    first; a catalog that is older than twice `ttl` is fetched before
+    it's returned instead.  Failed refreshes are reported on stderr.
+
+    With `refresh`, catalogs are always fetched and the cache is
+    updated.  With `enabled=False` the cache is neither used nor
+    updated.
+
+    Catalogs are stored per driver class and credentials; a cached
+    catalog is ignored if the provider or the account of the role is
+    changed, since catalogs may include private images.
+    """
+
+    # Bump this if the format of the entries is changed.
+    VERSION = (2, sys.hexversion)
+
+    def __init__(
+            self,
+            role: str,
+            ttl: float = TTL,
+            refresh: bool = False,
+            enabled: bool = True,
+    ) -> None:
+        self.role = role
+        self.ttl = ttl
+        self.refresh = refresh
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._threads = []  # type: List[threading.Thread]
+
+    def get(self, driver: "BaseDriver", name: str) -> List[Any]:
+        """
+        Retrieve the catalog `name` (e.g. "list_images") from `driver`.
+        """
+        if not self.enabled or name not in CATALOGS:
+            return list(paging.iterate(getattr(driver, name)))
+
+        entry = None if self.refresh else self._entry(driver, name)
+        if entry is None:
+            return self._fetch(driver, name)
+
+        _owner, timestamp, rows = entry
+        age = time.time() - timestamp
+        if age >= 2 * self.ttl:
+            return self._fetch(driver, name)
+        if age >= self.ttl:
+            thread = threading.Thread(
+                target=self._refresh,
+                args=(utils.copy_driver(driver), name),
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        return [_decode(driver, row) for row in rows]
+
+    def cached(self, driver: "BaseDriver", name: str) -> bool:
+        """
+        Check if the catalog `name` for `driver` would be read from the
+        cache.
+        """
+        if not self.enabled or self.refresh or name not in CATALOGS:
+            return False
+        entry = self._entry(driver, name)
+        return entry is not None and time.time() - entry[1] < 2 * self.ttl
+
+    def _refresh(self, driver: "BaseDriver", name: str) -> None:
+        try:
+            self._fetch(driver, name)
+        except Exception as e:  # pylint: disable=broad-except
+            msg = "Warning: failed to refresh {} for '{}': {}"
+            error = str(e) or type(e).__name__
+            click.echo(msg.format(name, self.role, error), err=True)
+
+    def _fetch(self, driver: "BaseDriver", name: str) -> List[Any]:
+        rows = list(paging.iterate(getattr(driver, name)))
+        try:
+            entry = (
+                _owner(driver), time.time(), [_encode(row) for row in rows]
+            )
+        except KeyError:
+            return rows
+
+        with self._lock:
+            entries = self._load()
+            entries[name] = entry
+            with contextlib.suppress(OSError, ValueError):
+                data = marshal.dumps((self.VERSION, entries))
+                utils.write_atomic(self._path(), data)
+        return rows
+
+    def _entry(self, driver: "BaseDriver", name: str) -> Optional[tuple]:
+        entry = self._load().get(name)
+        if entry is None or entry[0] != _owner(driver):
+            return None
+        return tuple(entry)
+
+    def _load(self) -> dict:
+        with contextlib.suppress(OSError, EOFError, ValueError, TypeError):
+            version, entries = marshal.loads(self._path().read_bytes())
+            if version == self.VERSION:
+                return dict(entries)
+        return {}
+
+    def _path(self) -> pathlib.Path:
+        digest = hashlib.sha256(self.role.encode()).hexdigest()
+        return utils.cache_dir().joinpath("catalog-{}".format(digest[:32]))
+
+
+def options(func: Callable) -> Callable:
+    """
+    Add `--refresh` and `--no-cache` to a command.
+    """
+    func = click.option(
+        "--no-cache",
+        is_flag=True,
+        help="Neither use nor update cached catalogs.",
+    )(func)
+    func = click.option(
+        "--refresh",
+        is_flag=True,
+        help="Fetch catalogs and update the cache.",
+    )(func)
+    return func
+
+
+def cache(
+        conf: Mapping,
+        role: str,
+        refresh: bool = False,
+        no_cache: bool = False,
+) -> CatalogCache:
+    """
+    Create the catalog cache for `role` in the configuration `conf`.
+
+    The TTL is read from `catalog-ttl` for the role.
+    """
+    try:
+        ttl = conf.get("role", {}).get(role, {}).get("catalog-ttl", TTL)
+        ttl = float(config.resolve(ttl))
+    except config.ConfigError as e:
+        raise click.ClickException(str(e))
+    except (AttributeError, TypeError, ValueError):
+        raise click.ClickException("invalid catalog-ttl for '{}'".format(role))
+    return CatalogCache(role, ttl, refresh, not no_cache)
+
+
+def _owner(driver: "BaseDriver") -> tuple:
+    """
+    Identify the provider and account of `driver`.
+
+    The credentials are hashed, as in `option._driver()`.
+    """
+    cls = type(driver)
+    creds = [getattr(driver, name, None) for name in CREDENTIALS]
+    creds.append(getattr(driver.connection, "host", None))
+    return (
+        "{}:{}".format(cls.__module__, cls.__qualname__),
+        hashlib.sha256(repr(creds).encode()).hexdigest(),
+    )
+
+
+def _encode(obj: object) -> tuple:
+    """
+    Serialize an image, location or size.
+
+    A KeyError is raised for other objects.
+    """
+    cls = type(obj)
+    if cls.__module__ != "libcloud.compute.base":
+        raise KeyError(cls.__name__)
+
+    fields = FIELDS[cls.__name__]
+    extra = getattr(obj, "extra", None)
+    return (cls.__name__, tuple(getattr(obj, f) for f in fields), extra)
+
+
+def _decode(driver: "BaseDriver", row: tuple) -> Any:
+    """
+    Deserialize an image, location or size for `driver`.
+    """
+    from libcloud.compute import base
+
+    name, values, extra = row
+    obj = getattr(base, name)(driver=driver, **dict(zip(FIELDS[name], values)))
+    if extra is not None:
+        obj.extra = extra
+    return obj
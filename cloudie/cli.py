@@ -1,21 +1,81 @@
+from typing import Optional
+
 import click
 import munch
 
-from . import compute, config, group, security
-
-assert security  # to make pyflakes happy
+from . import config, group, paging, table
 
 
-@click.group(cls=group.Group)
-@click.option("--config-file", default="~/.cloudie.toml", type=str)
+@click.group(
+    cls=group.Group,
+    lazy_commands={
+        "agent": "cloudie.agent:agent",
+        "compute": "cloudie.compute:compute",
+        "providers": "cloudie.providers:providers",
+    },
+)
+@click.option("--config-file", default=config.USER_CONFIG, type=str)
+@click.option(
+    "--config-jobs",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Number of config commands to execute concurrently.",
+)
+@click.option(
+    "--config-timeout",
+    type=float,
+    help="Timeout in seconds for each config command.",
+)
+@click.option(
+    "--page-jobs",
+    default=paging.JOBS,
+    type=click.IntRange(min=1),
+    help="Number of pages to retrieve concurrently from providers.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Show rows as they're retrieved, with column widths based on "
+    "the first {} rows.".format(table.SAMPLE),
+)
+@click.option(
+    "--truncate",
+    is_flag=True,
+    help="Cut values that are wider than their column instead of "
+    "wrapping them.",
+)
+@click.option(
+    "--output",
+    default=table.FORMAT,
+    type=click.Choice(table.FORMATS),
+    help="Format of listings.",
+)
 @click.pass_context
-def cli(ctx: click.Context, config_file: str) -> None:
-    ctx.obj = munch.Munch()
+def cli(
+        ctx: click.Context,
+        config_file: str,
+        config_jobs: int,
+        config_timeout: Optional[float],
+        page_jobs: int,
+        stream: bool,
+        truncate: bool,
+        output: str,
+) -> None:
+    ctx.obj = munch.Munch(config_jobs=config_jobs)
+    paging.JOBS = page_jobs
+    table.STREAM = stream
+    table.TRUNCATE = truncate
+    table.FORMAT = output
 
+    # Commands in the configuration are executed once they're used.
+    # This avoids executing commands for other roles than the one in
+    # use (see `option.pass_driver`).
     try:
-        ctx.obj.config = config.load(config_file, munch.Munch)
+        ctx.obj.config = config.load(
+            config.layers(config_file),
+            munch.Munch,
+            timeout=config_timeout,
+            lazy=True,
+        )
     except config.ConfigError as e:
         raise click.ClickException(str(e))
-
-
-cli.add_command(compute.compute)
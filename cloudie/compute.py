@@ -1,18 +1,26 @@
-from . import security  # isort:skip, pylint:disable=C0411,I0021
-
 import base64
-import inspect
-from typing import Any, Callable
+import concurrent.futures
+import fnmatch
+import io
+import os
+import threading
+from typing import (
+    IO, TYPE_CHECKING, Any, Callable, Iterable, List, Optional, Tuple, cast
+)
 
 import click
-from libcloud.common.base import BaseDriver
-from libcloud.compute.base import NodeAuthPassword, NodeAuthSSHKey
-from libcloud.compute.providers import Provider
 from munch import DefaultMunch, Munch
 
-from . import option, table, utils
+from . import catalog, config, option, paging, providers, table, utils, waiter
+
+# `libcloud` is slow to import, so it is only imported for real once a
+# command instantiates a driver (see `option.pass_driver`).
+if TYPE_CHECKING:  # pragma: no cover
+    from libcloud.common.base import BaseDriver
 
-assert security  # to make pyflakes happy
+# Calls to, and time spent in, the lookups in `_get()`, by the name of
+# the list method and the path taken (e.g. "list_nodes:scan").
+COUNTERS = utils.Counters()
 
 
 @click.group()
@@ -21,65 +29,80 @@ def compute() -> None:
 
 
 @compute.command("list-images")
-@option.pass_driver(Provider)
-def list_images(driver: BaseDriver) -> None:
+@catalog.options
+@option.pass_drivers("compute")
+def list_images(
+        drivers: List[Tuple[str, Callable]],
+        jobs: int,
+        **kwargs: Any,
+) -> None:
     """
     List images.
     """
-    table.show([
+    _show_all([
         ["ID", "id"],
         ["Name", "name"],
-    ], driver.list_images())
+    ], drivers, jobs, _cached("list_images", **kwargs))
 
 
 @compute.command("list-key-pairs")
-@option.pass_driver(Provider)
-def list_key_pairs(driver: BaseDriver) -> None:
+@option.pass_drivers("compute")
+def list_key_pairs(drivers: List[Tuple[str, Callable]], jobs: int) -> None:
     """
     List public keys.
     """
-    table.show([
+    _show_all([
         ["ID", "id", "extra.id"],
         ["Name", "name"],
         ["Public key", "fingerprint", "pub_key"],
-    ], driver.list_key_pairs())
+    ], drivers, jobs, lambda _role, d: paging.iterate(d.list_key_pairs))
 
 
 @compute.command("list-locations")
-@option.pass_driver(Provider)
-def list_locations(driver: BaseDriver) -> None:
+@catalog.options
+@option.pass_drivers("compute")
+def list_locations(
+        drivers: List[Tuple[str, Callable]],
+        jobs: int,
+        **kwargs: Any,
+) -> None:
     """
     List locations.
     """
-    table.show([
+    _show_all([
         ["ID", "id"],
         ["Name", "name"],
         ["Country", "country"],
-    ], driver.list_locations())
+    ], drivers, jobs, _cached("list_locations", **kwargs))
 
 
 @compute.command("list-nodes")
-@option.pass_driver(Provider)
-def list_nodes(driver: BaseDriver) -> None:
+@option.pass_drivers("compute")
+def list_nodes(drivers: List[Tuple[str, Callable]], jobs: int) -> None:
     """
     List nodes.
     """
-    table.show([
+    _show_all([
         ["ID", "id"],
         ["Name", "name"],
         ["State", "state"],
         ["Public IP(s)", "public_ips"],
         ["Private IP(s)", "private_ips"],
-    ], driver.list_nodes())
+    ], drivers, jobs, lambda _role, d: paging.iterate(d.list_nodes))
 
 
 @compute.command("list-sizes")
-@option.pass_driver(Provider)
-def list_sizes(driver: BaseDriver) -> None:
+@catalog.options
+@option.pass_drivers("compute")
+def list_sizes(
+        drivers: List[Tuple[str, Callable]],
+        jobs: int,
+        **kwargs: Any,
+) -> None:
     """
     List sizes.
     """
-    table.show([
+    _show_all([
         ["ID", "id"],
         ["Name", "name"],
         ["VCPU(s)", "extra.vcpus"],
@@ -87,14 +110,14 @@ def list_sizes(driver: BaseDriver) -> None:
         ["Disk", "disk"],
         ["Bandwidth", "bandwidth"],
         ["Price", "extra.price_monthly", "price"],
-    ], driver.list_sizes())
+    ], drivers, jobs, _cached("list_sizes", **kwargs))
 
 
 @compute.command("import-key-pair")
 @option.add("--name", required=True)
 @option.add("--ssh-key", required=True, type=click.File("r"))
-@option.pass_driver(Provider)
-def import_key_pair(driver: BaseDriver, **kwargs: Any) -> None:
+@option.pass_driver("compute")
+def import_key_pair(driver: "BaseDriver", **kwargs: Any) -> None:
     """
     Import a public key.
 
@@ -122,11 +145,7 @@ def import_key_pair(driver: BaseDriver, **kwargs: Any) -> None:
 
     Gah!
     """
-    method = driver.import_key_pair_from_string
-
-    create_key_pair = inspect.signature(driver.create_key_pair).parameters
-    if "public_key" in create_key_pair:
-        method = driver.create_key_pair
+    method = getattr(driver, providers.capabilities(type(driver)).key_import)
 
     *_, data = utils.read_public_key(kwargs["ssh_key"])
     if not method(kwargs["name"], data):
@@ -141,8 +160,8 @@ def import_key_pair(driver: BaseDriver, **kwargs: Any) -> None:
 
 @compute.command("delete-key-pair")
 @option.add("--id", required=True)
-@option.pass_driver(Provider)
-def delete_key_pair(driver: BaseDriver, **kwargs: Any) -> None:
+@option.pass_driver("compute")
+def delete_key_pair(driver: "BaseDriver", **kwargs: Any) -> None:
     """
     Delete a public key.
 
@@ -176,32 +195,133 @@ def delete_key_pair(driver: BaseDriver, **kwargs: Any) -> None:
 
 
 @compute.command("destroy-node")
-@option.add("--id", required=True)
-@option.pass_driver(Provider)
-def destroy_node(driver: BaseDriver, **kwargs: Any) -> None:
+@option.add("--id", "ids", multiple=True)
+@click.option(
+    "--filter",
+    "filters",
+    multiple=True,
+    callback=lambda _ctx, _param, value: [_filter(v) for v in value],
+    help="Only destroy nodes where KEY (e.g. name or extra.tags) matches "
+    "the shell-style PATTERN, given as KEY=PATTERN.",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Show the nodes that would be destroyed.",
+)
+@click.option(
+    "--jobs",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Number of nodes to destroy concurrently.",
+)
+@option.pass_driver("compute")
+def destroy_node(
+        driver: "BaseDriver",
+        ids: Tuple[str, ...],
+        filters: List[Tuple[List[str], str]],
+        dry_run: bool,
+        jobs: int,
+) -> None:
     """
-    Destroy a node.
+    Destroy one or more nodes.
+
+    Nodes are selected by `--id` and/or `--filter`, and a node must
+    match every option.  Every node is found with a single listing, and
+    up to `--jobs` nodes are destroyed concurrently.
     """
-    node = _get(driver.list_nodes, lambda n: n.id == kwargs["id"])
-    if not driver.destroy_node(node):
-        raise click.ClickException("could not destroy node")
-    click.echo("Node {name} ({id}) destroyed".format(**node.__dict__))
+    if not ids and not filters:
+        raise click.UsageError("Missing option \"--id\" or \"--filter\"")
+
+    if len(ids) == 1 and not filters and not dry_run:
+        node = _get(driver.list_nodes, lambda n: n.id == ids[0], id_=ids[0])
+        if not driver.destroy_node(node):
+            raise click.ClickException("could not destroy node")
+        click.echo("Node {name} ({id}) destroyed".format(**node.__dict__))
+        return
+
+    # The listing is stopped once every node in `ids` has been found.
+    remaining = set(ids)
+    nodes = []
+    with COUNTERS.timed("list_nodes:scan"):
+        for node in paging.iterate(driver.list_nodes):
+            if ids:
+                if node.id not in remaining:
+                    continue
+                remaining.discard(node.id)
+            if all(_matches(node, path, pattern) for path, pattern in filters):
+                nodes.append(node)
+            if ids and not remaining:
+                break
+
+    if remaining:
+        raise click.ClickException(
+            "invalid node: {}".format(", ".join(sorted(remaining)))
+        )
+    if not nodes:
+        raise click.ClickException("no matching nodes")
+
+    columns = [
+        ["ID", "id"],
+        ["Name", "name"],
+        ["State", "state"],
+        ["Public IP(s)", "public_ips"],
+    ]
+    if dry_run:
+        table.show(columns, nodes)
+        return
+
+    def destroy(d: "BaseDriver", node: Any) -> None:
+        if not d.destroy_node(node):
+            raise click.ClickException("could not destroy node")
+
+    results = _parallel(driver, destroy, nodes, jobs)
+    table.show(
+        columns + [["Result", "result"]], [
+            _Row(node, result=error or "destroyed")
+            for node, (_, error) in zip(nodes, results)
+        ]
+    )
+
+    errors = [error for _, error in results if error]
+    if errors:
+        raise click.ClickException(
+            "{} of {} nodes failed".format(len(errors), len(nodes))
+        )
 
 
 @compute.command("create-node")
-@option.add("--name", required=True)
-@option.add("--size", required=True)
-@option.add("--image", required=True)
-@option.add("--location", required=True)
+@option.add("--name")
+@option.add("--size")
+@option.add("--image")
+@option.add("--location")
 @option.add("--ssh-key", type=click.File("r"))
 @option.add("--password", is_flag=True)
 @option.add("--user-data", type=click.File("r"))
 @option.add("--script-id", type=int)
 @option.add("--wait", default=600)
-@option.pass_driver(Provider)
-def create_node(driver: BaseDriver, **kwargs: Any) -> None:
+@click.option(
+    "--count",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of nodes to create; {i} in the name is replaced with 1..N.",
+)
+@click.option(
+    "--from-manifest",
+    type=click.File("r"),
+    help="TOML file with a [[node]] table for each kind of node.",
+)
+@click.option(
+    "--jobs",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Number of nodes to create concurrently.",
+)
+@catalog.options
+@option.pass_driver("compute")
+def create_node(driver: "BaseDriver", **kwargs: Any) -> None:
     """
-    Create a new node.
+    Create one or more nodes.
 
     This command is quite hard to generalize because different drivers
     implement `create_node()` in different ways.
@@ -220,24 +340,75 @@ def create_node(driver: BaseDriver, **kwargs: Any) -> None:
     variations of the API they support.  However, `features` is not
     all-encompassing.  It only seems to allow specifying support for
     `ssh_key`, `password` and/or `generates_password`.
-    """
-    kw = DefaultMunch()
 
-    # Bail on conflicting arguments
-    if kwargs.get("ssh_key") and kwargs.get("password"):
-        raise click.ClickException("Use either --ssh-key or --password")
+    Several nodes are created with `--count` or `--from-manifest` (see
+    `_manifest()`).  The catalogs are only fetched once for every node,
+    up to `--jobs` nodes are created concurrently, and every node is
+    waited for at once (see `waiter.wait_until_running()`).
+    """
+    from libcloud.compute.base import NodeAuthPassword, NodeAuthSSHKey
 
-    # Process arguments common for all compute drivers.
-    kw.name = kwargs.pop("name")
+    ctx = click.get_current_context()
+    cache = catalog.cache(
+        ctx.obj.config,
+        ctx.obj.role_name,
+        kwargs.pop("refresh"),
+        kwargs.pop("no_cache"),
+    )
 
-    image = kwargs.pop("image")
-    kw.image = _get(driver.list_images, lambda i: i.id == image)
+    # Arguments local to this function.
+    wait = kwargs.pop("wait")
+    jobs = kwargs.pop("jobs")
+    manifest = kwargs.pop("from_manifest")
+
+    # Each entry is a set of arguments for one or more nodes.
+    entries = _manifest(ctx, manifest, kwargs) if manifest else [kwargs]
+
+    # Bail on conflicting or missing arguments.
+    params = {p.name: p for p in ctx.command.params}
+    for entry in entries:
+        if entry.get("ssh_key") and entry.get("password"):
+            raise click.ClickException("Use either --ssh-key or --password")
+        for name in ["name", "image", "location", "size"]:
+            if entry.get(name) is None:
+                raise click.MissingParameter(ctx=ctx, param=params[name])
+        if entry["count"] > 1 and "{i}" not in entry["name"]:
+            raise click.UsageError(
+                "{} must include {{i}} to create more than one node".format(
+                    entry["name"]
+                )
+            )
 
-    location = kwargs.pop("location")
-    kw.location = _get(driver.list_locations, lambda l: l.id == location)
+    # The catalogs that are needed to process the arguments are fetched
+    # concurrently.  Images are looked up by ID instead if the driver
+    # supports it and they aren't cached (see `_get()`).  Key pairs are
+    # only used by the driver-specific functions below to look up an SSH
+    # key.
+    func = CREATE_NODE.get(driver.type)
+    names = ["list_locations", "list_sizes"]
+    getters = dict(providers.capabilities(type(driver)).getters)
+    if "list_images" not in getters or cache.cached(driver, "list_images"):
+        names.append("list_images")
+    if func and any(entry.get("ssh_key") for entry in entries):
+        names.append("list_key_pairs")
+
+    # Each image, location and size is only looked up once, no matter
+    # how many entries use it.
+    lookups = {}  # type: dict
+
+    def lookup(name: str, id_: str) -> Any:
+        if (name, id_) not in lookups:
+            lookups[name, id_] = _get(
+                getattr(catalogs, name), lambda x: x.id == id_, id_=id_
+            )
+        return lookups[name, id_]
 
-    size = kwargs.pop("size")
-    kw.size = _get(driver.list_sizes, lambda s: s.id == size)
+    with concurrent.futures.ThreadPoolExecutor(len(names)) as pool:
+        catalogs = _Catalog(driver, pool, names, cache)
+        for entry in entries:
+            entry["image"] = lookup("list_images", entry["image"])
+            entry["location"] = lookup("list_locations", entry["location"])
+            entry["size"] = lookup("list_sizes", entry["size"])
 
     # Process arguments declared in `features`.  There are two arguments
     # that need processing: `ssh_key` and `password`.  These are
@@ -260,64 +431,425 @@ def create_node(driver: BaseDriver, **kwargs: Any) -> None:
     #   of integer IDs and some as a list of string IDs).
     #
     # GAH!
-    features = getattr(driver, "features", {}).get("create_node", [])
-
-    if "ssh_key" in features:
-        ssh_key = kwargs.pop("ssh_key")
-        if ssh_key:
-            kw.auth = NodeAuthSSHKey(utils.read_public_key(ssh_key)[3])
-
-    if "password" in features and not kw.auth:
-        password = kwargs.pop("password")
-        if password:
-            value = click.prompt(
-                text="Password",
-                hide_input=True,
-                confirmation_prompt=True,
+    features = providers.capabilities(type(driver)).auth
+    password = None  # type: Optional[str]
+
+    nodes = []  # type: List[dict]
+    for entry in entries:
+        kw = DefaultMunch()
+
+        # Process arguments common for all compute drivers.
+        for name in ["image", "location", "size"]:
+            kw[name] = entry.pop(name)
+
+        if "ssh_key" in features:
+            ssh_key = entry.pop("ssh_key")
+            if ssh_key:
+                kw.auth = NodeAuthSSHKey(utils.read_public_key(ssh_key)[3])
+
+        if "password" in features and not kw.auth:
+            if entry.pop("password"):
+                # The same password is used for every node.
+                if password is None:
+                    password = click.prompt(
+                        text="Password",
+                        hide_input=True,
+                        confirmation_prompt=True,
+                    )
+                kw.auth = NodeAuthPassword(password)  # pylint: disable=R0204
+
+        # Process arguments specific to individual drivers.
+        if func:
+            kw.update(func(cast("BaseDriver", catalogs), entry))
+
+        name = entry.pop("name")
+        count = entry.pop("count")
+
+        # Bail there are any unprocessed arguments.
+        args = [
+            "--{}".format(k.replace("_", "-")) for k, v in entry.items() if v
+        ]
+        if args:
+            raise click.UsageError(
+                "{} does not support {}".format(driver.name, ", ".join(args))
             )
-            kw.auth = NodeAuthPassword(value)  # pylint: disable=R0204
 
-    # Process arguments specific to individual drivers.
-    func = globals().get("_create_node_{}".format(driver.type), None)
-    if func:
-        kw.update(func(driver, kwargs))
+        nodes.extend(
+            dict(kw, name=name.replace("{i}", str(i)))
+            for i in range(1, count + 1)
+        )
 
-    # Arguments local to this function.
-    wait = kwargs.pop("wait")
+    # And finally, create the nodes.
+    results = []  # type: List[Tuple[Any, Optional[str]]]
+    if len(nodes) == 1:
+        results.append((driver.create_node(**nodes[0]), None))
+    else:
+        results = _parallel(
+            driver, lambda d, kw: d.create_node(**kw), nodes, jobs
+        )
+    created = []
+    errors = []
+    for kw, (node, error) in zip(nodes, results):
+        if error:
+            errors.append((kw["name"], error))
+        else:
+            created.append(node)
+
+    # State transitions are shown as they happen, and the final state of
+    # every node is shown once they're running (or once they've timed
+    # out).  Progress is written to stderr to keep the output parsable
+    # (see `--output`).
+    def report(node: Any, previous: str) -> None:
+        msg = "{} ({}): {} -> {}"
+        click.echo(
+            msg.format(node.name, node.id, previous, node.state), err=True
+        )
 
-    # Bail there are any unprocessed arguments.
-    args = ["--{}".format(k.replace("_", "-")) for k, v in kwargs.items() if v]
-    if args:
-        raise click.UsageError(
-            "{} does not support {}".format(driver.name, ", ".join(args))
+    timeout = None
+    if created:
+        plural = "s" if len(created) > 1 else ""
+        msg = "Waiting for the node{} to come online...".format(plural)
+        click.echo(msg, err=True)
+        try:
+            created = waiter.wait_until_running(
+                driver, created, timeout=wait, callback=report
+            )
+        except waiter.WaitTimeout as e:
+            created = e.nodes
+            timeout = str(e)
+
+        table.show([
+            ["ID", "id"],
+            ["Name", "name"],
+            ["State", "state"],
+            ["Public IP(s)", "public_ips"],
+            ["Private IP(s)", "private_ips"],
+            ["Password", "extra.password"],
+        ], created)
+
+    for name, msg in errors:
+        click.echo("Error: {}: {}".format(name, msg), err=True)
+    if errors:
+        raise click.ClickException(
+            "{} of {} nodes failed".format(len(errors), len(nodes))
         )
+    if timeout:
+        raise click.ClickException(timeout)
 
-    # And finally, create the node.
-    node = driver.create_node(**kw)
 
-    click.echo("Waiting for the node to come online...")
-    table.show([
-        ["ID", "id"],
-        ["Name", "name"],
-        ["State", "state"],
-        ["Public IP(s)", "public_ips"],
-        ["Private IP(s)", "private_ips"],
-        ["Password", "extra.password"],
-    ], [n for n, _ in driver.wait_until_running([node], timeout=wait)])
+class _Row:
+    """
+    A row with additional attributes, e.g. the role of the driver that
+    returned it.
+    """
+
+    def __init__(self, obj: object, **attrs: Any) -> None:
+        self._obj = obj
+        self.__dict__.update(attrs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._obj, name)
+
+
+def _show_all(
+        columns: List[List[str]],
+        drivers: List[Tuple[str, Callable]],
+        jobs: int,
+        func: Callable[[str, "BaseDriver"], Iterable[object]],
+) -> None:
+    """
+    Show a single table with the rows returned by `func` for each role.
+
+    With more than one role, `func` is called concurrently for up to
+    `jobs` roles and a column with the role of each row is added.  A
+    failure for a role is reported once the table for the other roles
+    has been shown.  The rows for each role are retrieved in its own
+    thread, including the pages of paginated APIs (see `paging`).
+    """
+    if len(drivers) == 1:
+        role, factory = drivers[0]
+        table.show(columns, func(role, factory()))
+        return
+
+    def fetch(role: str, factory: Callable) -> List[object]:
+        return list(func(role, factory()))
+
+    with concurrent.futures.ThreadPoolExecutor(jobs) as pool:
+        futures = [(role, pool.submit(fetch, role, factory))
+                   for role, factory in drivers]
+
+    rows = []  # type: List[object]
+    errors = []
+    for role, future in futures:
+        try:
+            rows.extend(_Row(row, role=role) for row in future.result())
+        except Exception as e:  # pylint: disable=broad-except
+            errors.append((role, _error(e)))
+
+    table.show([["Role", "role"]] + columns, rows)
+
+    for role, msg in errors:
+        click.echo("Error: {}: {}".format(role, msg), err=True)
+    if errors:
+        raise click.ClickException(
+            "{} of {} roles failed".format(len(errors), len(drivers))
+        )
 
 
-def _get(func: Callable, pred: Callable, no_error: bool = False) -> Any:
+def _cached(name: str, refresh: bool, no_cache: bool) -> Callable:
+    """
+    Return a function that retrieves the catalog `name` for a role from
+    the catalog cache for the role (see `catalog.CatalogCache`).
+    """
+    conf = click.get_current_context().obj.config
+
+    def func(role: str, driver: "BaseDriver") -> List[object]:
+        return catalog.cache(conf, role, refresh, no_cache).get(driver, name)
+
+    return func
+
+
+class _Catalog:
+    """
+    Fetch catalogs (e.g. images and sizes) from a driver concurrently.
+
+    Each method in `names` is called in `pool` (through `cache` for
+    cached catalogs) on a copy of the driver with its own connection,
+    and the corresponding attribute of the catalog is a function that
+    waits for its result.  Other attributes are retrieved from the
+    driver.
+    """
+
+    def __init__(
+            self,
+            driver: "BaseDriver",
+            pool: concurrent.futures.Executor,
+            names: List[str],
+            cache: Optional[catalog.CatalogCache] = None,
+    ) -> None:
+        self._driver = driver
+        self._futures = {}  # type: dict
+        for name in names:
+            copied = utils.copy_driver(driver)
+            if cache:
+                self._futures[name] = pool.submit(cache.get, copied, name)
+            else:
+                self._futures[name] = pool.submit(getattr(copied, name))
+
+    def __getattr__(self, name: str) -> Any:
+        future = self._futures.get(name)
+        if future is None:
+            return getattr(self._driver, name)
+
+        def result() -> Any:
+            return future.result()
+
+        result.__name__ = name
+        return result
+
+
+def _get(
+        func: Callable,
+        pred: Callable,
+        no_error: bool = False,
+        id_: Any = None,
+) -> Any:
     """
     Retrieve the first instance from `func` that matches `pred`.
+
+    If `id_` is given and `func` is a method of a driver that can
+    retrieve a single instance by ID (see `providers.GETTERS`), that is
+    tried first.  The instances from `func` are only scanned if the
+    instance isn't found that way (see `_not_found()`) or if it doesn't
+    match `pred`.  Other errors from the lookup are raised.  The time
+    spent on each path is recorded in `COUNTERS`.
     """
-    value = next((elm for elm in func() if pred(elm)), None)
+    name = func.__name__
+    driver = getattr(func, "__self__", None)
+    if driver is not None and id_ is not None:
+        getter = dict(providers.capabilities(type(driver)).getters).get(name)
+        if getter:
+            with COUNTERS.timed("{}:{}".format(name, getter)):
+                try:
+                    value = getattr(driver, getter)(id_)
+                except Exception as e:  # pylint: disable=broad-except
+                    if not _not_found(e):
+                        raise
+                    value = None
+            if value is not None and pred(value):
+                return value
+
+    # The scan stops at the first match, without retrieving any further
+    # pages (see `paging.iterate()`).
+    with COUNTERS.timed("{}:scan".format(name)):
+        value = next((elm for elm in paging.iterate(func) if pred(elm)), None)
     if value or no_error:
         return value
-    name = func.__name__.replace("list_", "").replace("_", "-").rstrip("s")
+    name = name.replace("list_", "").replace("_", "-").rstrip("s")
     raise click.ClickException("invalid {}".format(name))
 
 
-def _create_node_digitalocean(driver: BaseDriver, kwargs: Any) -> Munch:
+def _not_found(e: Exception) -> bool:
+    """
+    Check if `e` was raised by a driver for an ID that doesn't exist.
+
+    Drivers report this as an HTTP error with the status code 404, or by
+    looking up the ID in an empty list or dictionary of results.
+    """
+    from libcloud.common.exceptions import BaseHTTPError
+    from libcloud.common.types import ProviderError
+
+    if isinstance(e, BaseHTTPError):
+        return bool(e.code == 404)
+    if isinstance(e, ProviderError):
+        return bool(e.http_code == 404)
+    return isinstance(e, LookupError)
+
+
+def _error(e: Exception) -> str:
+    """
+    Describe the exception `e` for an error message.
+    """
+    if isinstance(e, click.ClickException):
+        return str(e.format_message())
+    return str(e) or type(e).__name__
+
+
+def _manifest(ctx: click.Context, f: IO[str], kwargs: dict) -> List[dict]:
+    """
+    Read the entries in the manifest `f` for `create-node`.
+
+    A manifest is a TOML file with an array of `node` tables, where each
+    table has any of the keys in `MANIFEST`.  Values are converted like
+    the corresponding command-line options, and missing keys are taken
+    from `kwargs`.  Paths are relative to the directory of the manifest,
+    and every entry reads its own copy of the files.  For example:
+
+        [[node]]
+        name = "web-{i}"
+        count = 3
+        size = "s-1vcpu-1gb"
+
+        [[node]]
+        name = "db"
+        size = "s-4vcpu-8gb"
+        user-data = "db.yaml"
+    """
+    try:
+        nodes = config.parse(f).get("node")
+    except config.ConfigError as e:
+        raise click.ClickException(str(e))
+
+    if not nodes or not isinstance(nodes, list) or \
+            not all(isinstance(node, dict) for node in nodes):
+        raise click.ClickException(
+            "{}: node must be an array of tables".format(f.name)
+        )
+
+    # Files given on the command line would be read to the end by the
+    # first entry, so they're read once and each entry gets a copy.
+    files = {}  # type: dict
+    for name, value in kwargs.items():
+        if hasattr(value, "read"):
+            files[name] = (value.name, value.read())
+
+    base = os.path.dirname(os.path.abspath(f.name))
+    params = {p.name: p for p in ctx.command.params}
+    entries = []
+    for node in nodes:
+        entry = dict(kwargs)
+        for name, (filename, content) in files.items():
+            entry[name] = _copy(filename, content)
+        for key, value in node.items():
+            if key not in MANIFEST:
+                raise click.ClickException(
+                    "{}: unknown key '{}'".format(f.name, key)
+                )
+            name = key.replace("-", "_")
+            param = params[name]
+            if isinstance(param.type, click.File):
+                path = os.path.join(base, os.path.expanduser(str(value)))
+                with param.type_cast_value(ctx, path) as handle:
+                    entry[name] = _copy(handle.name, handle.read())
+            else:
+                entry[name] = param.type_cast_value(ctx, str(value))
+        entries.append(entry)
+    return entries
+
+
+def _copy(name: str, content: str) -> IO[str]:
+    """
+    Create an in-memory file with `content` named `name`.
+    """
+    f = io.StringIO(content)
+    f.name = name
+    return f
+
+
+def _filter(value: str) -> Tuple[List[str], str]:
+    """
+    Parse a filter for `destroy-node` as the path of an attribute and a
+    shell-style pattern.
+    """
+    key, sep, pattern = value.partition("=")
+    if not key or not sep:
+        raise click.BadParameter("{} is not KEY=PATTERN".format(value))
+    return key.split("."), pattern
+
+
+def _matches(obj: object, path: List[str], pattern: str) -> bool:
+    """
+    Check if the attribute at `path` in `obj` matches `pattern`.
+
+    Lists match if any element does.
+    """
+    value = obj  # type: Any
+    for name in path:
+        if isinstance(value, dict):
+            value = value.get(name)
+        else:
+            value = getattr(value, name, None)
+
+    values = value if isinstance(value, list) else [value]
+    return any(
+        fnmatch.fnmatchcase(str(v), pattern) for v in values if v is not None
+    )
+
+
+def _parallel(
+        driver: "BaseDriver",
+        func: Callable[["BaseDriver", Any], Any],
+        args: List[Any],
+        jobs: int,
+) -> List[Tuple[Any, Optional[str]]]:
+    """
+    Call `func` with a driver and each element of `args`, with up to
+    `jobs` concurrent calls.
+
+    The result of each call is returned in order, along with an error
+    message if the call failed.
+    """
+    # Each thread uses its own copy of the driver (see `copy_driver()`).
+    local = threading.local()
+
+    def call(arg: Any) -> Any:
+        if not hasattr(local, "driver"):
+            local.driver = utils.copy_driver(driver)
+        return func(local.driver, arg)
+
+    with concurrent.futures.ThreadPoolExecutor(jobs) as pool:
+        futures = [pool.submit(call, arg) for arg in args]
+
+    results = []  # type: List[Tuple[Any, Optional[str]]]
+    for future in futures:
+        try:
+            results.append((future.result(), None))
+        except Exception as e:  # pylint: disable=broad-except
+            results.append((None, _error(e)))
+    return results
+
+
+def _create_node_digitalocean(driver: "BaseDriver", kwargs: Any) -> Munch:
     """
     Process arguments for DigitalOcean.
     """
@@ -347,7 +879,7 @@ def _create_node_digitalocean(driver: BaseDriver, kwargs: Any) -> Munch:
     return kw
 
 
-def _create_node_vultr(driver: BaseDriver, kwargs: Any) -> Munch:
+def _create_node_vultr(driver: "BaseDriver", kwargs: Any) -> Munch:
     """
     Process arguments for Vultr.
     """
@@ -376,3 +908,25 @@ def _create_node_vultr(driver: BaseDriver, kwargs: Any) -> Munch:
         kw.ex_create_attr.script_id = script_id
 
     return kw
+
+
+# Keys that may be used for each node in a manifest for `create-node`
+# (see `_manifest()`).
+MANIFEST = (
+    "name",
+    "count",
+    "image",
+    "location",
+    "size",
+    "ssh-key",
+    "password",
+    "user-data",
+    "script-id",
+)
+
+# Functions that process arguments for `create-node` that are specific
+# to individual drivers, by driver type.
+CREATE_NODE = {
+    "digitalocean": _create_node_digitalocean,
+    "vultr": _create_node_vultr,
+}
@@ -1,12 +1,47 @@
+import concurrent.futures
+import contextlib
+import datetime
+import functools
+import glob
+import hashlib
+import importlib
+import importlib.util
+import json
+import marshal
 import os
 import pathlib
+import re
+import shutil
+import socket
+import stat
 import subprocess
-from typing import IO, Any, MutableMapping, Tuple, Type
-
-import toml
+import sys
+import threading
+import time
+from typing import (
+    IO, Any, Callable, Iterator, List, Mapping, MutableMapping, Optional,
+    Sequence, Set, Tuple, Type, Union
+)
 
 from . import __project__, utils
 
+# A location in a parsed configuration, e.g. ["role", "x", "key"].
+Location = List[Union[str, int]]
+
+# System-wide configuration, see `layers()`.
+GLOBAL_CONFIG = "/etc/{}.toml".format(__project__)
+
+# Default user configuration, see `layers()`.
+USER_CONFIG = "~/.{}.toml".format(__project__)
+
+# Name of per-directory configuration files, see `layers()`.
+LOCAL_CONFIG = ".{}.toml".format(__project__)
+
+# TOML parsers in order of preference.  `tomllib` (Python 3.11+) and
+# `tomli` are considerably faster than `toml`, which is always
+# available.
+PARSERS = ("tomllib", "tomli", "toml")
+
 
 class ConfigError(Exception):
     pass
@@ -20,41 +55,416 @@ class ConfigCommandError(ConfigError):
     pass
 
 
+# Counters for the cost of loading configurations, e.g. "hash" for
+# hashing configuration files.
+COUNTERS = utils.Counters()
+
+
 class ConfigPermission:
-    def __init__(self, f: IO[str]) -> None:
+    """
+    Permission to execute the commands in a configuration file.
+
+    The configuration file is hashed at most once (unless `digest` is
+    given) and the decision is memoized, so a new instance must be used
+    for each load of a configuration.
+    """
+
+    def __init__(self, f: IO[str], digest: Optional[str] = None) -> None:
         self._f = f
-        self._cache = pathlib.Path.home().joinpath(".cache", __project__)
-        self._cache.mkdir(parents=True, exist_ok=True)
+        self._digest = digest
+        self._granted = None  # type: Optional[bool]
+
+        # Approvals are keyed by the real path, since layered files such
+        # as `~/.cloudie.toml` and `./.cloudie.toml` share their name.
+        path = os.path.realpath(f.name)
+        name = hashlib.sha256(path.encode()).hexdigest()
+        self._cache = utils.cache_dir().joinpath("{}.permission".format(name))
 
     def ask(self) -> bool:
         """
         Return true if permission is granted, false otherwise.
         """
-        digest = utils.sha256(self._f)
-        cache = self._cache.joinpath(os.path.basename(self._f.name))
+        if self._granted is None:
+            self._granted = self._ask()
+        return self._granted
 
-        try:
-            if cache.read_text() == digest:
-                return True
-        except OSError:
-            pass
+    def _ask(self) -> bool:
+        digest = self._digest or _sha256(self._f)
+
+        with COUNTERS.timed("permission"):
+            try:
+                if self._cache.read_text() == digest:
+                    return True
+            except OSError:
+                pass
 
         msg = "Allow '{}' to execute commands [y/N]: "
         answer = input(msg.format(self._f.name))
         if answer in ("y", "Y"):
-            cache.write_text(digest)
+            self._cache.write_text(digest)
             return True
 
         return False
 
 
-class ConfigDecoder(toml.TomlDecoder):  # type: ignore
+class ConfigCache:
+    """
+    Cache for parsed configuration files.
+
+    Parsing TOML is slow, so parsed configurations are serialized with
+    `marshal` to the cache directory.  An entry is only used if the
+    path, modification time, size and SHA256 message digest of the
+    configuration file, as well as the parser, are unchanged.
+
+    Output from command substitutions is never cached.  Instead, values
+    with commands are stored verbatim along with their location in the
+    configuration, so that they can be re-evaluated on every load.
+
+    There is an entry for every configuration file that has been loaded.
+    Entries for files that no longer exist are removed whenever a new
+    entry is stored.
+    """
+
+    # Bump this if the format of the entries is changed.  The version of
+    # Python is included since the `marshal` format may change between
+    # releases.
+    VERSION = (1, sys.hexversion)
+
+    def __init__(self, f: IO[str], parser: str) -> None:
+        st = os.fstat(f.fileno())
+        path = os.path.realpath(f.name)
+        self.digest = _sha256(f)
+        self._key = (path, st.st_mtime_ns, st.st_size, self.digest, parser)
+
+        name = hashlib.sha256(path.encode()).hexdigest()
+        self._cache = utils.cache_dir().joinpath("{}.config".format(name))
+
+    def get(self) -> Optional[Tuple[dict, List[Location]]]:
+        """
+        Retrieve the parsed configuration and the location of commands.
+        """
+        try:
+            version, key, data, commands = marshal.loads(
+                self._cache.read_bytes()
+            )
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        if version != self.VERSION or key != self._key:
+            return None
+        return data, commands
+
+    def put(self, data: dict, commands: List[Location]) -> None:
+        """
+        Store a parsed configuration and the location of commands.
+
+        Configurations with values that can't be serialized by `marshal`
+        (e.g. dates) are not cached.
+        """
+        try:
+            entry = marshal.dumps((self.VERSION, self._key, data, commands))
+        except ValueError:
+            return
+
+        with contextlib.suppress(OSError):
+            utils.write_atomic(self._cache, entry)
+        self._prune()
+
+    def _prune(self) -> None:
+        """
+        Remove the entries for configuration files that no longer exist.
+        """
+        for path in self._cache.parent.glob("*.config"):
+            try:
+                key = marshal.loads(path.read_bytes())[1]
+                if not os.path.exists(key[0]):
+                    path.unlink()
+            except (OSError, EOFError, ValueError, TypeError, IndexError):
+                continue
+
+
+class ConfigSecrets:
+    """
+    Time-limited storage for the output of command substitutions.
+
+    Entries are named by the SHA256 message digest of the configuration
+    file and the command, so every entry is invalidated once the
+    configuration is modified.
+
+    This implementation keeps entries in memory for the lifetime of the
+    process, so entries aren't shared between invocations and a `ttl`
+    only avoids executing a command again in the same process.  See
+    `ConfigKeyring` and `ConfigAgent` for storage that outlives it.
+    """
+
+    _entries = {}  # type: dict
+    _lock = threading.Lock()
+
+    def __init__(self, digest: str) -> None:
+        self._digest = digest
+
+    def get(self, command: str) -> Optional[str]:
+        """
+        Retrieve the output of `command`, if it hasn't expired.
+        """
+        return self._get(self._name(command))
+
+    def put(self, command: str, output: str, ttl: int) -> None:
+        """
+        Store the output of `command` for `ttl` seconds.
+        """
+        self._put(self._name(command), output, ttl)
+
+    def stores(self, ttl: Optional[int]) -> bool:
+        """
+        Check if the output of commands with `ttl` should be stored.
+        """
+        return bool(ttl)
+
+    def _name(self, command: str) -> str:
+        data = "{}\0{}".format(self._digest, command).encode()
+        return "{}:{}".format(__project__, hashlib.sha256(data).hexdigest())
+
+    def _get(self, name: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(name, (0.0, ""))
+            expiry, output = entry  # type: float, str
+            if expiry > time.monotonic():
+                return output
+            self._entries.pop(name, None)
+            return None
+
+    def _put(self, name: str, output: str, ttl: int) -> None:
+        with self._lock:
+            self._entries[name] = (time.monotonic() + ttl, output)
+
+
+class ConfigKeyring(ConfigSecrets):
+    """
+    Storage for the output of command substitutions in the user keyring
+    of the kernel.
+
+    Entries are kept in kernel memory, never touch the disk and are
+    expired by the kernel.  This allows separate invocations to share
+    entries.  `keyctl` from keyutils is used to manage the keyring.
+    """
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("keyctl") is not None
+
+    def _get(self, name: str) -> Optional[str]:
+        try:
+            key = self._keyctl("search", "@u", "user", name).strip()
+            return self._keyctl("pipe", key)
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _put(self, name: str, output: str, ttl: int) -> None:
+        try:
+            key = self._keyctl("padd", "user", name, "@u", data=output).strip()
+        except (OSError, subprocess.SubprocessError):
+            return
+
+        # The key is added without a timeout, so it's removed again if
+        # the timeout can't be set rather than being kept indefinitely.
+        try:
+            self._keyctl("timeout", key, str(ttl))
+        except (OSError, subprocess.SubprocessError):
+            with contextlib.suppress(OSError, subprocess.SubprocessError):
+                self._keyctl("unlink", key, "@u")
+
+    @staticmethod
+    def _keyctl(*args: str, data: str = "") -> str:
+        proc = subprocess.run(
+            ["keyctl"] + list(args),
+            input=data.encode(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        return proc.stdout.decode()
+
+
+class ConfigAgent(ConfigSecrets):
+    """
+    Storage for the output of command substitutions in `cloudie agent`.
+
+    The agent is reached through a unix socket that is only accessible
+    by the current user.  The output of commands without a `ttl` is
+    stored as well, and kept until the agent exits or the configuration
+    file is modified.  Requests that fail are treated as cache misses.
+    """
+
+    TIMEOUT = 5.0
+
+    def __init__(self, digest: str, config: str) -> None:
+        super().__init__(digest)
+        self._config = config
+
+    @staticmethod
+    def path() -> pathlib.Path:
+        return utils.cache_dir().joinpath("agent.sock")
+
+    @classmethod
+    def available(cls) -> bool:
+        return cls.path().is_socket()
+
+    def stores(self, ttl: Optional[int]) -> bool:
+        return ttl is None or ttl > 0
+
+    def _get(self, name: str) -> Optional[str]:
+        output = self._request(op="get", name=name).get("output")
+        return output if isinstance(output, str) else None
+
+    def _put(self, name: str, output: str, ttl: int) -> None:
+        self._request(op="put", name=name, output=output, ttl=ttl)
+
+    def _request(self, **kwargs: Any) -> dict:
+        request = dict(kwargs, config=self._config, digest=self._digest)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.TIMEOUT)
+                sock.connect(str(self.path()))
+                sock.sendall(json.dumps(request).encode() + b"\n")
+                with sock.makefile("rb") as f:
+                    response = json.loads(f.readline().decode())
+        except (OSError, ValueError):
+            return {}
+        return response if isinstance(response, dict) else {}
+
+
+class ConfigCommand:
+    """
+    A command substitution that is executed on first use.
+
+    The output is memoized, so a command is executed at most once
+    regardless of how many times it is resolved.  If `ttl` is given, the
+    output is also kept in `secrets` for `ttl` seconds.  A running
+    `cloudie agent` also keeps the output of commands without a `ttl`.
+    """
+
+    def __init__(
+            self,
+            value: str,
+            timeout: Optional[float],
+            ttl: Optional[int] = None,
+            secrets: Optional[ConfigSecrets] = None,
+    ) -> None:
+        self.value = value
+        self._timeout = timeout
+        self._ttl = ttl
+        self._secrets = secrets
+        self._output = None  # type: Optional[str]
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "{}({!r})".format(type(self).__name__, self.value)
+
+    def resolve(self) -> str:
+        """
+        Execute the command (unless it already has been) and return its
+        output.
+        """
+        with self._lock:
+            if self._output is not None:
+                return self._output
+
+            if self._secrets and self._secrets.stores(self._ttl):
+                self._output = self._secrets.get(self.value)
+                if self._output is None:
+                    self._output = _execute(self.value, self._timeout)
+                    ttl = self._ttl or 0
+                    self._secrets.put(self.value, self._output, ttl)
+            else:
+                self._output = _execute(self.value, self._timeout)
+            return self._output
+
+
+def layers(path: str) -> List[str]:
+    """
+    Return the configuration files to load for the user file `path`.
+
+    The files are, in order of increasing precedence, `GLOBAL_CONFIG`
+    (if it exists), `path` and, if `path` is `USER_CONFIG`, every
+    `LOCAL_CONFIG` in the current directory and its parents, with the
+    closest one last.
+
+    The parents are searched up to, but not including, the home
+    directory or a mount point.  Files that aren't owned by the current
+    user or that are writable by others are skipped, since they may set
+    e.g. the host that the key for a role is sent to.
+    """
+    paths = [GLOBAL_CONFIG] if os.path.isfile(GLOBAL_CONFIG) else []
+    paths.append(path)
+
+    user = os.path.realpath(os.path.expanduser(path))
+    if user != os.path.realpath(os.path.expanduser(USER_CONFIG)):
+        return paths
+
+    home = pathlib.Path.home()
+    cwd = pathlib.Path.cwd()
+    local = []
+    for directory in [cwd] + list(cwd.parents):
+        if directory == home or os.path.ismount(str(directory)):
+            break
+        candidate = directory.joinpath(LOCAL_CONFIG)
+        if _trusted(candidate) and os.path.realpath(str(candidate)) != user:
+            local.append(str(candidate))
+
+    paths.extend(reversed(local))
+    return paths
+
+
+def _trusted(path: pathlib.Path) -> bool:
+    """
+    Check if `path` is a file that is owned by the current user and that
+    isn't writable by the group or others.
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_uid == os.getuid() and \
+        not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def load(
+        path: Union[str, Sequence[str]],
+        dict_class: Type[MutableMapping] = dict,
+        jobs: int = 4,
+        timeout: Optional[float] = None,
+        lazy: bool = False,
+        parser: Optional[str] = None,
+) -> MutableMapping:
     """
-    TOML decoder.
+    Parse a TOML file and return it as `dict_class`.
 
-    This extends the default decoder with a new string sub-type that
-    executes values surrounded with $() as commands.  The output from
-    the command is used as the actual value for that option.
+    `path` is either a single file or a list of files (see `layers()`)
+    that are merged in order.  Tables are merged recursively, and other
+    values are replaced by later files.  Files may also include other
+    files with a top-level `include` list of paths or glob patterns,
+    relative to the including file.  Values in the including file take
+    precedence over included files.  Every file is parsed and cached
+    separately, so a modified file doesn't cause the others to be
+    parsed again.
+
+    String values surrounded with $() are executed as commands.  The
+    output from the command is used as the actual value for that option.
+    Up to `jobs` commands are executed concurrently, and each command is
+    given `timeout` seconds to complete.
+
+    If `lazy` is true, commands are left as instances of `ConfigCommand`
+    that are executed once they are passed to `resolve()`.
+
+    The TOML file is parsed with `parser`, which is one of `PARSERS`.
+    By default, the first one that is available is used.  Commands are
+    found by walking the parsed configuration, so every parser produces
+    the same result.
+
+    Commands may also be specified as a table with a `command` and a
+    `ttl`, in which case the output is kept for `ttl` seconds (see
+    `ConfigSecrets`).
 
     Users must permit command substitutions.  If approved, the SHA256
     message digest of the config file is cached in order to avoid
@@ -62,41 +472,280 @@ class ConfigDecoder(toml.TomlDecoder):  # type: ignore
 
     Re-approval is required after every change to a configuration file
     that contain commands.
+
+    The cost of each step is recorded in `COUNTERS`.
     """
+    paths = [path] if isinstance(path, str) else list(path)
+    parser = parser or _parser()
+    seen = set()  # type: Set[str]
 
-    def __init__(
-            self,
-            permission: ConfigPermission,
-            dict_class: Type[MutableMapping],
-    ) -> None:
-        super().__init__(dict_class)
-        self._permission = permission
+    data = {}  # type: dict
+    with COUNTERS.timed("load"):
+        for p in paths:
+            _merge(data, _load_file(p, parser, timeout, seen))
+    result = _convert(data, dict_class)  # type: MutableMapping
 
-    def load_value(self, v: Any, strictly_valid: bool = True) -> Tuple:
-        value, vtype = super().load_value(v, strictly_valid)
-        if vtype == "str":
-            if value.startswith("$(") and value.endswith(")"):
-                if not self._permission.ask():
-                    msg = "need permission to execute command"
-                    raise ConfigPermissionError(msg)
+    if not lazy:
+        resolve(result, jobs)
+    return result
 
-                try:
-                    args = value[2:-1].split()
-                    value = subprocess.check_output(args).decode().strip()
-                except (OSError, subprocess.SubprocessError):
-                    raise ConfigCommandError("{} failed".format(value))
-        return value, vtype
 
+def resolve(value: Any, jobs: int = 4) -> Any:
+    """
+    Execute each `ConfigCommand` in `value` and return the result.
 
-def load(path: str, dict_class: Type[MutableMapping] = dict) -> MutableMapping:
+    `value` is either a single `ConfigCommand` or a structure of
+    mappings and lists, in which case every `ConfigCommand` is replaced
+    in-place with its output.  Up to `jobs` commands are executed
+    concurrently.  If more than one command fails, the error for the
+    first one is raised.
     """
-    Parse a TOML file and return it as `dict_class`.
+    if isinstance(value, ConfigCommand):
+        return value.resolve()
+
+    targets = [
+        _locate(value, path)
+        for path in _find(value, lambda v: isinstance(v, ConfigCommand))
+    ]
+    if not targets:
+        return value
+
+    def execute(target: Tuple[Any, Any]) -> str:
+        obj, name = target
+        return obj[name].resolve()  # type: ignore
+
+    with concurrent.futures.ThreadPoolExecutor(max(jobs, 1)) as pool:
+        outputs = list(pool.map(execute, targets))
+
+    for (obj, name), output in zip(targets, outputs):
+        obj[name] = output
+    return value
+
+
+def parse(f: IO[str], parser: Optional[str] = None) -> dict:
+    """
+    Parse the TOML file `f` as is.
+
+    Unlike `load()`, commands aren't executed, other files aren't
+    included and nothing is cached.
+    """
+    data = _parse(f, parser or _parser(), f.name)
+    result = _convert(data, dict)  # type: dict
+    return result
+
+
+def _load_file(
+        path: str,
+        parser: str,
+        timeout: Optional[float],
+        seen: Set[str],
+) -> dict:
+    """
+    Load a single configuration file along with its includes.
+
+    Files in `seen` have already been loaded and are skipped.
     """
     try:
-        with open(os.path.expanduser(path), "r") as f:
-            decoder = ConfigDecoder(ConfigPermission(f), dict_class)
-            return toml.load(f, decoder=decoder)  # type: ignore
+        with open(os.path.expanduser(path)) as f:
+            realpath = os.path.realpath(f.name)
+            if realpath in seen:
+                return {}
+            seen.add(realpath)
+
+            cache = ConfigCache(f, parser)
+            entry = cache.get()
+            if entry:
+                data, commands = entry
+            else:
+                data = _convert(_parse(f, parser, path), dict)
+                commands = list(_find(data, _is_command))
+                cache.put(data, commands)
+
+            permission = ConfigPermission(f, cache.digest)
+            secrets = _secrets(realpath, cache.digest)
+            _substitute(data, commands, permission, timeout, secrets)
     except OSError as e:
         raise ConfigError("{}: {}".format(path, e.strerror))
-    except toml.TomlDecodeError as e:
-        raise ConfigError("{}: {}".format(path, e))
+
+    includes = data.pop("include", [])
+    valid = isinstance(includes, list)
+    if not valid or not all(isinstance(i, str) for i in includes):
+        raise ConfigError("{}: include must be a list of paths".format(path))
+
+    result = {}  # type: dict
+    for include in includes:
+        pattern = os.path.join(
+            os.path.dirname(realpath), os.path.expanduser(include)
+        )
+        for match in sorted(glob.glob(pattern)):
+            _merge(result, _load_file(match, parser, timeout, seen))
+    _merge(result, data)
+    return result
+
+
+def _merge(target: dict, source: dict) -> None:
+    """
+    Recursively merge `source` into `target`.
+    """
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+def _secrets(config: str, digest: str) -> ConfigSecrets:
+    """
+    Return the storage to use for the output of commands.
+    """
+    if ConfigAgent.available():
+        return ConfigAgent(digest, config)
+    if ConfigKeyring.available():
+        return ConfigKeyring(digest)
+    return ConfigSecrets(digest)
+
+
+@functools.lru_cache(maxsize=None)
+def _parser() -> str:
+    """
+    Return the name of the preferred TOML parser that is available.
+    """
+    for name in PARSERS:
+        if importlib.util.find_spec(name):
+            return name
+    return PARSERS[-1]  # pragma: no cover
+
+
+def _parse(f: IO[str], parser: str, path: str) -> dict:
+    """
+    Parse a TOML file with `parser`.
+
+    Parsers differ in how they describe errors, so only the line of an
+    error is reported.
+    """
+    module = importlib.import_module(parser)
+    error = getattr(module, "TOMLDecodeError", None) or module.TomlDecodeError
+    data = f.read()
+    try:
+        with COUNTERS.timed("parse"):
+            result = module.loads(data)  # type: dict
+    except error as e:
+        line = getattr(e, "lineno", None)
+        if line is None:
+            match = re.search(r"at line (\d+)", str(e))
+            line = int(match.group(1)) if match else len(data.splitlines())
+        msg = "{}: invalid TOML at line {}".format(path, line)
+        raise ConfigError(msg)
+    return result
+
+
+def _sha256(f: IO[str]) -> str:
+    with COUNTERS.timed("hash"):
+        return utils.sha256(f)
+
+
+def _is_command(value: Any) -> bool:
+    """
+    Check if `value` is a command substitution.
+
+    Commands are either strings surrounded with $() or tables with a
+    `command` and a `ttl`.
+    """
+    if isinstance(value, dict) and set(value) == {"command", "ttl"}:
+        value = value["command"]
+    if isinstance(value, str):
+        return value.startswith("$(") and value.endswith(")")
+    return False
+
+
+def _find(
+        value: Any,
+        pred: Callable[[Any], bool],
+        path: Optional[Location] = None,
+) -> Iterator[Location]:
+    """
+    Find the location of every value that matches `pred`.
+    """
+    path = path or []
+    if pred(value):
+        yield path
+        return
+
+    if isinstance(value, Mapping):
+        items = value.items()  # type: Any
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return
+
+    for k, v in items:
+        yield from _find(v, pred, path + [k])
+
+
+def _locate(data: Any, path: Location) -> Tuple[Any, Union[str, int]]:
+    """
+    Return the container and the name of the value at `path`.
+    """
+    *parents, name = path
+    for parent in parents:
+        data = data[parent]
+    return data, name
+
+
+def _substitute(
+        data: dict,
+        commands: List[Location],
+        permission: ConfigPermission,
+        timeout: Optional[float],
+        secrets: ConfigSecrets,
+) -> None:
+    """
+    Replace each command in `data` with a `ConfigCommand`.
+
+    Permission to execute commands is asked for up front.
+    """
+    if commands and not permission.ask():
+        msg = "need permission to execute command"
+        raise ConfigPermissionError(msg)
+
+    for path in commands:
+        obj, name = _locate(data, path)
+        value, ttl = obj[name], None
+        if isinstance(value, dict):
+            value, ttl = value["command"], value["ttl"]
+            if isinstance(ttl, bool) or not isinstance(ttl, int) or ttl < 0:
+                where = ".".join(str(p) for p in path)
+                raise ConfigError("invalid ttl for '{}'".format(where))
+        obj[name] = ConfigCommand(value, timeout, ttl, secrets)
+
+
+def _execute(value: str, timeout: Optional[float]) -> str:
+    """
+    Execute a command and return its output.
+    """
+    try:
+        args = value[2:-1].split()
+        output = subprocess.check_output(args, timeout=timeout)
+    except (OSError, subprocess.SubprocessError):
+        raise ConfigCommandError("{} failed".format(value))
+    return output.decode().strip()
+
+
+def _convert(value: Any, dict_class: Type[MutableMapping]) -> Any:
+    """
+    Recursively convert each dictionary in `value` to `dict_class`.
+
+    The time zone of each datetime is converted to `datetime.timezone`.
+    """
+    if isinstance(value, dict):
+        result = dict_class()
+        result.update((k, _convert(v, dict_class)) for k, v in value.items())
+        return result
+    if isinstance(value, list):
+        return [_convert(v, dict_class) for v in value]
+    if isinstance(value, datetime.datetime):
+        offset = value.utcoffset()
+        if offset is not None:
+            # `toml` uses its own class for time zones.
+            return value.replace(tzinfo=datetime.timezone(offset))
+    return value
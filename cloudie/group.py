@@ -1,9 +1,8 @@
-from typing import Any
+import importlib
+import sys
+from typing import Any, Dict, List, Optional
 
 import click
-from libcloud.common.exceptions import BaseHTTPError
-from libcloud.common.types import LibcloudError
-from requests.exceptions import RequestException
 
 
 class Group(click.Group):
@@ -13,14 +12,59 @@ class Group(click.Group):
     Exceptions from API calls in `libcloud` are re-raised as exceptions
     that click handles so that individual commands don't have to deal
     with them.
+
+    Sub-commands may be registered lazily with `lazy_commands`, which
+    maps a command name to a "module:attribute" string.  The module is
+    only imported once the command is looked up.
     """
 
+    def __init__(
+            self,
+            *args: Any,
+            lazy_commands: Optional[Dict[str, str]] = None,
+            **kwargs: Any
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        names = set(super().list_commands(ctx)) | set(self.lazy_commands)
+        return sorted(names)
+
+    def get_command(self, ctx: click.Context,
+                    cmd_name: str) -> Optional[click.Command]:
+        path = self.lazy_commands.get(cmd_name)
+        if path and cmd_name not in self.commands:
+            module, attr = path.split(":")
+            cmd = getattr(importlib.import_module(module), attr)
+            self.add_command(cmd, cmd_name)
+        return super().get_command(ctx, cmd_name)
+
     def invoke(self, ctx: click.Context) -> Any:
         try:
             return super().invoke(ctx)
-        except LibcloudError as e:
-            raise click.ClickException(e.value)
-        except (BaseHTTPError, NotImplementedError) as e:
+        except NotImplementedError as e:
             raise click.ClickException(str(e))
-        except RequestException:
-            raise click.ClickException("connection failure")
+        except Exception as e:
+            # libcloud (and by extension requests) is only imported by
+            # commands that instantiate a driver.  If it isn't loaded,
+            # the exception can't originate from it.
+            if "libcloud" in sys.modules:
+                _raise_libcloud_error(e)
+            raise
+
+
+def _raise_libcloud_error(e: Exception) -> None:
+    """
+    Re-raise exceptions from `libcloud` and `requests` for click.
+    """
+    from libcloud.common.exceptions import BaseHTTPError
+    from libcloud.common.types import LibcloudError
+    from requests.exceptions import RequestException
+
+    if isinstance(e, LibcloudError):
+        raise click.ClickException(e.value)
+    if isinstance(e, BaseHTTPError):
+        raise click.ClickException(str(e))
+    if isinstance(e, RequestException):
+        raise click.ClickException("connection failure")
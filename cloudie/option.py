@@ -1,8 +1,12 @@
-import inspect
-from typing import Any, Callable, Optional, Union
+import collections
+import functools
+import hashlib
+import threading
+from typing import Any, Callable, Mapping, Optional, Tuple, Union
 
 import click
-import libcloud
+
+from . import config
 
 
 class Option(click.Option):
@@ -18,6 +22,8 @@ class Option(click.Option):
         except (AttributeError, KeyError):
             return super().get_default(ctx)
 
+        value = _resolve(ctx, value)
+
         # For strings, `StringParamType` only cares for instances of
         # bytes -- which makes sense since command-line arguments are
         # strings already.  However, configuration values may not be
@@ -27,6 +33,58 @@ class Option(click.Option):
         return self.type_cast_value(ctx, str(value))
 
 
+class DriverCache:
+    """
+    Bounded cache for instantiated drivers.
+
+    Drivers are keyed by driver type, provider, role and a digest of
+    the credentials and options that they're instantiated with.  This
+    lets repeated commands in the same process (e.g. when `cloudie` is
+    used as a library) reuse drivers along with their authenticated
+    keep-alive connections.  The least recently used driver is evicted
+    once more than `size` drivers are cached.
+    """
+
+    def __init__(self, size: int = 8) -> None:
+        self.size = size
+        self._drivers = collections.OrderedDict()  # type: dict
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._drivers)
+
+    def get(self, key: Tuple, factory: Callable[[], Any]) -> Any:
+        """
+        Retrieve the driver for `key`, or create it with `factory`.
+        """
+        with self._lock:
+            driver = self._drivers.pop(key, None)
+            if driver is not None:
+                self._drivers[key] = driver
+                return driver
+
+        # Drivers may connect when they're instantiated, so the lock
+        # isn't held.
+        driver = factory()
+        with self._lock:
+            self._drivers[key] = driver
+            while len(self._drivers) > self.size:
+                del self._drivers[next(iter(self._drivers))]
+        return driver
+
+    def evict(self, role: Optional[str] = None) -> None:
+        """
+        Evict the drivers for `role`, or every driver if `role` is None.
+        """
+        with self._lock:
+            for key in list(self._drivers):
+                if role is None or key[2] == role:
+                    del self._drivers[key]
+
+
+DRIVERS = DriverCache()
+
+
 def add(*param_decls: str, **attrs: Any) -> Callable:
     """
     Add a click option with a custom `Option` class.
@@ -37,6 +95,10 @@ def add(*param_decls: str, **attrs: Any) -> Callable:
 def pass_driver(driver_type: object) -> Callable:
     """
     Add `--role` as a required option and instantiate its driver.
+
+    `driver_type` is either a provider class from `libcloud` or the
+    name of an attribute in `libcloud.DriverType` (e.g. "compute").
+    The latter avoids importing `libcloud` until a driver is needed.
     """
 
     def callback(
@@ -44,35 +106,138 @@ def pass_driver(driver_type: object) -> Callable:
             _param: Union[click.Option, click.Parameter],
             role: Optional[str],
     ) -> Any:
-        role = role or ctx.obj.config.get("role", {}).get("default")
-        if not role:
-            raise click.ClickException("missing --role and role.default")
+        role = role or _default_role(ctx)
+        driver = _driver(ctx, driver_type, role)
+        ctx.obj.role = ctx.obj.config.role[role]
+        ctx.obj.role_name = role
+        return driver
 
-        try:
-            ctx.obj.role = ctx.obj.config.role[role]
-            provider = ctx.obj.role.provider
-            key = ctx.obj.role.key
-            other = {
-                k: v
-                for k, v in ctx.obj.role.items()
-                if k not in ["provider", "key"]
-            }
-        except KeyError:
-            raise click.ClickException("unknown role '{}'".format(role))
-        except AttributeError as e:
-            raise click.ClickException("missing '{}' for '{}'".format(e, role))
+    return add("--role", "driver", is_eager=True, callback=callback)
 
-        try:
-            driver = libcloud.get_driver(driver_type, provider)
-            params = inspect.signature(driver).parameters
-            kwargs = {k: v for k, v in other.items() if k in params}
 
-            # See the comment on secure/allow_insecure in security.py.
-            if "secure" in params:
-                kwargs["secure"] = True
+def pass_drivers(driver_type: object) -> Callable:
+    """
+    Add `--role`, `--all-roles` and `--jobs` and pass a list of drivers.
+
+    `--role` may be given multiple times, and `--all-roles` selects
+    every role in the configuration.  If neither is given, the default
+    role is used.  The command is passed a list of `(role, factory)`
+    tuples, where `factory` instantiates the driver for that role (see
+    `pass_driver`).  Drivers are instantiated by the command rather
+    than here so that a failure for one role doesn't prevent the others
+    from being used.
+    """
 
-            return driver(key, **kwargs)
-        except AttributeError as e:
-            raise click.ClickException("{}".format(e))
+    def decorator(func: Callable) -> Callable:
+        @click.option(
+            "--role",
+            "roles",
+            multiple=True,
+            help="Role to use; may be given multiple times.",
+        )
+        @click.option("--all-roles", is_flag=True, help="Use every role.")
+        @click.option(
+            "--jobs",
+            default=8,
+            type=click.IntRange(min=1),
+            help="Number of roles to use concurrently.",
+        )
+        @click.pass_context
+        @functools.wraps(func)
+        def command(
+                ctx: click.Context,
+                roles: Tuple[str, ...],
+                all_roles: bool,
+                **kwargs: Any,
+        ) -> Any:
+            if all_roles:
+                roles = tuple(
+                    k for k, v in ctx.obj.config.get("role", {}).items()
+                    if isinstance(v, Mapping)
+                )
+                if not roles:
+                    raise click.ClickException("no roles in the configuration")
+            elif not roles:
+                roles = (_default_role(ctx), )
 
-    return add("--role", "driver", is_eager=True, callback=callback)
+            drivers = [(
+                role,
+                functools.partial(_driver, ctx, driver_type, role),
+            ) for role in collections.OrderedDict.fromkeys(roles)]
+            return func(drivers, **kwargs)
+
+        return command  # type: ignore
+
+    return decorator
+
+
+def _default_role(ctx: click.Context) -> str:
+    """
+    Retrieve the default role.
+    """
+    role = _resolve(ctx, ctx.obj.config.get("role", {}).get("default"))
+    if not role:
+        raise click.ClickException("missing --role and role.default")
+    return str(role)
+
+
+def _driver(ctx: click.Context, driver_type: object, role: str) -> Any:
+    """
+    Instantiate the driver for `role`.
+    """
+    try:
+        conf = ctx.obj.config.role[role]
+        provider = _resolve(ctx, conf.provider)
+        key = conf.key
+        other = {k: v for k, v in conf.items() if k not in ["provider", "key"]}
+    except KeyError:
+        raise click.ClickException("unknown role '{}'".format(role))
+    except AttributeError as e:
+        raise click.ClickException("missing '{}' for '{}'".format(e, role))
+
+    # `libcloud` is imported lazily to keep startup fast for commands
+    # that never instantiate a driver.  Importing `security` monkey
+    # patches `libcloud`; it must happen before any driver is used.
+    import libcloud
+    from . import providers, security
+
+    assert security  # to make pyflakes happy
+
+    dtype = driver_type
+    if isinstance(dtype, str):
+        dtype = getattr(libcloud.DriverType, dtype.upper())
+
+    try:
+        driver = libcloud.get_driver(dtype, provider)
+        params = providers.capabilities(driver).params
+        kwargs = {k: v for k, v in other.items() if k in params}
+
+        # Only the commands for values that are used by the driver are
+        # executed.
+        key, kwargs = _resolve(ctx, [key, kwargs])
+
+        # See the comment on secure/allow_insecure in security.py.
+        if "secure" in params:
+            kwargs["secure"] = True
+
+        creds = repr((key, sorted(kwargs.items()))).encode()
+        digest = hashlib.sha256(creds).hexdigest()
+        return DRIVERS.get(
+            (dtype, provider, role, digest),
+            lambda: driver(key, **kwargs),
+        )
+    except AttributeError as e:
+        raise click.ClickException("{}".format(e))
+
+
+def _resolve(ctx: click.Context, value: Any) -> Any:
+    """
+    Execute any command substitutions in a configuration value.
+
+    Commands in the configuration are executed lazily (see
+    `config.load()`), so values have to be resolved before use.
+    """
+    try:
+        return config.resolve(value, ctx.obj.get("config_jobs", 4))
+    except config.ConfigError as e:
+        raise click.ClickException(str(e))
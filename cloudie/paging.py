@@ -0,0 +1,129 @@
+import collections
+import concurrent.futures
+import itertools
+import math
+import threading
+import urllib.parse
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from . import utils
+
+# Default number of pages to retrieve concurrently (see `--page-jobs`).
+JOBS = 4
+
+# API endpoints for the list methods of DigitalOcean: the path, the key
+# with the objects in each response and the method that converts each
+# object.
+DIGITALOCEAN = {
+    "list_images": ("/v2/images", "images", "_to_image"),
+    "list_key_pairs": ("/v2/account/keys", "ssh_keys", "_to_key_pair"),
+    "list_locations": ("/v2/regions", "regions", "_to_location"),
+    "list_nodes": ("/v2/droplets", "droplets", "_to_node"),
+    "list_sizes": ("/v2/sizes", "sizes", "_to_size"),
+}
+
+
+def iterate(func: Callable, jobs: Optional[int] = None) -> Iterable[Any]:
+    """
+    Iterate over the instances returned by the list method `func`.
+
+    For drivers with paginated APIs, instances are retrieved one page at
+    a time as they're consumed, so the iteration may be stopped early
+    without retrieving the remaining pages.  If the number of pages is
+    known after the first one, up to `jobs` (or `JOBS`) of the following
+    pages are retrieved concurrently ahead of the consumer.  Otherwise,
+    this is the same as calling `func`.
+    """
+    driver = getattr(func, "__self__", None)
+    name = getattr(func, "__name__", None)
+
+    if driver is not None and name in DIGITALOCEAN:
+        from libcloud.common.digitalocean import DigitalOcean_v2_BaseDriver
+        if isinstance(driver, DigitalOcean_v2_BaseDriver):
+            path, key, convert = DIGITALOCEAN[name]
+            return _digitalocean(
+                driver,
+                path,
+                key,
+                getattr(driver, convert),
+                jobs or JOBS,
+            )
+
+    return func()  # type: ignore
+
+
+def _digitalocean(
+        driver: Any,
+        path: str,
+        key: str,
+        convert: Callable,
+        jobs: int,
+) -> Iterator[Any]:
+    """
+    Retrieve each page for `path` from DigitalOcean.
+
+    The number of objects per page is set by the driver (see
+    `ex_per_page`).
+    """
+    data = driver.connection.request(path, params={"page": 1}).object
+    yield from map(convert, data[key])
+
+    last = _last_page(driver, data)
+    if last is None:
+        # The number of pages is unknown; follow the links instead.
+        page = 1
+        while "next" in data.get("links", {}).get("pages", {}):
+            page += 1
+            response = driver.connection.request(path, params={"page": page})
+            data = response.object
+            yield from map(convert, data[key])
+        return
+
+    # Each thread uses its own copy of the driver (see
+    # `utils.copy_driver()`).
+    local = threading.local()
+
+    def fetch(page: int) -> list:
+        if not hasattr(local, "driver"):
+            local.driver = utils.copy_driver(driver)
+        response = local.driver.connection.request(path, params={"page": page})
+        return list(response.object[key])
+
+    pages = iter(range(2, last + 1))
+    futures = collections.deque()  # type: collections.deque
+    with concurrent.futures.ThreadPoolExecutor(jobs) as pool:
+        try:
+            for page in itertools.islice(pages, jobs):
+                futures.append(pool.submit(fetch, page))
+
+            while futures:
+                values = futures.popleft().result()
+                for page in itertools.islice(pages, 1):
+                    futures.append(pool.submit(fetch, page))
+                yield from map(convert, values)
+        finally:
+            # The consumer may stop early.
+            for future in futures:
+                future.cancel()
+
+
+def _last_page(driver: Any, data: dict) -> Optional[int]:
+    """
+    Find the number of pages from the first page of a response.
+
+    The number is taken from the link to the last page, or from the
+    total number of objects.
+    """
+    links = data.get("links", {}).get("pages", {})
+    if "next" not in links:
+        return 1
+
+    query = urllib.parse.urlparse(links.get("last", "")).query
+    page = urllib.parse.parse_qs(query).get("page")
+    if page:
+        return int(page[0])
+
+    total = data.get("meta", {}).get("total")
+    if total:
+        return int(math.ceil(total / driver.ex_per_page))
+    return None
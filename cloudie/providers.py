@@ -0,0 +1,197 @@
+import contextlib
+import inspect
+import marshal
+import pathlib
+import sys
+import threading
+from typing import Callable, List, NamedTuple, Tuple
+
+import click
+
+from . import table, utils
+
+Capabilities = NamedTuple(
+    "Capabilities", [
+        ("params", Tuple[str, ...]),
+        ("key_import", str),
+        ("auth", Tuple[str, ...]),
+        ("getters", Tuple[Tuple[str, str], ...]),
+    ]
+)
+
+# Methods that may retrieve a single instance by ID, by the name of the
+# method that lists every instance.  Only methods that are implemented
+# by a driver, and that take an ID as their first argument, are used.
+GETTERS = {
+    "list_images": ("get_image", ),
+    "list_nodes": ("ex_get_node", "ex_get_node_details"),
+}
+
+# Names of the first parameter of a method that takes an ID.
+ID_PARAMS = ("id", "image_id", "node_id")
+
+
+class CapabilityCache:
+    """
+    Cache for the capabilities of driver classes.
+
+    Capabilities are found by introspecting driver classes.  They're
+    kept in memory and serialized with `marshal` to the cache
+    directory.  The entries are discarded if the version of `libcloud`
+    or Python changes.
+
+    Only classes are cached; anything else (e.g. mocks) is introspected
+    on every lookup.
+    """
+
+    # Bump this if the format of the entries is changed.
+    VERSION = (2, sys.hexversion)
+
+    def __init__(self) -> None:
+        self._classes = {}  # type: dict
+        self._entries = {}  # type: dict
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get(self, driver: Callable) -> Capabilities:
+        """
+        Retrieve the capabilities of `driver`.
+        """
+        if not isinstance(driver, type):
+            return _inspect(driver)
+
+        with self._lock:
+            entry = self._classes.get(driver)
+            if entry is None:
+                entries = self._load()
+                name = "{}:{}".format(driver.__module__, driver.__qualname__)
+                entry = entries.get(name)
+                if entry is None:
+                    entry = entries[name] = tuple(_inspect(driver))
+                    self._save(entries)
+                self._classes[driver] = entry
+            return Capabilities(*entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._classes.clear()
+            self._entries = {}
+            self._loaded = False
+
+    def _load(self) -> dict:
+        if not self._loaded:
+            self._loaded = True
+            with contextlib.suppress(OSError, EOFError, ValueError, TypeError):
+                version, entries = marshal.loads(self._path().read_bytes())
+                if version == self._version():
+                    self._entries = entries
+        return self._entries
+
+    def _save(self, entries: dict) -> None:
+        data = marshal.dumps((self._version(), entries))
+        with contextlib.suppress(OSError):
+            utils.write_atomic(self._path(), data)
+
+    def _version(self) -> Tuple:
+        import libcloud
+        return self.VERSION + (libcloud.__version__, )
+
+    @staticmethod
+    def _path() -> pathlib.Path:
+        return utils.cache_dir().joinpath("capabilities")
+
+
+CAPABILITIES = CapabilityCache()
+
+
+def capabilities(driver: Callable) -> Capabilities:
+    """
+    Retrieve the capabilities of a driver class.
+    """
+    return CAPABILITIES.get(driver)
+
+
+def compute_matrix() -> List[Tuple[str, Capabilities]]:
+    """
+    Retrieve the capabilities of every compute driver in `libcloud`.
+
+    Drivers that can't be imported (e.g. due to missing dependencies)
+    are skipped.
+    """
+    from libcloud.compute.providers import DRIVERS, get_driver
+
+    matrix = []
+    for name in sorted(DRIVERS):
+        try:
+            driver = get_driver(name)
+        except ImportError:
+            continue
+        matrix.append((name, capabilities(driver)))
+    return matrix
+
+
+@click.command()
+def providers() -> None:
+    """
+    List the capabilities of compute providers.
+    """
+    table.show([
+        ["Provider", "name"],
+        ["Key import", "key_import"],
+        ["Auth", "auth"],
+        ["Parameters", "params"],
+        ["Lookups", "getters"],
+    ], [
+        dict(
+            name=name,
+            key_import=caps.key_import,
+            auth=list(caps.auth),
+            params=[p for p in caps.params if p not in ["key", "kwargs"]],
+            getters=[getter for _name, getter in caps.getters],
+        ) for name, caps in compute_matrix()
+    ])
+
+
+def _inspect(driver: Callable) -> Capabilities:
+    """
+    Introspect a driver class.
+
+    `key_import` is the name of the method that imports public keys.
+    Some drivers implement `import_key_pair_from_string()`, whereas
+    others use `create_key_pair()` to import keys (see the
+    `import-key-pair` command).
+    """
+    params = tuple(inspect.signature(driver).parameters)
+
+    key_import = ""
+    create_key_pair = getattr(driver, "create_key_pair", None)
+    if create_key_pair:
+        key_import = "import_key_pair_from_string"
+        if "public_key" in inspect.signature(create_key_pair).parameters:
+            key_import = "create_key_pair"
+
+    features = getattr(driver, "features", {})
+    auth = tuple(features.get("create_node", []))
+
+    getters = []
+    for name, candidates in sorted(GETTERS.items()):
+        getter = next((g for g in candidates if _takes_id(driver, g)), None)
+        if getter:
+            getters.append((name, getter))
+    return Capabilities(params, key_import, auth, tuple(getters))
+
+
+def _takes_id(driver: Callable, name: str) -> bool:
+    """
+    Check if `driver` implements a method `name` that takes an ID.
+    """
+    from libcloud.compute.base import NodeDriver
+
+    method = getattr(driver, name, None)
+    if not method or method is getattr(NodeDriver, name, None):
+        return False
+
+    params = list(inspect.signature(method).parameters)
+    if params and params[0] == "self":
+        params = params[1:]
+    return bool(params) and params[0] in ID_PARAMS
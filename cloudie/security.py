@@ -2,6 +2,7 @@ from typing import Any
 
 import libcloud.common.base
 import libcloud.common.ovh
+import libcloud.compute.base
 import libcloud.compute.ssh
 import libcloud.security
 
@@ -63,5 +64,11 @@ for cls in SSH_CLIENTS:
     assert hasattr(libcloud.compute.ssh, cls)
     setattr(libcloud.compute.ssh, cls, NoSSH)
 
+# `libcloud.compute.base` imports `SSHClient` by name.  Since `libcloud`
+# is imported lazily, it may have been imported before this module, so
+# its reference is patched as well.
+assert hasattr(libcloud.compute.base, "SSHClient")
+setattr(libcloud.compute.base, "SSHClient", NoSSH)
+
 # This has been enabled by default for some time, but just in case.
 libcloud.security.VERIFY_SSL_CERT = True
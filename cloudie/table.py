@@ -1,10 +1,43 @@
+import functools
+import itertools
+import re
 import shutil
-from typing import Any, List
+import sys
+from typing import TYPE_CHECKING, Any, Callable, Iterable, List, Optional
 
-import texttable
+if TYPE_CHECKING:  # pragma: no cover
+    import textwrap
 
+# Show rows as they're retrieved instead of once every row has been
+# retrieved (see `--stream` in `cli`).
+STREAM = False
 
-def show(columns: List[List[str]], rows: List[object]) -> None:
+# Number of rows that column widths are computed from when streaming.
+SAMPLE = 100
+
+# Output formats for `show()` (see `--output` in `cli`).  Other formats
+# than "table" are written one row at a time, without computing widths.
+FORMATS = ("table", "jsonl", "csv", "tsv")
+FORMAT = "table"
+
+# Cut cells that are wider than their column instead of wrapping them
+# (see `--truncate` in `cli`).
+TRUNCATE = False
+
+# Number of rows that are written at once.
+CHUNK = 1000
+
+# Cells that are laid out the same by `texttable` as by `str.ljust()`,
+# as long as they're no wider than their column.  Any other cell is
+# measured and wrapped with the helpers from `texttable`.
+PLAIN = re.compile(r"(?:[ -~]*[!-~])?\Z")
+
+
+def show(
+        columns: List[List[str]],
+        rows: Iterable[object],
+        widths: Optional[List[int]] = None,
+) -> None:
     """
     Show a table with the given columns for each row.
 
@@ -12,38 +45,292 @@ def show(columns: List[List[str]], rows: List[object]) -> None:
         header for that column.  The proceeding string(s) specifies the
         attribute name(s) for that column in `rows`.  The first found
         attribute is used as the column value.
-    :param rows: A list of objects to retrieve the column values from.
+    :param rows: An iterable of objects to retrieve the column values
+        from.  Only the column values of each object are kept.
+    :param widths: The width of each column when streaming.  By default,
+        the widths are computed from the header and the first `SAMPLE`
+        rows.
+    """
+    if FORMAT == "jsonl":
+        _jsonl(columns, rows)
+        return
+    if FORMAT in ("csv", "tsv"):
+        _csv(columns, rows, "\t" if FORMAT == "tsv" else ",")
+        return
+    if STREAM:
+        _stream(columns, rows, widths)
+        return
+
+    header = [column[0] for column in columns]
+    values = _compile(columns)
+    cells = [_cells(values(row)) for row in rows]
+    _draw(header, cells, _widths([header] + cells), CHUNK)
+
+
+def _stream(
+        columns: List[List[str]],
+        rows: Iterable[object],
+        widths: Optional[List[int]],
+) -> None:
+    """
+    Write a table one row at a time.
+
+    The table looks like the one drawn by `show()`, except that the
+    column widths are fixed before any row is written.  Only the sampled
+    rows are kept in memory.
+    """
+    header = [column[0] for column in columns]
+    values = _compile(columns)
+    cells = (_cells(values(row)) for row in rows)
+    sample = []  # type: List[List[str]]
+    if widths is None:
+        sample = list(itertools.islice(cells, SAMPLE))
+        widths = _widths([header] + sample)
+
+    _draw(header, itertools.chain(sample, cells), widths, 1)
+
+
+def _draw(
+        header: List[str],
+        rows: Iterable[List[str]],
+        widths: List[int],
+        chunk: int,
+) -> None:
+    """
+    Write a table with `texttable.VLINES | texttable.HEADER` as deco.
+
+    The output is the same as from `texttable`, unless `TRUNCATE` is
+    set.  `widths` are shrunk to fit the terminal and `rows` are written
+    `chunk` rows at a time.
+    """
+    widths = _fit(widths, shutil.get_terminal_size().columns)
+    separator = "=+=".join("=" * width for width in widths) + "\n"
+
+    write = sys.stdout.write
+    write(_line(header, widths, header=True) + separator)
+    rows = iter(rows)
+    while True:
+        lines = [_line(row, widths) for row in itertools.islice(rows, chunk)]
+        if not lines:
+            break
+        write("".join(lines))
+        sys.stdout.flush()
+
+
+def _jsonl(columns: List[List[str]], rows: Iterable[object]) -> None:
+    """
+    Write each row as a JSON object, keyed by the header of each column.
+
+    Missing values are null, and values that aren't supported by JSON
+    are written as strings.
+    """
+    import json
+
+    header = [column[0] for column in columns]
+    values = _compile(columns)
+    write = sys.stdout.write
+    for row in rows:
+        obj = dict(zip(header, values(row)))
+        write(json.dumps(obj, default=str) + "\n")
+
+
+def _csv(
+        columns: List[List[str]],
+        rows: Iterable[object],
+        delimiter: str,
+) -> None:
+    """
+    Write a header and each row as delimiter-separated values.
+    """
+    import csv
+
+    writer = csv.writer(sys.stdout, delimiter=delimiter, lineterminator="\n")
+    writer.writerow([column[0] for column in columns])
+    values = _compile(columns)
+    for row in rows:
+        writer.writerow(_cells(values(row)))
+
+
+def _compile(columns: List[List[str]]) -> Callable[[object], List[Any]]:
+    """
+    Compile `columns` into a function that retrieves the value of each
+    column in a row, or None.
+
+    Each name is a path of keys or attributes separated by dots, and
+    the value of the first name that isn't empty is used.  Names are
+    split once here rather than once for every row.
+    """
+    paths = []
+    for column in columns:
+        paths.append(tuple(tuple(name.split(".")) for name in column[1:]))
+
+    def values(row: object) -> List[Any]:
+        found = []
+        for alternatives in paths:
+            value = None
+            for path in alternatives:
+                obj = row
+                for elem in path:
+                    if isinstance(obj, dict):
+                        obj = obj.get(elem)
+                    else:
+                        obj = getattr(obj, elem, None)
+                if obj:
+                    value = obj
+                    break
+            found.append(value)
+        return found
+
+    return values
+
+
+def _cells(values: List[Any]) -> List[str]:
+    """
+    Convert the values of a row to text.
+    """
+    cells = []
+    for value in values:
+        if value is None:
+            value = ""
+        elif isinstance(value, list):
+            value = ", ".join(str(elm) for elm in value) or value
+        cells.append(str(value))
+    return cells
+
+
+def _widths(rows: List[List[str]]) -> List[int]:
+    """
+    Compute the width of each column from the widest line of each cell.
     """
-    size = shutil.get_terminal_size()
-    table = texttable.Texttable(max_width=size.columns)
-    table.set_deco(table.VLINES | table.HEADER)
+    plain = PLAIN.match
+    widths = [0] * len(rows[0])
+    for row in rows:
+        for i, cell in enumerate(row):
+            width = len(cell) if plain(cell) else _width(cell)
+            if width > widths[i]:
+                widths[i] = width
+    return widths
 
-    table.header([column[0] for column in columns])
-    table.set_cols_dtype(["t" for _ in range(len(columns))])
 
-    table.add_rows([[[
-        next((
-            isinstance(v, list) and ", ".join(str(elm) for elm in v)
-            or v for v in (_get_value(row, name) for name in column[1:]) if v
-        ), "")
-    ][0] for column in columns] for row in rows], False)
+def _width(cell: str) -> int:
+    """
+    Compute the width of the widest line in `cell` as `texttable` does,
+    with tab stops every 8 columns.
+    """
+    import texttable
 
-    print(table.draw())
+    widest = 0
+    for line in cell.split("\n"):
+        width = 0
+        parts = line.split("\t")
+        for part in parts[:-1]:
+            width = (width + texttable.len(part)) // 8 * 8 + 8
+        widest = max(widest, width + texttable.len(parts[-1]))
+    return widest
 
 
-def _get_value(obj: object, name: str, default: Any = None) -> Any:
+def _fit(widths: List[int], max_width: int) -> List[int]:
     """
-    Recursively retrieve a value from an object.
+    Shrink `widths` to fit within `max_width`.
 
-    :param obj: An object to retrieve the value from.
-    :param name: The name of the value.
-    :param default: Default value if `name` isn't found.
-    :returns: The value for `name` or `default`.
+    As with `texttable`, the available width is handed out one character
+    at a time to each column in turn, up to its original width.
     """
-    for elem in name.split("."):
-        if isinstance(obj, dict):
-            obj = obj.get(elem, default)
+    available = max_width - 3 * (len(widths) - 1)
+    if sum(widths) <= available:
+        return widths
+    if available < len(widths):
+        raise ValueError("max_width too low to render data")
+
+    fitted = [0] * len(widths)
+    i = 0
+    while available > 0:
+        if fitted[i] < widths[i]:
+            fitted[i] += 1
+            available -= 1
+        i = (i + 1) % len(widths)
+    return fitted
+
+
+def _line(row: List[str], widths: List[int], header: bool = False) -> str:
+    """
+    Format a row, where each cell is wrapped to the width of its column
+    (or cut if `TRUNCATE` is set and the row isn't the header).
+
+    Header cells are centered and other cells are left-aligned.
+    """
+    plain = PLAIN.match
+    truncate = TRUNCATE and not header
+
+    cells = []
+    for cell, width in zip(row, widths):
+        if not plain(cell):
+            cells.append(_lines(cell, width, header, truncate))
+        elif len(cell) <= width or truncate:
+            cell = cell[:width]
+            cells.append([_align(cell, width - len(cell), header)])
         else:
-            obj = getattr(obj, elem, default)
+            lines = _wrapper(width).wrap(cell)
+            cells.append([_align(x, width - len(x), header) for x in lines])
+
+    if all(len(lines) == 1 for lines in cells):
+        return " | ".join(lines[0] for lines in cells) + "\n"
+
+    out = []
+    for i in range(max(len(lines) for lines in cells)):
+        parts = []
+        for lines, width in zip(cells, widths):
+            parts.append(lines[i] if i < len(lines) else " " * width)
+        out.append(" | ".join(parts) + "\n")
+    return "".join(out)
+
+
+def _lines(cell: str, width: int, header: bool, truncate: bool) -> List[str]:
+    """
+    Split `cell` into aligned lines as `texttable` does.
+    """
+    import texttable
+
+    lines = []  # type: List[str]
+    for part in cell.split("\n"):
+        if not part.strip():
+            lines.append("")
+        elif truncate:
+            lines.append(_truncate(part.expandtabs(), width))
+        else:
+            lines.extend(texttable.textwrapper(part, width))
+
+    return [
+        _align(line, width - texttable.len(line), header) for line in lines
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _wrapper(width: int) -> "textwrap.TextWrapper":
+    """
+    Return a wrapper for plain cells, which are wrapped the same way by
+    `texttable`.
+    """
+    import textwrap
+
+    return textwrap.TextWrapper(width)
+
+
+def _truncate(text: str, width: int) -> str:
+    """
+    Cut `text` to at most `width` columns.
+    """
+    import texttable
+
+    used = 0
+    for i, char in enumerate(text):
+        used += texttable.uchar_width(char)
+        if used > width:
+            return text[:i]
+    return text
+
 
-    return obj or default
+def _align(text: str, fill: int, header: bool) -> str:
+    if header:
+        return " " * (fill // 2) + text + " " * (fill - fill // 2)
+    return text + " " * fill
@@ -1,9 +1,18 @@
 import base64
+import collections
+import contextlib
+import copy
 import hashlib
-from typing import IO, Tuple
+import os
+import pathlib
+import threading
+import time
+from typing import IO, Any, Iterator, Tuple
 
 import click
 
+from . import __project__
+
 
 def read_public_key(f: IO[str]) -> Tuple[str, str, str, str]:
     """
@@ -24,13 +33,91 @@ def read_public_key(f: IO[str]) -> Tuple[str, str, str, str]:
     raise click.ClickException("{} is not a valid SSH key".format(f.name))
 
 
-def sha256(f: IO[str]) -> str:
+def sha256(f: IO[str], size: int = 65536) -> str:
     """
     Calculate the sha256 message digest for a file.
+
+    The file is read in chunks of `size` characters.
     """
     pos = f.tell()
     f.seek(0)
-    digest = hashlib.sha256(f.read().encode()).hexdigest()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(size), ""):
+        digest.update(chunk.encode())
     f.seek(pos)
 
-    return digest
+    return digest.hexdigest()
+
+
+def cache_dir() -> pathlib.Path:
+    """
+    Return the cache directory, creating it if necessary.
+    """
+    cache = pathlib.Path.home().joinpath(".cache", __project__)
+    cache.mkdir(parents=True, exist_ok=True)
+    return cache
+
+
+def write_atomic(path: pathlib.Path, data: bytes) -> None:
+    """
+    Atomically replace `path` with a file that is only readable by the
+    current user.
+    """
+    tmp = path.with_suffix(".tmp")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    fd = os.open(str(tmp), flags, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(str(tmp), str(path))
+
+
+def copy_driver(driver: Any) -> Any:
+    """
+    Copy a `libcloud` driver with a separate HTTP connection.
+
+    `libcloud` connections aren't thread-safe; the response of a request
+    is kept on the connection until it's read.  A driver that's used by
+    several threads at once must therefore be copied for each thread.
+
+    The driver is copied without calling `__new__()` with arguments,
+    which some drivers (e.g. DigitalOcean) require.
+    """
+    copied = object.__new__(type(driver))
+    copied.__dict__.update(vars(driver))
+    driver = copied
+    driver.connection = copy.copy(driver.connection)
+    driver.connection.connection = None
+    return driver
+
+
+class Counters:
+    """
+    Counters for the cost of operations.
+
+    The number of calls and the accumulated time in seconds is recorded
+    for each operation by name.
+    """
+
+    def __init__(self) -> None:
+        self.calls = collections.Counter()  # type: collections.Counter
+        self.time = collections.defaultdict(float)  # type: dict
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        """
+        Record a call to `name` and the time spent in it.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.calls[name] += 1
+                self.time[name] += elapsed
+
+    def clear(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.time.clear()
@@ -0,0 +1,114 @@
+import collections
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Optional
+
+from . import paging, providers
+
+if TYPE_CHECKING:  # pragma: no cover
+    from libcloud.common.base import BaseDriver
+
+# Seconds between polls.  The first poll is immediate, after which the
+# delay starts at `INITIAL` and grows by `FACTOR` up to `MAXIMUM`.
+INITIAL = 1.0
+FACTOR = 1.5
+MAXIMUM = 15.0
+
+# While no more than this many nodes are pending, they're retrieved one
+# at a time by ID if the driver supports it (see `providers.GETTERS`).
+# Otherwise, a single listing is shared by every pending node.
+SINGLE = 3
+
+
+class WaitTimeout(Exception):
+    """
+    Raised if nodes aren't running in time.
+
+    `nodes` has the latest state of every node.
+    """
+
+    def __init__(self, msg: str, nodes: List[Any]) -> None:
+        super().__init__(msg)
+        self.nodes = nodes
+
+
+def wait_until_running(
+        driver: "BaseDriver",
+        nodes: List[Any],
+        timeout: float = 600,
+        callback: Optional[Callable[[Any, str], None]] = None,
+) -> List[Any]:
+    """
+    Wait until every node in `nodes` is running with a public IP.
+
+    Unlike `NodeDriver.wait_until_running()`, which lists every node in
+    the account at a fixed interval, pending nodes are polled by ID when
+    possible, and polls are frequent at first and sparser later.  Each
+    time the state of a node changes, `callback` is called with the
+    updated node and its previous state.
+
+    The updated nodes are returned in order.  `WaitTimeout` is raised if
+    they aren't running within `timeout` seconds.
+    """
+    current = collections.OrderedDict((node.id, node) for node in nodes)
+    getters = dict(providers.capabilities(type(driver)).getters)
+    deadline = time.monotonic() + timeout
+    delay = 0.0
+
+    while True:
+        pending = [i for i, node in current.items() if not _running(node)]
+        if not pending:
+            return list(current.values())
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            names = ", ".join(current[i].name for i in pending)
+            msg = "timed out after {} seconds waiting for {}"
+            raise WaitTimeout(
+                msg.format(timeout, names), list(current.values())
+            )
+
+        time.sleep(min(delay, remaining))
+        delay = min(max(delay * FACTOR, INITIAL), MAXIMUM)
+
+        for node in _poll(driver, getters.get("list_nodes"), pending):
+            previous = current[node.id].state
+            current[node.id] = node
+            if callback and node.state != previous:
+                callback(node, previous)
+
+
+def _running(node: Any) -> bool:
+    from libcloud.compute.types import NodeState
+
+    return bool(node.state == NodeState.RUNNING and node.public_ips)
+
+
+def _poll(
+        driver: "BaseDriver",
+        getter: Optional[str],
+        ids: List[str],
+) -> Iterator[Any]:
+    """
+    Retrieve the nodes in `ids`, either one at a time with `getter` or
+    with a listing.
+
+    Nodes that can't be retrieved are skipped.
+    """
+    if getter and len(ids) <= SINGLE:
+        for id_ in ids:
+            try:
+                node = getattr(driver, getter)(id_)
+            except Exception:  # pylint: disable=broad-except
+                continue
+            if node is not None and node.id == id_:
+                yield node
+        return
+
+    # The listing is stopped once every node has been found.
+    remaining = set(ids)
+    for node in paging.iterate(driver.list_nodes):
+        if node.id in remaining:
+            remaining.discard(node.id)
+            yield node
+            if not remaining:
+                break
@@ -1,36 +1,55 @@
+import json
+import pathlib
 import tempfile
 import unittest
 from typing import Any, Dict, List
+from unittest.mock import patch
 
 import click.testing
+import requests
 from libcloud import get_driver
+from libcloud.common.base import ConnectionKey, JsonResponse
+from libcloud.common.exceptions import BaseHTTPError
 from libcloud.compute.base import (
     KeyPair, Node, NodeImage, NodeLocation, NodeSize
 )
 from libcloud.compute.drivers.dummy import DummyNodeDriver
 from libcloud.compute.drivers.vultr import SSHKey
 from libcloud.compute.providers import Provider as ComputeProvider
-from texttable import Texttable
+
+from cloudie import option
 
 
 class ClickTestCase(unittest.TestCase):
     def setUp(self) -> None:
         self.config = tempfile.NamedTemporaryFile()
         self.runner = click.testing.CliRunner()
+        option.DRIVERS.evict()
+
+        # Caches are written to the home directory.
+        self.home_dir = tempfile.TemporaryDirectory()
+        self.home_patch = patch("pathlib.Path.home")
+        self.home_patch.start().return_value = pathlib.Path(self.home_dir.name)
 
     def tearDown(self) -> None:
+        self.home_patch.stop()
+        self.home_dir.cleanup()
         self.config.close()
 
 
-class TexttableMock(Texttable):  # type: ignore
-    def __init__(self, max_width: int = 80) -> None:
-        super().__init__(max_width)
+class TableMock:
+    """
+    Keep the header and rows of a table instead of writing it (see
+    `table._draw()`).
+    """
+
+    def __init__(self) -> None:
         self.headers = []  # type: List[str]
         self.rows = []  # type: List[List[str]]
 
-    def draw(self) -> None:
-        self.headers = self._header
-        self.rows = self._rows
+    def draw(self, header: List[str], rows: Any, *_args: Any) -> None:
+        self.headers = header
+        self.rows = list(rows)
 
 
 class ExtendedDummyNodeDriver(DummyNodeDriver):  # type: ignore
@@ -68,6 +87,67 @@ class ExtendedDummyNodeDriver(DummyNodeDriver):  # type: ignore
     # pylint: enable=abstract-method
 
 
+class LookupDummyNodeDriver(ExtendedDummyNodeDriver):
+    # pylint: disable=abstract-method
+    lookups = []  # type: List[str]
+
+    def get_image(self, image_id: str) -> NodeImage:
+        self.lookups.append(image_id)
+        for image in self.list_images():
+            if image.id == image_id:
+                return image
+        raise BaseHTTPError(404, "not found")
+
+    def ex_get_node(self, node_id: str) -> Node:
+        self.lookups.append(node_id)
+        return self.list_nodes()[0]
+
+    # pylint: enable=abstract-method
+
+
+class JsonConnection(ConnectionKey):  # type: ignore
+    host = "example.com"
+    responseCls = JsonResponse
+
+
+def json_request(_session: Any, url: str, **_kwargs: Any) -> Any:
+    """
+    Respond to a request with a list of the last component of its path,
+    in place of `requests.Session.request()`.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["content-type"] = "application/json"
+    response._content = json.dumps([url.rsplit("/", 1)[-1]]).encode()
+    return response
+
+
+class ConnectionDummyNodeDriver(ExtendedDummyNodeDriver):
+    """
+    Catalogs are retrieved with a real `libcloud` connection, which is
+    answered by `json_request()`.
+    """
+
+    # pylint: disable=abstract-method
+    def __init__(self, creds: Any) -> None:
+        super().__init__(creds)
+        self.connection = JsonConnection(creds)
+
+    def list_images(self) -> List[NodeImage]:
+        ids = self.connection.request("/images").object
+        return [NodeImage(i, i, self) for i in ids]
+
+    def list_locations(self) -> List[NodeLocation]:
+        ids = self.connection.request("/locations").object
+        return [NodeLocation(i, i, "", self) for i in ids]
+
+    def list_sizes(self) -> List[NodeSize]:
+        ids = self.connection.request("/sizes").object
+        return [NodeSize(i, i, 0, 0, 0, 0, self) for i in ids]
+
+    # pylint: enable=abstract-method
+
+
 class DigitalOceanDummyNodeDriver(DummyNodeDriver):  # type: ignore
     # pylint: disable=abstract-method,arguments-differ,protected-access
     type = ComputeProvider.DIGITAL_OCEAN
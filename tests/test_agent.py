@@ -0,0 +1,168 @@
+import json
+import pathlib
+import socket
+import tempfile
+import threading
+from typing import Any, List
+from unittest import TestCase
+from unittest.mock import patch
+
+import click.testing
+
+from cloudie import agent, cli, config
+
+
+class TestAgent(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = tempfile.NamedTemporaryFile("w")
+        self.config.write(
+            """
+            [a]
+            x = "$(echo x)"
+            y = { command = "$(echo y)", ttl = 0 }
+            z = { command = "$(echo z)", ttl = 60 }
+            """
+        )
+        self.config.flush()
+
+        self.patches = [
+            patch("pathlib.Path.home"),
+            patch("builtins.input"),
+            patch("shutil.which"),
+        ]  # type: List[Any]
+        home, input_, which = [p.start() for p in self.patches]
+        home.return_value = pathlib.Path(self.tmpdir.name)
+        input_.return_value = "y"
+        which.return_value = None
+
+        self.path = config.ConfigAgent.path()
+        self.agent = agent.Agent(str(self.path), 60)
+        self.thread = threading.Thread(target=self.agent.serve)
+        self.thread.start()
+
+    def tearDown(self) -> None:
+        # Wake up the agent in case it's waiting for a request.
+        self.agent.expired = True
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(self.path))
+        self.thread.join()
+        self.agent.server_close()
+
+        for p in self.patches:
+            p.stop()
+        self.config.close()
+        self.tmpdir.cleanup()
+
+    def request(self, data: bytes) -> Any:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(self.path))
+            sock.sendall(data)
+            with sock.makefile("rb") as f:
+                return json.loads(f.readline().decode())
+
+    def load(self) -> List[str]:
+        with patch("subprocess.check_output") as mock:
+            mock.side_effect = lambda args, **_: args[1].encode()
+            result = config.load(self.config.name)
+            self.assertEqual(result, {"a": {"x": "x", "y": "y", "z": "z"}})
+            return sorted(c[0][0][1] for c in mock.call_args_list)
+
+    def test_load(self) -> None:
+        self.assertEqual(self.load(), ["x", "y", "z"])
+        self.assertEqual(self.load(), ["y"])
+
+    def test_modified(self) -> None:
+        self.assertEqual(self.load(), ["x", "y", "z"])
+        self.config.write("\n")
+        self.config.flush()
+        self.assertEqual(self.load(), ["x", "y", "z"])
+
+    def test_expired(self) -> None:
+        self.assertEqual(self.load(), ["x", "y", "z"])
+        with patch("time.monotonic") as mock:
+            mock.return_value = 2**32
+            self.assertEqual(self.load(), ["y", "z"])
+
+    def test_process(self) -> None:
+        request = {"config": "c", "digest": "d", "name": "n"}
+        get = dict(request, op="get")
+        put = dict(request, op="put", output="o", ttl=0)
+
+        self.assertEqual(self.agent.process(get), {"output": None})
+        self.assertEqual(self.agent.process(put), {})
+        self.assertEqual(self.agent.process(get), {"output": "o"})
+
+        get["digest"] = "e"
+        self.assertEqual(self.agent.process(get), {"output": None})
+        get["digest"] = "d"
+        self.assertEqual(self.agent.process(get), {"output": None})
+
+    def test_invalid_request(self) -> None:
+        invalid = {"error": "invalid request"}
+        self.assertEqual(self.request(b"asdf\n"), invalid)
+        self.assertEqual(self.request(b"{}\n"), invalid)
+
+        request = {"config": "c", "digest": "d", "name": "n", "op": "x"}
+        data = json.dumps(request).encode() + b"\n"
+        self.assertEqual(self.request(data), invalid)
+
+    def test_other_user(self) -> None:
+        with patch("os.getuid") as mock:
+            mock.return_value = -1
+            with self.assertRaises((OSError, ValueError)):
+                self.request(b"{}\n")
+
+    def test_stalled_client(self) -> None:
+        with patch.object(agent._Handler, "timeout", 0.1):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(str(self.path))
+                sock.sendall(b"{")
+                self.assertEqual(sock.recv(1), b"")
+        self.assertEqual(self.request(b"{}\n"), {"error": "invalid request"})
+
+    def test_unavailable(self) -> None:
+        secrets = config.ConfigAgent("d", "c")
+        with patch("socket.socket.connect") as mock:
+            mock.side_effect = ConnectionRefusedError
+            self.assertIsNone(secrets.get("$(x)"))
+            secrets.put("$(x)", "x", 0)
+
+    def test_already_running(self) -> None:
+        runner = click.testing.CliRunner()
+        args = ["--config-file", self.config.name, "agent"]
+        result = runner.invoke(cli.cli, args)
+        self.assertTrue("already running" in result.output)
+        self.assertNotEqual(result.exit_code, 0)
+
+
+class TestAgentCommand(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = tempfile.NamedTemporaryFile()
+        self.runner = click.testing.CliRunner()
+
+        self.home = patch("pathlib.Path.home")
+        self.home.start().return_value = pathlib.Path(self.tmpdir.name)
+
+    def tearDown(self) -> None:
+        self.home.stop()
+        self.config.close()
+        self.tmpdir.cleanup()
+
+    def test_timeout(self) -> None:
+        args = ["--config-file", self.config.name, "agent", "--timeout", "1"]
+        result = self.runner.invoke(cli.cli, args)
+        self.assertEqual(result.exit_code, 0)
+        self.assertFalse(config.ConfigAgent.path().exists())
+
+    def test_stale_socket(self) -> None:
+        path = config.ConfigAgent.path()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(str(path))
+        self.assertTrue(path.is_socket())
+
+        args = ["--config-file", self.config.name, "agent", "--timeout", "1"]
+        result = self.runner.invoke(cli.cli, args)
+        self.assertEqual(result.exit_code, 0)
+        self.assertFalse(path.exists())
@@ -0,0 +1,282 @@
+import pathlib
+import tempfile
+import time
+from typing import Any, List
+from unittest import TestCase
+from unittest.mock import patch
+
+from libcloud.compute.base import NodeImage
+from libcloud.compute.drivers.dummy import DummyNodeDriver
+from munch import Munch
+
+from cloudie import catalog, cli, config
+
+from .helpers import ClickTestCase, ExtendedDummyNodeDriver, TableMock
+
+
+class CountingDriver(DummyNodeDriver):  # type: ignore
+    # pylint: disable=abstract-method
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.calls = []  # type: List[str]
+        self.connections = []  # type: List[Any]
+
+    def list_images(self) -> Any:
+        self.calls.append("list_images")
+        images = super().list_images()
+        images[0].extra = {"a": [1, 2]}
+        return images
+
+    def list_sizes(self) -> Any:
+        self.calls.append("list_sizes")
+        self.connections.append(self.connection)
+        return super().list_sizes()
+
+    def list_locations(self) -> Any:
+        self.calls.append("list_locations")
+        return super().list_locations()
+
+    # pylint: enable=abstract-method
+
+
+class TestCatalogCache(TestCase):
+    # pylint: disable=protected-access
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.home = patch("pathlib.Path.home")
+        self.home.start().return_value = pathlib.Path(self.tmpdir.name)
+        self.driver = CountingDriver(0)
+
+    def tearDown(self) -> None:
+        self.home.stop()
+        self.tmpdir.cleanup()
+
+    def assertCatalogEqual(self, a: List[Any], b: List[Any]) -> None:
+        # pylint: disable=invalid-name
+        self.assertEqual(
+            [(type(x), vars(x)) for x in a],
+            [(type(x), vars(x)) for x in b],
+        )
+
+    def test_cached(self) -> None:
+        for name in catalog.CATALOGS:
+            expected = catalog.CatalogCache("x").get(self.driver, name)
+            self.assertEqual(self.driver.calls, [name])
+
+            result = catalog.CatalogCache("x").get(self.driver, name)
+            self.assertEqual(self.driver.calls, [name])
+            self.assertCatalogEqual(result, expected)
+            self.driver.calls.clear()
+
+    def test_per_role(self) -> None:
+        catalog.CatalogCache("x").get(self.driver, "list_images")
+        catalog.CatalogCache("y").get(self.driver, "list_images")
+        self.assertEqual(self.driver.calls, ["list_images"] * 2)
+
+    def test_per_driver(self) -> None:
+        catalog.CatalogCache("x").get(self.driver, "list_images")
+        driver = ExtendedDummyNodeDriver(0)
+        result = catalog.CatalogCache("x").get(driver, "list_images")
+        self.assertEqual(result[0].driver, driver)
+        self.assertEqual(result[0].extra, {})
+
+    def test_per_account(self) -> None:
+        self.driver.key = "a"
+        catalog.CatalogCache("x").get(self.driver, "list_images")
+        self.driver.key = "b"
+        catalog.CatalogCache("x").get(self.driver, "list_images")
+        catalog.CatalogCache("x").get(self.driver, "list_images")
+        self.assertEqual(self.driver.calls, ["list_images"] * 2)
+
+    def test_stale(self) -> None:
+        cache = catalog.CatalogCache("x", ttl=10)
+        cache.get(self.driver, "list_sizes")
+
+        with patch("time.time", return_value=time.time() + 15):
+            self.assertEqual(len(cache.get(self.driver, "list_sizes")), 4)
+        for thread in cache._threads:
+            self.assertTrue(thread.daemon)
+            thread.join()
+        self.assertEqual(self.driver.calls, ["list_sizes"] * 2)
+
+        # The catalog is fetched in the background with a separate
+        # connection.
+        first, second = self.driver.connections
+        self.assertIs(first, self.driver.connection)
+        self.assertIsNot(second, self.driver.connection)
+
+    def test_expired(self) -> None:
+        cache = catalog.CatalogCache("x", ttl=10)
+        cache.get(self.driver, "list_sizes")
+
+        with patch("time.time", return_value=time.time() + 25):
+            self.assertEqual(len(cache.get(self.driver, "list_sizes")), 4)
+        self.assertEqual(cache._threads, [])
+        self.assertEqual(self.driver.calls, ["list_sizes"] * 2)
+
+    def test_stale_failure(self) -> None:
+        cache = catalog.CatalogCache("x", ttl=10)
+        cache.get(self.driver, "list_sizes")
+
+        with patch.object(CountingDriver, "list_sizes") as list_sizes, \
+                patch("click.echo") as echo:
+            list_sizes.side_effect = RuntimeError
+            with patch("time.time", return_value=time.time() + 15):
+                self.assertEqual(len(cache.get(self.driver, "list_sizes")), 4)
+            for thread in cache._threads:
+                thread.join()
+        echo.assert_called_once_with(
+            "Warning: failed to refresh list_sizes for 'x': RuntimeError",
+            err=True,
+        )
+
+    def test_refresh(self) -> None:
+        catalog.CatalogCache("x").get(self.driver, "list_sizes")
+        catalog.CatalogCache("x", refresh=True).get(self.driver, "list_sizes")
+        catalog.CatalogCache("x").get(self.driver, "list_sizes")
+        self.assertEqual(self.driver.calls, ["list_sizes"] * 2)
+
+    def test_disabled(self) -> None:
+        cache = catalog.CatalogCache("x", enabled=False)
+        cache.get(self.driver, "list_sizes")
+        cache.get(self.driver, "list_sizes")
+        self.assertEqual(self.driver.calls, ["list_sizes"] * 2)
+        self.assertEqual(list(pathlib.Path(self.tmpdir.name).iterdir()), [])
+
+    def test_not_a_catalog(self) -> None:
+        cache = catalog.CatalogCache("x")
+        self.assertEqual(len(cache.get(self.driver, "list_nodes")), 2)
+        self.assertEqual(cache._load(), {})  # pylint: disable=W0212
+
+    def test_unsupported_class(self) -> None:
+        class Image(NodeImage):  # type: ignore
+            pass
+
+        cache = catalog.CatalogCache("x")
+        with patch.object(self.driver, "list_images") as mock:
+            mock.return_value = [Image("1", "a", self.driver)]
+            cache.get(self.driver, "list_images")
+            cache.get(self.driver, "list_images")
+            self.assertEqual(mock.call_count, 2)
+
+    def test_unserializable(self) -> None:
+        cache = catalog.CatalogCache("x")
+        with patch.object(self.driver, "list_images") as mock:
+            mock.return_value = [NodeImage("1", "a", self.driver, {1: self})]
+            cache.get(self.driver, "list_images")
+            cache.get(self.driver, "list_images")
+            self.assertEqual(mock.call_count, 2)
+
+    def test_invalid_file(self) -> None:
+        cache = catalog.CatalogCache("x")
+        cache._path().write_bytes(b"garbage")  # pylint: disable=W0212
+        cache.get(self.driver, "list_sizes")
+        cache.get(self.driver, "list_sizes")
+        self.assertEqual(self.driver.calls, ["list_sizes"])
+
+    def test_is_cached(self) -> None:
+        cache = catalog.CatalogCache("x")
+        self.assertFalse(cache.cached(self.driver, "list_sizes"))
+        cache.get(self.driver, "list_sizes")
+        self.assertTrue(cache.cached(self.driver, "list_sizes"))
+        self.assertFalse(cache.cached(self.driver, "list_nodes"))
+        with patch("time.time", return_value=time.time() + 2 * cache.ttl):
+            self.assertFalse(cache.cached(self.driver, "list_sizes"))
+
+        cache = catalog.CatalogCache("x", refresh=True)
+        self.assertFalse(cache.cached(self.driver, "list_sizes"))
+        cache = catalog.CatalogCache("x", enabled=False)
+        self.assertFalse(cache.cached(self.driver, "list_sizes"))
+
+    def test_version(self) -> None:
+        cache = catalog.CatalogCache("x")
+        cache.get(self.driver, "list_sizes")
+        with patch.object(catalog.CatalogCache, "VERSION", (0, )):
+            cache.get(self.driver, "list_sizes")
+        self.assertEqual(self.driver.calls, ["list_sizes"] * 2)
+
+
+class TestCache(TestCase):
+    def test_ttl(self) -> None:
+        conf = Munch(role=Munch(x=Munch({"catalog-ttl": 60})))
+        self.assertEqual(catalog.cache(conf, "x").ttl, 60)
+        self.assertEqual(catalog.cache(conf, "y").ttl, catalog.TTL)
+
+        cache = catalog.cache(conf, "x", refresh=True, no_cache=True)
+        self.assertTrue(cache.refresh)
+        self.assertFalse(cache.enabled)
+
+    def test_command(self) -> None:
+        command = config.ConfigCommand("$(echo 60)", None)
+        conf = Munch(role=Munch(x=Munch({"catalog-ttl": command})))
+        with patch("subprocess.check_output") as mock:
+            mock.return_value = b"60"
+            self.assertEqual(catalog.cache(conf, "x").ttl, 60)
+
+        command = config.ConfigCommand("$(false)", None)
+        conf = Munch(role=Munch(x=Munch({"catalog-ttl": command})))
+        with self.assertRaises(catalog.click.ClickException):
+            catalog.cache(conf, "x")
+
+    def test_invalid(self) -> None:
+        conf = Munch(role=Munch(x=Munch({"catalog-ttl": "abc"})))
+        with self.assertRaises(catalog.click.ClickException) as ctx:
+            catalog.cache(conf, "x")
+        self.assertEqual(ctx.exception.message, "invalid catalog-ttl for 'x'")
+
+
+class TestCommands(ClickTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.config.write(b"[role.x]\nprovider = 'dummy'\nkey = '0'\n")
+        self.config.flush()
+
+    def list_sizes(self, *args: str) -> List[List[str]]:
+        args = (
+            "--config-file", self.config.name, "compute", "list-sizes",
+            "--role", "x"
+        ) + args
+
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(result.exit_code, 0)
+        return t.rows
+
+    def test_list(self) -> None:
+        rows = self.list_sizes()
+        with patch.object(DummyNodeDriver, "list_sizes") as mock:
+            mock.return_value = []
+            self.assertEqual(self.list_sizes(), rows)
+            self.assertEqual(self.list_sizes("--no-cache"), [])
+            self.assertEqual(self.list_sizes(), rows)
+            self.assertEqual(self.list_sizes("--refresh"), [])
+            self.assertEqual(self.list_sizes(), [])
+
+    def test_create_node(self) -> None:
+        args = [
+            "--config-file",
+            self.config.name,
+            "compute",
+            "create-node",
+            "--role",
+            "x",
+            "--name",
+            "name",
+            "--image",
+            "1",
+            "--location",
+            "1",
+            "--size",
+            "1",
+        ]
+
+        self.list_sizes()
+        with patch.object(DummyNodeDriver, "list_sizes") as mock:
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(mock.call_count, 0)
+
+            result = self.runner.invoke(cli.cli, args + ["--refresh"])
+            self.assertEqual(result.output, "Error: invalid size\n")
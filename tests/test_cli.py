@@ -1,6 +1,13 @@
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
 import click
+from libcloud.common.base import BaseDriver
+from libcloud.compute.providers import Provider as ComputeProvider
 
-from cloudie import cli
+from cloudie import cli, option
 
 from .helpers import ClickTestCase
 
@@ -24,7 +31,7 @@ class TestCli(ClickTestCase):
         args = ["--config-file", self.config.name, command.name]
         result = self.runner.invoke(cli.cli, args)
 
-        self.assertTrue("Key group not on a line by itself" in result.output)
+        self.assertTrue("invalid TOML at line 1" in result.output)
         self.assertNotEqual(result.exit_code, 0)
 
     def test_valid_config(self) -> None:
@@ -41,3 +48,79 @@ class TestCli(ClickTestCase):
 
         self.assertEqual(result.output, "value\n")
         self.assertEqual(result.exit_code, 0)
+
+    def test_config_commands(self) -> None:
+        @cli.cli.command()
+        @option.pass_driver(ComputeProvider)
+        def command(driver: BaseDriver) -> None:
+            print(driver.creds)
+
+        self.config.write(
+            b"""
+            [role.x]
+            provider = "dummy"
+            key = "$(echo x)"
+
+            [role.y]
+            provider = "dummy"
+            key = "$(echo y)"
+            """
+        )
+        self.config.flush()
+
+        args = [
+            "--config-file",
+            self.config.name,
+            "--config-jobs",
+            "2",
+            "--config-timeout",
+            "1.5",
+            command.name,
+            "--role",
+            "x",
+        ]
+        with patch("cloudie.config.ConfigPermission.ask") as ask:
+            ask.return_value = True
+            with patch("subprocess.check_output") as mock:
+                mock.return_value = b"value"
+                result = self.runner.invoke(cli.cli, args)
+                mock.assert_called_once_with(["echo", "x"], timeout=1.5)
+
+        self.assertEqual(result.output, "value\n")
+        self.assertEqual(result.exit_code, 0)
+
+    def test_no_libcloud(self) -> None:
+        """
+        Make sure that `libcloud` isn't imported needlessly.
+
+        This has to be done in a separate process since `libcloud` is
+        imported by the test helpers.
+        """
+        code = "\n".join([
+            "import sys",
+            "from cloudie import cli",
+            "try:",
+            "    cli.cli(sys.argv[1:])",
+            "except SystemExit:",
+            "    pass",
+            "print([m for m in sys.modules if m.startswith('libcloud')])",
+        ])
+
+        # Caches are written to the home directory.
+        env = dict(os.environ, HOME=self.home_dir.name)
+
+        for args in [
+            ["--help"],
+            ["compute", "--help"],
+            ["compute", "list-nodes", "--role", "x"],
+        ]:
+            proc = subprocess.run(
+                [
+                    sys.executable, "-c", code, "--config-file",
+                    self.config.name
+                ] + args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+            )
+            self.assertTrue(proc.stdout.endswith(b"[]\n"))
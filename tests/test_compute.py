@@ -1,19 +1,28 @@
 # pylint: disable=too-many-lines
 import base64
+import concurrent.futures
+import pathlib
 import tempfile
-from unittest.mock import patch
+import threading
+from typing import Any, Callable, List
+from unittest.mock import Mock, patch
 
 import click
 from libcloud.common.base import BaseDriver
+from libcloud.common.exceptions import BaseHTTPError
+from libcloud.common.types import InvalidCredsError, ProviderError
 from libcloud.compute import ssh
 from libcloud.compute.deployment import SSHKeyDeployment
+from libcloud.compute.drivers.dummy import DummyNodeDriver
 from libcloud.compute.providers import Provider, get_driver, set_driver
+from libcloud.http import LibcloudConnection
 
-from cloudie import cli, compute, option
+from cloudie import cli, compute, option, waiter
 
 from .helpers import (
-    ClickTestCase, DigitalOceanDummyNodeDriver, ExtendedDummyNodeDriver,
-    TexttableMock, VultrDummyNodeDriver
+    ClickTestCase, ConnectionDummyNodeDriver, DigitalOceanDummyNodeDriver,
+    ExtendedDummyNodeDriver, LookupDummyNodeDriver, TableMock,
+    VultrDummyNodeDriver, json_request
 )
 
 
@@ -90,9 +99,9 @@ class TestCompute(ClickTestCase):
             ["3", "Slackware 4"],
         ]
 
-        t = TexttableMock()
-        with patch("texttable.Texttable") as mock:
-            mock.return_value = t
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
             result = self.runner.invoke(cli.cli, args)
             self.assertEqual(result.exit_code, 0)
 
@@ -109,9 +118,9 @@ class TestCompute(ClickTestCase):
             "dummy-ext",
         ]
 
-        t = TexttableMock()
-        with patch("texttable.Texttable") as mock:
-            mock.return_value = t
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
             result = self.runner.invoke(cli.cli, args)
             self.assertEqual(result.exit_code, 0)
 
@@ -130,9 +139,9 @@ class TestCompute(ClickTestCase):
             "dummy-ext",
         ]
 
-        t = TexttableMock()
-        with patch("texttable.Texttable") as mock:
-            mock.return_value = t
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
             result = self.runner.invoke(cli.cli, args)
             self.assertEqual(result.exit_code, 0)
 
@@ -151,9 +160,9 @@ class TestCompute(ClickTestCase):
             "dummy-ext",
         ]
 
-        t = TexttableMock()
-        with patch("texttable.Texttable") as mock:
-            mock.return_value = t
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
             result = self.runner.invoke(cli.cli, args)
             self.assertEqual(result.exit_code, 0)
 
@@ -186,9 +195,9 @@ class TestCompute(ClickTestCase):
             "dummy-ext",
         ]
 
-        t = TexttableMock()
-        with patch("texttable.Texttable") as mock:
-            mock.return_value = t
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
             result = self.runner.invoke(cli.cli, args)
             self.assertEqual(result.exit_code, 0)
 
@@ -215,6 +224,132 @@ class TestCompute(ClickTestCase):
             ]
             self.assertTrue(row in t.rows)
 
+    def test_list_multiple_roles(self) -> None:
+        args = [
+            "--config-file",
+            self.config.name,
+            "compute",
+            "list-images",
+            "--role",
+            "dummy",
+            "--role",
+            "dummy-ext",
+        ]
+
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(result.exit_code, 0)
+
+        self.assertEqual(t.headers, ["Role", "ID", "Name"])
+        self.assertEqual(
+            t.rows, [
+                ["dummy", "1", "Ubuntu 9.10"],
+                ["dummy", "2", "Ubuntu 9.04"],
+                ["dummy", "3", "Slackware 4"],
+                ["dummy-ext", "1", "Ubuntu 9.10"],
+                ["dummy-ext", "2", "Ubuntu 9.04"],
+                ["dummy-ext", "3", "Slackware 4"],
+            ]
+        )
+
+    def test_list_multiple_roles_failure(self) -> None:
+        self.config.write(
+            b"""
+            [role.invalid]
+            provider = "invalid"
+            key = "abcd"
+            """
+        )
+        self.config.flush()
+
+        args = [
+            "--config-file",
+            self.config.name,
+            "compute",
+            "list-nodes",
+            "--all-roles",
+        ]
+
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
+            with patch.object(ExtendedDummyNodeDriver, "list_nodes") as nodes:
+                nodes.side_effect = RuntimeError
+                result = self.runner.invoke(cli.cli, args)
+                self.assertNotEqual(result.exit_code, 0)
+
+        self.assertEqual(len(t.rows), 2)
+        self.assertTrue(all(row[0] == "dummy" for row in t.rows))
+        self.assertTrue("Error: dummy-ext: RuntimeError\n" in result.output)
+        self.assertTrue("Error: invalid: " in result.output)
+        self.assertTrue("Error: 2 of 3 roles failed\n" in result.output)
+
+    def test_list_multiple_roles_paginated(self) -> None:
+        self.config.write(
+            b"""
+            [role.do-a]
+            provider = "digitalocean"
+            key = "a"
+
+            [role.do-b]
+            provider = "digitalocean"
+            key = "b"
+            """
+        )
+        self.config.flush()
+
+        args = [
+            "--config-file",
+            self.config.name,
+            "compute",
+            "list-key-pairs",
+            "--role",
+            "do-a",
+            "--role",
+            "do-b",
+        ]
+
+        # The first page for each role is only returned once the first
+        # pages for both roles have been requested.
+        barrier = threading.Barrier(2, timeout=5)
+        threads = set()
+
+        def request(self: Any, path: str, params: Any) -> Any:
+            page = params["page"]
+            if page == 1:
+                barrier.wait()
+            threads.add(threading.get_ident())
+            data = {
+                "ssh_keys": [{
+                    "id": "{}{}".format(self.key, page),
+                    "name": "{}{}".format(self.key, page),
+                    "fingerprint": "",
+                    "public_key": "",
+                }],
+            }  # type: dict
+            if page == 1:
+                last = "https://x/v2/account/keys?page=2"
+                data["links"] = {"pages": {"next": "...", "last": last}}
+            return Mock(object=data)
+
+        t = TableMock()
+        connection = "libcloud.common.digitalocean.DigitalOcean_v2_Connection"
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
+            with patch(connection + ".request", request):
+                result = self.runner.invoke(cli.cli, args)
+                self.assertEqual(result.exit_code, 0)
+
+        self.assertEqual([row[:2] for row in t.rows], [
+            ["do-a", "a1"],
+            ["do-a", "a2"],
+            ["do-b", "b1"],
+            ["do-b", "b2"],
+        ])
+        self.assertFalse(threading.get_ident() in threads)
+
 
 class TestDestroyNode(ClickTestCase):
     def setUp(self) -> None:
@@ -285,6 +420,123 @@ class TestDestroyNode(ClickTestCase):
             self.assertNotEqual(result.exit_code, 0)
 
 
+class TestDestroyNodes(ClickTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.config.write(
+            b"""
+            [role.dummy]
+            provider = "dummy"
+            key = "key-dummy"
+            """
+        )
+        self.config.flush()
+
+    def invoke(self, *args: str) -> Any:
+        args = (
+            "--config-file", self.config.name, "compute", "destroy-node",
+            "--role", "dummy"
+        ) + args
+
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
+            result = self.runner.invoke(cli.cli, args)
+        result.rows = t.rows
+        return result
+
+    def test_ids(self) -> None:
+        with patch.object(DummyNodeDriver, "destroy_node") as mock:
+            mock.return_value = True
+            result = self.invoke("--id", "2", "--id", "1", "--id", "2")
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            result.rows, [
+                ["1", "dummy-1", "running", "127.0.0.1", "destroyed"],
+                ["2", "dummy-2", "running", "127.0.0.1", "destroyed"],
+            ]
+        )
+        self.assertEqual(mock.call_count, 2)
+
+    def test_early_termination(self) -> None:
+        listed = []
+
+        def list_nodes(driver: DummyNodeDriver) -> Any:
+            for node in driver.nl:
+                listed.append(node.id)
+                yield node
+
+        with patch.object(DummyNodeDriver, "list_nodes", list_nodes):
+            result = self.invoke("--id", "1", "--dry-run")
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(listed, ["1"])
+
+    def test_filter(self) -> None:
+        filters = [
+            (["name=dummy-?"], ["1", "2"]),
+            (["name=*-2"], ["2"]),
+            (["public_ips=127.*", "extra.foo=bar"], ["1", "2"]),
+            (["state=running", "id=1"], ["1"]),
+        ]
+        for args, ids in filters:
+            args = [a for f in args for a in ("--filter", f)]
+            result = self.invoke(*args, "--dry-run")
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual([row[0] for row in result.rows], ids)
+
+        result = self.invoke("--filter", "name=*-1", "--id", "2")
+        self.assertEqual(result.output, "Error: no matching nodes\n")
+        self.assertNotEqual(result.exit_code, 0)
+
+        result = self.invoke("--filter", "extra.missing=*")
+        self.assertEqual(result.output, "Error: no matching nodes\n")
+
+    def test_invalid_filter(self) -> None:
+        result = self.invoke("--filter", "name")
+        self.assertTrue("name is not KEY=PATTERN" in result.output)
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_dry_run(self) -> None:
+        with patch.object(DummyNodeDriver, "destroy_node") as mock:
+            result = self.invoke("--id", "1", "--dry-run")
+            self.assertEqual(mock.call_count, 0)
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            result.rows, [["1", "dummy-1", "running", "127.0.0.1"]]
+        )
+
+    def test_invalid_ids(self) -> None:
+        with patch.object(DummyNodeDriver, "destroy_node") as mock:
+            result = self.invoke("--id", "1", "--id", "98", "--id", "99")
+            self.assertEqual(mock.call_count, 0)
+
+        self.assertEqual(result.output, "Error: invalid node: 98, 99\n")
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_missing_options(self) -> None:
+        result = self.invoke()
+        self.assertTrue(
+            "Error: Missing option \"--id\" or \"--filter\"" in result.output
+        )
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_failure(self) -> None:
+        with patch.object(DummyNodeDriver, "destroy_node") as mock:
+            mock.side_effect = lambda node: node.id == "1"
+            result = self.invoke("--filter", "name=*", "--jobs", "2")
+
+        self.assertEqual(
+            [row[-1] for row in result.rows],
+            ["destroyed", "could not destroy node"],
+        )
+        self.assertTrue("Error: 1 of 2 nodes failed" in result.output)
+        self.assertNotEqual(result.exit_code, 0)
+
+
 class TestCreateNode(ClickTestCase):
     def setUp(self) -> None:
         super().setUp()
@@ -621,6 +873,487 @@ class TestCreateNode(ClickTestCase):
             self.assertNotEqual(result.exit_code, 0)
 
 
+class TestCreateNodes(ClickTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+
+        try:
+            get_driver("dummy-extended")
+        except AttributeError:
+            set_driver(
+                "dummy-extended",
+                "tests.helpers",
+                "ExtendedDummyNodeDriver",
+            )
+
+        self.config.write(
+            b"""
+            [role.dummy]
+            provider = "dummy-extended"
+            key = "key-dummy"
+            image = 1
+            location = "2"
+            password = true
+
+            [role.dummy-without-size]
+            provider = "dummy-extended"
+            key = "key-dummy-without-size"
+            image = 1
+            location = "2"
+            """
+        )
+        self.config.flush()
+        self.manifest = tempfile.NamedTemporaryFile()
+
+        # Node IDs are derived from the number of nodes, so nodes are
+        # created one at a time.
+        self.lock = threading.Lock()
+        self.calls = []  # type: list
+        self.patch = patch.object(
+            ExtendedDummyNodeDriver,
+            "create_node",
+            autospec=True,
+            side_effect=lambda *args, **kw: self.create_node(*args, **kw),
+        )
+        self.patch.start()
+        compute.COUNTERS.clear()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.patch.stop()
+        self.manifest.close()
+
+    def create_node(self, driver: BaseDriver, **kwargs: Any) -> Any:
+        with self.lock:
+            if kwargs["name"] == "fail":
+                raise ValueError("failure")
+            self.calls.append((driver, kwargs))
+            return DummyNodeDriver.create_node(driver, **kwargs)
+
+    def invoke(self, *args: str, role: str = "dummy") -> Any:
+        args = (
+            "--config-file", self.config.name, "compute", "create-node",
+            "--role", role
+        ) + args
+
+        t = TableMock()
+        with patch("cloudie.table._draw") as texttable:
+            texttable.side_effect = t.draw
+            with patch("click.prompt") as prompt:
+                prompt.return_value = "secret"
+                result = self.runner.invoke(cli.cli, args)
+                result.prompts = prompt.call_count
+        result.rows = t.rows
+        return result
+
+    def write(self, data: str) -> None:
+        self.manifest.write(data.encode())
+        self.manifest.flush()
+
+    def test_count(self) -> None:
+        result = self.invoke(
+            "--name", "web-{i}", "--size", "3", "--count", "3"
+        )
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            sorted(kw["name"] for _, kw in self.calls),
+            ["web-1", "web-2", "web-3"],
+        )
+        self.assertEqual(len(result.rows), 3)
+        self.assertEqual(result.prompts, 1)
+        self.assertTrue(result.output.startswith("Waiting for the nodes"))
+
+        # Catalogs are only scanned once.
+        self.assertEqual(compute.COUNTERS.calls["list_sizes:scan"], 1)
+        self.assertEqual(compute.COUNTERS.calls["list_images:scan"], 1)
+
+    def test_count_without_template(self) -> None:
+        result = self.invoke("--name", "web", "--size", "3", "--count", "2")
+        self.assertTrue(
+            "web must include {i} to create more than one node" in result.
+            output
+        )
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertEqual(self.calls, [])
+
+    def test_wait(self) -> None:
+        def wait_until_running(
+                _driver: BaseDriver,
+                nodes: List[Any],
+                timeout: float,
+                callback: Callable,
+        ) -> None:
+            self.assertEqual(timeout, 5)
+            callback(nodes[0], "pending")
+            raise waiter.WaitTimeout("timed out", nodes)
+
+        with patch("cloudie.waiter.wait_until_running", wait_until_running):
+            result = self.invoke("--name", "a", "--size", "3", "--wait", "5")
+
+        self.assertTrue("dummy-3 (3): pending -> running\n" in result.output)
+        self.assertTrue(result.output.endswith("Error: timed out\n"))
+        self.assertEqual(len(result.rows), 1)
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_concurrent(self) -> None:
+        barrier = threading.Barrier(3, timeout=5)
+        orig = self.create_node
+
+        def create_node(driver: BaseDriver, **kwargs: Any) -> Any:
+            barrier.wait()
+            return orig(driver, **kwargs)
+
+        self.create_node = create_node  # type: ignore
+        result = self.invoke(
+            "--name", "web-{i}", "--size", "3", "--count", "6", "--jobs", "3"
+        )
+        self.assertEqual(result.exit_code, 0)
+
+        # Each thread uses its own copy of the driver.
+        drivers = {id(driver) for driver, _ in self.calls}
+        self.assertEqual(len(drivers), 3)
+
+    def test_failure(self) -> None:
+        self.write(
+            """
+            [[node]]
+            name = "web-{i}"
+            count = 2
+
+            [[node]]
+            name = "fail"
+            """
+        )
+        result = self.invoke(
+            "--size", "3", "--from-manifest", self.manifest.name
+        )
+        self.assertEqual(len(result.rows), 2)
+        self.assertTrue("Error: fail: failure\n" in result.output)
+        self.assertTrue("Error: 1 of 3 nodes failed\n" in result.output)
+        self.assertNotEqual(result.exit_code, 0)
+
+        self.manifest.seek(0)
+        self.manifest.truncate()
+        self.write("[[node]]\nname = 'fail'\n[[node]]\nname = 'fail'")
+        result = self.invoke(
+            "--size", "3", "--from-manifest", self.manifest.name
+        )
+        self.assertFalse("Waiting" in result.output)
+        self.assertTrue("Error: 2 of 2 nodes failed\n" in result.output)
+
+    def test_manifest(self) -> None:
+        with tempfile.NamedTemporaryFile() as user_data:
+            user_data.write(b"#cloud-config")
+            user_data.flush()
+
+            self.write(
+                """
+                [[node]]
+                name = "web-{{i}}"
+                count = 2
+                size = "1"
+
+                [[node]]
+                name = "db"
+                size = 3
+                password = false
+                user-data = "{}"
+                """.format(user_data.name)
+            )
+            with patch.object(ExtendedDummyNodeDriver, "type", "vultr"):
+                result = self.invoke(
+                    "--size", "4", "--from-manifest", self.manifest.name
+                )
+
+        self.assertEqual(result.exit_code, 0)
+        nodes = {kw["name"]: kw for _, kw in self.calls}
+        self.assertEqual(sorted(nodes), ["db", "web-1", "web-2"])
+        self.assertEqual(nodes["web-1"]["size"].id, "1")
+        self.assertEqual(nodes["web-1"]["auth"].password, "secret")
+        self.assertEqual(nodes["db"]["size"].id, "3")
+        self.assertTrue("auth" not in nodes["db"])
+        self.assertEqual(
+            nodes["db"]["ex_create_attr"]["userdata"],
+            base64.b64encode(b"#cloud-config").decode(),
+        )
+        self.assertEqual(compute.COUNTERS.calls["list_sizes:scan"], 2)
+
+    def test_manifest_files(self) -> None:
+        self.write("[[node]]\nname = 'a'\n[[node]]\nname = 'b'")
+        with tempfile.NamedTemporaryFile() as user_data:
+            user_data.write(b"#cloud-config")
+            user_data.flush()
+
+            with patch.object(ExtendedDummyNodeDriver, "type", "vultr"):
+                result = self.invoke(
+                    "--size", "1", "--user-data", user_data.name,
+                    "--from-manifest", self.manifest.name
+                )
+
+        self.assertEqual(result.exit_code, 0)
+        for _, kw in self.calls:
+            self.assertEqual(
+                kw["ex_create_attr"]["userdata"],
+                base64.b64encode(b"#cloud-config").decode(),
+            )
+
+        self.calls.clear()
+        with tempfile.NamedTemporaryFile() as ssh_key:
+            ssh_key.write(b"ssh-rsa AAAA comment")
+            ssh_key.flush()
+
+            args = ("--size", "1", "--ssh-key", ssh_key.name)
+            manifest = ("--from-manifest", self.manifest.name)
+            result = self.invoke(*args, *manifest, role="dummy-without-size")
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(len(self.calls), 2)
+        for _, kw in self.calls:
+            self.assertEqual(kw["auth"].pubkey, "ssh-rsa AAAA comment")
+
+    def test_manifest_relative_paths(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            directory = pathlib.Path(tmpdir)
+            directory.joinpath("db.yaml").write_text("#cloud-config")
+            manifest = directory.joinpath("manifest.toml")
+            manifest.write_text(
+                "[[node]]\nname = 'a'\nuser-data = 'db.yaml'\n"
+                "[[node]]\nname = 'b'\nuser-data = 'missing.yaml'\n"
+            )
+
+            with patch.object(ExtendedDummyNodeDriver, "type", "vultr"):
+                result = self.invoke(
+                    "--size", "1", "--from-manifest", str(manifest)
+                )
+            missing = directory.joinpath("missing.yaml")
+            self.assertTrue(str(missing) in result.output)
+            self.assertNotEqual(result.exit_code, 0)
+
+            manifest.write_text("[[node]]\nname = 'a'\nuser-data = 'db.yaml'")
+            with patch.object(ExtendedDummyNodeDriver, "type", "vultr"):
+                result = self.invoke(
+                    "--size", "1", "--from-manifest", str(manifest)
+                )
+
+        # The file is relative to the manifest rather than to the
+        # current directory.
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            self.calls[0][1]["ex_create_attr"]["userdata"],
+            base64.b64encode(b"#cloud-config").decode(),
+        )
+
+    def test_manifest_missing_option(self) -> None:
+        self.write("[[node]]\nname = 'a'\n[[node]]\nname = 'b'\nsize = 3")
+        result = self.invoke(
+            "--from-manifest", self.manifest.name, role="dummy-without-size"
+        )
+        self.assertTrue("Error: Missing option \"--size\"" in result.output)
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_invalid_manifest(self) -> None:
+        manifests = [
+            ("node = ", "invalid TOML at line 1"),
+            ("", "node must be an array of tables"),
+            ("node = [1]", "node must be an array of tables"),
+            ("[[node]]\nwait = 1", "unknown key 'wait'"),
+        ]
+        for data, msg in manifests:
+            self.manifest.seek(0)
+            self.manifest.truncate()
+            self.write(data)
+
+            result = self.invoke("--from-manifest", self.manifest.name)
+            self.assertEqual(
+                result.output,
+                "Error: {}: {}\n".format(self.manifest.name, msg)
+            )
+            self.assertNotEqual(result.exit_code, 0)
+
+
+class TestCatalog(ClickTestCase):
+    # pylint: disable=protected-access
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.driver = ExtendedDummyNodeDriver("")
+
+    def test_concurrent(self) -> None:
+        # Every request is sent before any response is read, which mixes
+        # up the responses of requests that share a connection.
+        barrier = threading.Barrier(3, timeout=5)
+        getresponse = LibcloudConnection.getresponse
+
+        def wait(connection: LibcloudConnection) -> Any:
+            barrier.wait()
+            return getresponse(connection)
+
+        driver = ConnectionDummyNodeDriver("")
+        driver.connection.connect()
+        names = ["list_images", "list_locations", "list_sizes"]
+
+        with patch("requests.Session.request", json_request):
+            with patch.object(LibcloudConnection, "getresponse", wait):
+                with concurrent.futures.ThreadPoolExecutor(3) as pool:
+                    catalog = compute._Catalog(driver, pool, names)
+
+        self.assertEqual(catalog.list_images.__name__, "list_images")
+        for name in names:
+            rows = getattr(catalog, name)()
+            self.assertEqual([row.id for row in rows], [name[5:]])
+
+    def test_error(self) -> None:
+        with concurrent.futures.ThreadPoolExecutor(1) as pool:
+            catalog = compute._Catalog(self.driver, pool, ["list_images"])
+            with self.assertRaises(click.ClickException) as ctx:
+                compute._get(catalog.list_images, lambda x: x.id == "999")
+        self.assertEqual(ctx.exception.message, "invalid image")
+
+    def test_driver_attributes(self) -> None:
+        with concurrent.futures.ThreadPoolExecutor(1) as pool:
+            catalog = compute._Catalog(self.driver, pool, [])
+        self.assertEqual(catalog.list_nodes(), self.driver.list_nodes())
+
+
+class TestLookup(ClickTestCase):
+    # pylint: disable=protected-access
+    def setUp(self) -> None:
+        super().setUp()
+
+        try:
+            get_driver("dummy-lookup")
+        except AttributeError:
+            set_driver(
+                "dummy-lookup", "tests.helpers", "LookupDummyNodeDriver"
+            )
+
+        self.config.write(
+            b"""
+            [role.lookup]
+            provider = "dummy-lookup"
+            key = "abcd"
+            """
+        )
+        self.config.flush()
+
+        self.driver = LookupDummyNodeDriver("")
+        LookupDummyNodeDriver.lookups.clear()
+        compute.COUNTERS.clear()
+
+    def test_direct(self) -> None:
+        image = compute._get(
+            self.driver.list_images, lambda i: i.id == "2", id_="2"
+        )
+        self.assertEqual(image.id, "2")
+        self.assertEqual(self.driver.lookups, ["2"])
+        self.assertEqual(
+            dict(compute.COUNTERS.calls), {"list_images:get_image": 1}
+        )
+
+    def test_not_found(self) -> None:
+        with self.assertRaises(click.ClickException) as ctx:
+            compute._get(
+                self.driver.list_images, lambda i: i.id == "99", id_="99"
+            )
+        self.assertEqual(ctx.exception.message, "invalid image")
+        self.assertEqual(
+            dict(compute.COUNTERS.calls), {
+                "list_images:get_image": 1,
+                "list_images:scan": 1,
+            }
+        )
+
+    def test_not_found_errors(self) -> None:
+        errors = [
+            BaseHTTPError(404, "not found"),
+            ProviderError("not found", 404),
+            IndexError("list index out of range"),
+        ]
+        for error in errors:
+            compute.COUNTERS.clear()
+            with patch.object(self.driver, "get_image", side_effect=error):
+                image = compute._get(
+                    self.driver.list_images, lambda i: i.id == "2", id_="2"
+                )
+            self.assertEqual(image.id, "2")
+            self.assertEqual(compute.COUNTERS.calls["list_images:scan"], 1)
+
+    def test_lookup_errors(self) -> None:
+        # Other errors would fail the same way when scanning.
+        errors = [
+            BaseHTTPError(401, "unauthorized"),
+            InvalidCredsError("unauthorized"),
+            ConnectionError("unreachable"),
+        ]
+        for error in errors:
+            compute.COUNTERS.clear()
+            with patch.object(self.driver, "get_image", side_effect=error):
+                with self.assertRaises(type(error)):
+                    compute._get(
+                        self.driver.list_images,
+                        lambda i: i.id == "2",
+                        id_="2",
+                    )
+            self.assertEqual(compute.COUNTERS.calls["list_images:scan"], 0)
+
+    def test_mismatch(self) -> None:
+        node = compute._get(
+            self.driver.list_nodes, lambda n: n.id == "2", id_="2"
+        )
+        self.assertEqual(node.id, "2")
+        self.assertEqual(self.driver.lookups, ["2"])
+        self.assertEqual(compute.COUNTERS.calls["list_nodes:scan"], 1)
+
+    def test_unsupported(self) -> None:
+        sizes = self.driver.list_sizes
+        self.assertEqual(compute._get(sizes, lambda s: True, id_="1").id, "1")
+        self.assertEqual(dict(compute.COUNTERS.calls), {"list_sizes:scan": 1})
+
+    def test_destroy_node(self) -> None:
+        args = [
+            "--config-file",
+            self.config.name,
+            "compute",
+            "destroy-node",
+            "--role",
+            "lookup",
+            "--id",
+            "1",
+        ]
+        result = self.runner.invoke(cli.cli, args)
+        self.assertEqual(result.output, "Node dummy-1 (1) destroyed\n")
+        self.assertEqual(LookupDummyNodeDriver.lookups, ["1"])
+        self.assertEqual(compute.COUNTERS.calls["list_nodes:scan"], 0)
+
+    def test_create_node(self) -> None:
+        args = [
+            "--config-file",
+            self.config.name,
+            "compute",
+            "create-node",
+            "--role",
+            "lookup",
+            "--name",
+            "name",
+            "--image",
+            "2",
+            "--location",
+            "1",
+            "--size",
+            "1",
+        ]
+        result = self.runner.invoke(cli.cli, args)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(LookupDummyNodeDriver.lookups, ["2"])
+
+        # Cached images are used instead.
+        list_args = args[:3] + ["list-images", "--role", "lookup"]
+        self.runner.invoke(cli.cli, list_args)
+        result = self.runner.invoke(cli.cli, args)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(LookupDummyNodeDriver.lookups, ["2"])
+
+
 class TestGet(ClickTestCase):
     # pylint: disable=protected-access
     def setUp(self) -> None:
@@ -1,9 +1,15 @@
+import importlib.util
 import os
 import pathlib
 import subprocess
 import tempfile
+import threading
+import time
+from typing import Any, Callable, List, cast
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import Mock, patch
+
+import munch
 
 from cloudie import config, utils
 
@@ -35,8 +41,7 @@ class TestConfigPermission(TestCase):
         self.config.write("abcd")
         self.config.flush()
 
-        name = os.path.basename(self.config.name)
-        self.permission._cache.joinpath(name).write_text(
+        self.permission._cache.write_text(
             "8f434346648f6b96df89dda901c5176b10a6d83961dd3c1ac88b59b2dc327aa4"
         )
 
@@ -48,17 +53,22 @@ class TestConfigPermission(TestCase):
         self.config.write("abcd")
         self.config.flush()
 
-        name = os.path.basename(self.config.name)
-        self.permission._cache.joinpath(name).write_text(
+        self.permission._cache.write_text(
             "88d4266fd4e6338d13b845fcf289579d209c897823b9217da3e161936f031589"
         )
 
         self.assertTrue(self.permission.ask())
 
+    def new_permission(self) -> config.ConfigPermission:
+        with patch("pathlib.Path.home") as mock:
+            mock.return_value = pathlib.Path(self.cache.name)
+            return config.ConfigPermission(self.config)
+
     def test_answer_no(self) -> None:
         for answer in ["", "n", "N", "xyz", "nO", "No", "NO", "not-yes"]:
             self.config.write("x")
             self.config.flush()
+            self.permission = self.new_permission()
 
             with patch("builtins.input") as mock:
                 mock.return_value = answer
@@ -70,6 +80,7 @@ class TestConfigPermission(TestCase):
         for answer in ["y", "Y"]:
             self.config.write("x")
             self.config.flush()
+            self.permission = self.new_permission()
 
             with patch("builtins.input") as mock:
                 mock.return_value = answer
@@ -77,12 +88,36 @@ class TestConfigPermission(TestCase):
                 self.assertTrue(self.permission.ask())
                 self.assertEqual(mock.call_count, 1)
 
-                name = os.path.basename(self.config.name)
                 self.assertEqual(
                     utils.sha256(self.config),
-                    self.permission._cache.joinpath(name).read_text()
+                    self.permission._cache.read_text()
                 )
 
+    def test_memoized(self) -> None:
+        self.config.write("x")
+        self.config.flush()
+
+        with patch("builtins.input") as mock:
+            mock.return_value = "n"
+            self.assertFalse(self.permission.ask())
+            self.assertFalse(self.permission.ask())
+            self.assertEqual(mock.call_count, 1)
+
+        with patch("builtins.input") as mock:
+            self.assertFalse(self.new_permission().ask())
+            self.assertEqual(mock.call_count, 1)
+
+    def test_digest(self) -> None:
+        with patch("pathlib.Path.home") as mock:
+            mock.return_value = pathlib.Path(self.cache.name)
+            permission = config.ConfigPermission(self.config, "abcd")
+
+        permission._cache.write_text("abcd")
+
+        with patch("cloudie.utils.sha256") as mock:
+            self.assertTrue(permission.ask())
+            self.assertEqual(mock.call_count, 0)
+
     def test_mkdir(self) -> None:
         with tempfile.TemporaryDirectory() as tmp:
             with patch("pathlib.Path.home") as mock:
@@ -99,7 +134,11 @@ class TestConfigDecoder(TestCase):
         self.config = tempfile.NamedTemporaryFile("w")
         self.tmpdir = tempfile.TemporaryDirectory()
 
+        self.home = patch("pathlib.Path.home")
+        self.home.start().return_value = pathlib.Path(self.tmpdir.name)
+
     def tearDown(self) -> None:
+        self.home.stop()
         self.config.close()
         self.tmpdir.cleanup()
 
@@ -165,12 +204,291 @@ class TestConfigDecoder(TestCase):
                         config.load(self.config.name)
 
 
+class TestConcurrentCommands(TestCase):
+    def setUp(self) -> None:
+        self.config = tempfile.NamedTemporaryFile("w")
+        self.config.write(
+            """
+            [a]
+            x = "$(echo 1)"
+            [b]
+            x = "$(echo 2)"
+            [c]
+            x = "$(echo 3)"
+            """
+        )
+        self.config.flush()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.home = patch("pathlib.Path.home")
+        self.home.start().return_value = pathlib.Path(self.tmpdir.name)
+        self.input = patch("builtins.input")
+        self.input.start().return_value = "y"
+
+    def tearDown(self) -> None:
+        self.input.stop()
+        self.home.stop()
+        self.config.close()
+        self.tmpdir.cleanup()
+
+    def test_concurrent(self) -> None:
+        barrier = threading.Barrier(3, timeout=5)
+
+        def check_output(args: List[str], **_kwargs: Any) -> bytes:
+            barrier.wait()
+            return args[1].encode()
+
+        with patch("subprocess.check_output") as mock:
+            mock.side_effect = check_output
+            result = config.load(self.config.name, jobs=3)
+
+        want = {"a": {"x": "1"}, "b": {"x": "2"}, "c": {"x": "3"}}
+        self.assertEqual(result, want)
+
+    def test_jobs(self) -> None:
+        lock = threading.Lock()
+        running = []  # type: List[int]
+        peak = []  # type: List[int]
+
+        def check_output(args: List[str], **_kwargs: Any) -> bytes:
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+            return args[1].encode()
+
+        for jobs in [1, 2]:
+            peak.clear()
+            with patch("subprocess.check_output") as mock:
+                mock.side_effect = check_output
+                config.load(self.config.name, jobs=jobs)
+            self.assertTrue(max(peak) <= jobs)
+
+    def test_timeout(self) -> None:
+        with patch("subprocess.check_output") as mock:
+            mock.side_effect = subprocess.TimeoutExpired("echo", 1.5)
+            with self.assertRaises(config.ConfigCommandError):
+                config.load(self.config.name, timeout=1.5)
+
+            for call in mock.call_args_list:
+                self.assertEqual(call[1]["timeout"], 1.5)
+
+    def test_first_error(self) -> None:
+        def check_output(args: List[str], **_kwargs: Any) -> bytes:
+            if args[1] == "3":
+                raise FileNotFoundError
+            time.sleep(0.01)
+            raise subprocess.CalledProcessError(1, args)
+
+        with patch("subprocess.check_output") as mock:
+            mock.side_effect = check_output
+            with self.assertRaises(config.ConfigCommandError) as ctx:
+                config.load(self.config.name)
+
+        self.assertEqual(str(ctx.exception), "$(echo 1) failed")
+
+
+class TestLazyCommands(TestCase):
+    def setUp(self) -> None:
+        self.config = tempfile.NamedTemporaryFile("w")
+        self.config.write("[a]\nx = '$(echo 1)'\ny = ['$(echo 2)']\n")
+        self.config.flush()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.home = patch("pathlib.Path.home")
+        self.home.start().return_value = pathlib.Path(self.tmpdir.name)
+        self.input = patch("builtins.input")
+        self.input.start().return_value = "y"
+
+    def tearDown(self) -> None:
+        self.input.stop()
+        self.home.stop()
+        self.config.close()
+        self.tmpdir.cleanup()
+
+    def test_lazy(self) -> None:
+        with patch("subprocess.check_output") as mock:
+            mock.return_value = b"out"
+            result = config.load(self.config.name, lazy=True)
+            self.assertEqual(mock.call_count, 0)
+
+            x = result["a"]["x"]
+            self.assertIsInstance(x, config.ConfigCommand)
+            self.assertEqual(repr(x), "ConfigCommand('$(echo 1)')")
+
+            self.assertEqual(config.resolve(x), "out")
+            self.assertEqual(config.resolve(x), "out")
+            self.assertEqual(mock.call_count, 1)
+
+            self.assertEqual(config.resolve(result["a"]["y"]), ["out"])
+            self.assertEqual(mock.call_count, 2)
+
+            want = {"a": {"x": "out", "y": ["out"]}}
+            self.assertEqual(config.resolve(result), want)
+            self.assertEqual(mock.call_count, 2)
+
+    def test_permission_denied(self) -> None:
+        self.input.stop()
+        with patch("builtins.input") as mock:
+            mock.return_value = "n"
+            with self.assertRaises(config.ConfigPermissionError):
+                config.load(self.config.name, lazy=True)
+        self.input.start()
+
+    def test_resolve_plain(self) -> None:
+        self.assertEqual(config.resolve("abc"), "abc")
+        self.assertEqual(config.resolve(None), None)
+        self.assertEqual(config.resolve({"a": [1]}), {"a": [1]})
+
+
+class TestConfigSecrets(TestCase):
+    def setUp(self) -> None:
+        self.config = tempfile.NamedTemporaryFile("w")
+        self.config.write(
+            """
+            [a]
+            x = { command = "$(echo x)", ttl = 60 }
+            y = "$(echo y)"
+            """
+        )
+        self.config.flush()
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.patches = [
+            patch("pathlib.Path.home"),
+            patch("builtins.input"),
+            patch("shutil.which"),
+            patch.dict(config.ConfigSecrets._entries),  # pylint: disable=W0212
+        ]  # type: List[Any]
+        home, input_, which, _ = [p.start() for p in self.patches]
+        home.return_value = pathlib.Path(self.tmpdir.name)
+        input_.return_value = "y"
+        which.return_value = None
+
+    def tearDown(self) -> None:
+        for p in self.patches:
+            p.stop()
+        self.config.close()
+        self.tmpdir.cleanup()
+
+    def load(self) -> List[str]:
+        with patch("subprocess.check_output") as mock:
+            mock.side_effect = lambda args, **_: args[1].encode()
+            result = config.load(self.config.name)
+            self.assertEqual(result, {"a": {"x": "x", "y": "y"}})
+            return [c[0][0][1] for c in mock.call_args_list]
+
+    def test_memory(self) -> None:
+        self.assertEqual(sorted(self.load()), ["x", "y"])
+        self.assertEqual(self.load(), ["y"])
+
+    def test_expired(self) -> None:
+        self.assertEqual(sorted(self.load()), ["x", "y"])
+        now = time.monotonic()
+        with patch("time.monotonic") as mock:
+            mock.return_value = now + 61
+            self.assertEqual(sorted(self.load()), ["x", "y"])
+
+    def test_modified(self) -> None:
+        self.assertEqual(sorted(self.load()), ["x", "y"])
+        self.config.write("\n")
+        self.config.flush()
+        self.assertEqual(sorted(self.load()), ["x", "y"])
+
+    def test_invalid_ttl(self) -> None:
+        for ttl in ["-1", "'1'", "true"]:
+            with tempfile.NamedTemporaryFile("w") as tmp:
+                tmp.write(
+                    "[a]\nb = {{ command = '$(x)', ttl = {} }}".format(ttl)
+                )
+                tmp.flush()
+
+                with self.assertRaises(config.ConfigError) as ctx:
+                    config.load(tmp.name)
+            self.assertEqual(str(ctx.exception), "invalid ttl for 'a.b'")
+
+    def test_not_a_command(self) -> None:
+        self.config.write("b = { command = 'x', ttl = 1 }")
+        self.config.flush()
+
+        result = config.load(self.config.name)
+        self.assertEqual(result["a"]["b"], {"command": "x", "ttl": 1})
+
+    def test_keyring(self) -> None:
+        keyring = {}  # type: dict
+
+        def run(args: List[str], **kwargs: Any) -> Any:
+            proc = Mock()
+            if args[1] == "search":
+                proc.stdout = ("{}\n".format(args[4]).encode())
+                if args[4] not in keyring:
+                    raise subprocess.CalledProcessError(1, args)
+            elif args[1] == "pipe":
+                proc.stdout = keyring[args[2]]
+            elif args[1] == "padd":
+                keyring[args[3]] = kwargs["input"]
+                proc.stdout = "{}\n".format(args[3]).encode()
+            elif args[1] == "timeout":
+                self.assertEqual(args[3], "60")
+            return proc
+
+        with patch("shutil.which") as which:
+            which.return_value = "/bin/keyctl"
+            with patch("subprocess.run") as mock:
+                mock.side_effect = run
+                self.assertEqual(sorted(self.load()), ["x", "y"])
+                config.ConfigSecrets._entries.clear()  # pylint: disable=W0212
+                self.assertEqual(self.load(), ["y"])
+
+                self.assertEqual(list(keyring.values()), [b"x"])
+                for name in keyring:
+                    self.assertTrue(name.startswith("cloudie:"))
+
+    def test_keyring_timeout_failure(self) -> None:
+        calls = []  # type: List[List[str]]
+
+        def run(args: List[str], **_kwargs: Any) -> Any:
+            calls.append(args[1:])
+            if args[1] == "search":
+                raise subprocess.CalledProcessError(1, args)
+            if args[1] in ["timeout", "unlink"]:
+                raise subprocess.CalledProcessError(1, args)
+            return Mock(stdout=b"123\n")
+
+        with patch("shutil.which") as which:
+            which.return_value = "/bin/keyctl"
+            with patch("subprocess.run") as mock:
+                mock.side_effect = run
+                self.assertEqual(sorted(self.load()), ["x", "y"])
+
+        # The key is removed since it would never expire.
+        names = ["search", "padd", "timeout", "unlink"]
+        self.assertEqual([c[0] for c in calls], names)
+        self.assertEqual(calls[3], ["unlink", "123", "@u"])
+
+    def test_keyring_failure(self) -> None:
+        with patch("shutil.which") as which:
+            which.return_value = "/bin/keyctl"
+            with patch("subprocess.run") as mock:
+                mock.side_effect = FileNotFoundError
+                self.assertEqual(sorted(self.load()), ["x", "y"])
+                self.assertEqual(sorted(self.load()), ["x", "y"])
+
+
 class TestLoad(TestCase):
     def setUp(self) -> None:
         self.config = tempfile.NamedTemporaryFile("w")
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.home = patch("pathlib.Path.home")
+        self.home.start().return_value = pathlib.Path(self.tmpdir.name)
 
     def tearDown(self) -> None:
+        self.home.stop()
         self.config.close()
+        self.tmpdir.cleanup()
 
     def test_file_not_found(self) -> None:
         self.config.close()
@@ -187,7 +505,8 @@ class TestLoad(TestCase):
         with self.assertRaises(config.ConfigError) as ctx:
             config.load(self.config.name)
 
-        self.assertTrue("Invalid date or number" in str(ctx.exception))
+        msg = "{}: invalid TOML at line 1".format(self.config.name)
+        self.assertEqual(str(ctx.exception), msg)
 
     def test_success(self) -> None:
         self.config.write(
@@ -202,3 +521,527 @@ class TestLoad(TestCase):
 
         result = config.load(self.config.name)
         self.assertEqual(result, {"x": "y", "section": {"num": 123}})
+
+
+class TestParsers(TestCase):
+    """
+    Every available parser must produce identical results.
+    """
+
+    VALID = [
+        "a = 'b'\nc = \"d\\te\\u00e5\"\nf = '''g\\n'''\nh = \"\"\"\ni\"\"\"",
+        "a = 1\nb = -2\nc = 0x10\nd = 1_000\ne = 1e3\nf = -0.5\ng = inf",
+        "a = true\nb = false",
+        "a = [1, 2, ]\nb = [[1, 2], ['c']]\nc = []",
+        "a = {b = {c = 1}}\nd.e.f = 2\n'g h' = 3",
+        "[a]\nb = 1\n[a.c]\nd = 2\n[[e]]\nf = 1\n[[e]]\nf = 2",
+        "a = 1979-05-27\nb = 07:32:00\nc = 1979-05-27T07:32:00",
+        "a = 1979-05-27T07:32:00Z\nb = 1979-05-27T00:32:00.999999-07:00",
+        "[role.x]\nkey = '$(echo x)'\nlist = ['$(echo y)', 'z']",
+        "[role.x]\nkey = { command = '$(echo x)', ttl = 60 }",
+    ]
+
+    INVALID = [
+        ("x = y", 1),
+        ("x = 1\ny = ", 2),
+        ("[a]\nx = 1\n[a]\nx = 2", 3),
+        ("a = 1\na = 2", 2),
+        ("[a\nx = 1", 1),
+        ("= 1", 1),
+    ]
+
+    def setUp(self) -> None:
+        self.parsers = [
+            p for p in config.PARSERS if importlib.util.find_spec(p)
+        ]
+        self.config = tempfile.NamedTemporaryFile("w")
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.patches = [
+            patch("pathlib.Path.home"),
+            patch("builtins.input"),
+            patch("subprocess.check_output"),
+        ]  # type: List[Any]
+        home, input_, check_output = [p.start() for p in self.patches]
+        home.return_value = pathlib.Path(self.tmpdir.name)
+        input_.return_value = "y"
+        check_output.side_effect = lambda args, **_: args[1].encode()
+
+    def tearDown(self) -> None:
+        for p in self.patches:
+            p.stop()
+        self.config.close()
+        self.tmpdir.cleanup()
+
+    def write(self, data: str) -> None:
+        self.config.seek(0)
+        self.config.truncate()
+        self.config.write(data)
+        self.config.flush()
+
+    def test_preferred(self) -> None:
+        # pylint: disable=protected-access
+        self.assertEqual(config._parser(), self.parsers[0])
+        self.assertTrue("toml" in self.parsers)
+
+    def test_fallback(self) -> None:
+        # pylint: disable=protected-access
+        find_spec = importlib.util.find_spec
+        with patch("importlib.util.find_spec") as mock:
+            mock.side_effect = lambda n: n == "toml" and find_spec(n)
+            config._parser.cache_clear()
+            try:
+                self.assertEqual(config._parser(), "toml")
+            finally:
+                config._parser.cache_clear()
+
+    def test_valid(self) -> None:
+        for data in self.VALID:
+            self.write(data)
+            results = [
+                config.load(self.config.name, munch.Munch, parser=p)
+                for p in self.parsers
+            ]
+            for result in results:
+                self.assertEqual(result, results[0])
+                self.assertEqual(repr(result), repr(results[0]))
+
+    def test_invalid(self) -> None:
+        for data, line in self.INVALID:
+            self.write(data)
+            msg = "{}: invalid TOML at line {}".format(self.config.name, line)
+            for parser in self.parsers:
+                with self.assertRaises(config.ConfigError) as ctx:
+                    config.load(self.config.name, parser=parser)
+                self.assertEqual(str(ctx.exception), msg)
+
+    def test_parse(self) -> None:
+        self.write("a = '$(echo x)'\ninclude = ['y']")
+        for parser in self.parsers:
+            with open(self.config.name) as f:
+                result = config.parse(f, parser)
+            self.assertEqual(result, {"a": "$(echo x)", "include": ["y"]})
+
+        self.write("a = ")
+        with open(self.config.name) as f:
+            with self.assertRaises(config.ConfigError):
+                config.parse(f)
+
+    def test_cached_per_parser(self) -> None:
+        self.write("a = 1")
+        for parser in self.parsers:
+            config.load(self.config.name, parser=parser)
+
+        with patch("cloudie.config._parse") as mock:
+            config.load(self.config.name, parser=self.parsers[-1])
+            self.assertEqual(mock.call_count, 0)
+
+
+class TestConfigCache(TestCase):
+    def setUp(self) -> None:
+        self.config = tempfile.NamedTemporaryFile("w")
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.home = patch("pathlib.Path.home")
+        self.home.start().return_value = pathlib.Path(self.tmpdir.name)
+
+    def tearDown(self) -> None:
+        self.home.stop()
+        self.config.close()
+        self.tmpdir.cleanup()
+
+    def test_cached(self) -> None:
+        self.config.write("[section]\nnum = 123\n")
+        self.config.flush()
+
+        want = {"section": {"num": 123}}
+        self.assertEqual(config.load(self.config.name), want)
+
+        with patch("cloudie.config._parse") as mock:
+            self.assertEqual(config.load(self.config.name), want)
+            self.assertEqual(mock.call_count, 0)
+
+    def test_prune(self) -> None:
+        cache = utils.cache_dir()
+        removed = tempfile.NamedTemporaryFile("w")
+        removed.write("a = 1\n")
+        removed.flush()
+        config.load(removed.name)
+        removed.close()
+
+        invalid = cache.joinpath("invalid.config")
+        invalid.write_bytes(b"")
+        self.assertEqual(len(list(cache.glob("*.config"))), 2)
+
+        self.config.write("a = 2\n")
+        self.config.flush()
+        config.load(self.config.name)
+
+        # The entry for the removed file is pruned.
+        entries = sorted(cache.glob("*.config"))
+        self.assertEqual(len(entries), 2)
+        self.assertTrue(invalid in entries)
+        with patch("cloudie.config._parse") as mock:
+            config.load(self.config.name)
+            self.assertEqual(mock.call_count, 0)
+
+    def test_modified(self) -> None:
+        self.config.write("[section]\nnum = 123\n")
+        self.config.flush()
+        config.load(self.config.name)
+
+        self.config.write("str = 'abc'\n")
+        self.config.flush()
+
+        want = {"section": {"num": 123, "str": "abc"}}
+        self.assertEqual(config.load(self.config.name), want)
+
+    def test_dict_class(self) -> None:
+        self.config.write("[a.b]\nc = [{d = 1}]\n")
+        self.config.flush()
+
+        for _ in range(2):
+            result = cast(
+                munch.Munch, config.load(self.config.name, munch.Munch)
+            )
+            self.assertIsInstance(result.a.b, munch.Munch)
+            self.assertIsInstance(result.a.b.c[0], munch.Munch)
+            self.assertEqual(result.a.b.c[0].d, 1)
+
+    def test_commands_not_cached(self) -> None:
+        self.config.write("[section]\na = ['$(echo secret)', 'x']\n")
+        self.config.flush()
+
+        want = {"section": {"a": ["secret", "x"]}}
+        with patch("builtins.input") as mock:
+            mock.return_value = "y"
+            for _ in range(2):
+                with patch("subprocess.check_output") as co_mock:
+                    co_mock.return_value = b"secret\n"
+                    self.assertEqual(config.load(self.config.name), want)
+                    self.assertEqual(co_mock.call_count, 1)
+
+        for path in pathlib.Path(self.tmpdir.name).glob("**/*.config"):
+            data = path.read_bytes()
+            self.assertTrue(b"$(echo secret)" in data)
+            self.assertFalse(b"secret\n" in data)
+            self.assertEqual(path.stat().st_mode & 0o777, 0o600)
+
+    def test_unsupported_value(self) -> None:
+        self.config.write("date = 1979-05-27\n")
+        self.config.flush()
+
+        for _ in range(2):
+            result = config.load(self.config.name)
+            self.assertEqual(result["date"].year, 1979)
+
+        cached = list(pathlib.Path(self.tmpdir.name).glob("**/*.config"))
+        self.assertEqual(cached, [])
+
+    def test_invalid_cache(self) -> None:
+        self.config.write("x = 1\n")
+        self.config.flush()
+        config.load(self.config.name)
+
+        for path in pathlib.Path(self.tmpdir.name).glob("**/*.config"):
+            path.write_bytes(b"garbage")
+
+        self.assertEqual(config.load(self.config.name), {"x": 1})
+
+    def test_write_failure(self) -> None:
+        self.config.write("x = 1\n")
+        self.config.flush()
+
+        with patch("os.replace") as mock:
+            mock.side_effect = PermissionError
+            self.assertEqual(config.load(self.config.name), {"x": 1})
+
+
+class TestConfigCounters(TestCase):
+    def setUp(self) -> None:
+        self.config = tempfile.NamedTemporaryFile("w")
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.patches = [
+            patch("pathlib.Path.home"),
+            patch("builtins.input"),
+            patch("subprocess.check_output"),
+        ]  # type: List[Any]
+        home, input_, check_output = [p.start() for p in self.patches]
+        home.return_value = pathlib.Path(self.tmpdir.name)
+        input_.return_value = "y"
+        check_output.return_value = b"x"
+        config.COUNTERS.clear()
+
+    def tearDown(self) -> None:
+        config.COUNTERS.clear()
+        for p in self.patches:
+            p.stop()
+        self.config.close()
+        self.tmpdir.cleanup()
+
+    def test_flat(self) -> None:
+        for count in [1, 100]:
+            self.config.seek(0)
+            self.config.truncate()
+            for i in range(count):
+                self.config.write("a{} = '$(echo {})'\n".format(i, i))
+            self.config.flush()
+
+            config.COUNTERS.clear()
+            result = config.load(self.config.name)
+            self.assertEqual(len(result), count)
+
+            calls = config.COUNTERS.calls
+            self.assertEqual(calls["load"], 1)
+            self.assertEqual(calls["hash"], 1)
+            self.assertEqual(calls["parse"], 1)
+            self.assertEqual(calls["permission"], 1)
+            self.assertGreater(config.COUNTERS.time["load"], 0)
+
+    def test_cached(self) -> None:
+        self.config.write("a = 1\n")
+        self.config.flush()
+
+        config.load(self.config.name)
+        config.load(self.config.name)
+
+        calls = config.COUNTERS.calls
+        self.assertEqual(calls["load"], 2)
+        self.assertEqual(calls["hash"], 2)
+        self.assertEqual(calls["parse"], 1)
+        self.assertEqual(calls["permission"], 0)
+
+
+class TestLayers(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmpdir.name)
+
+        self.home = self.root.joinpath("home")
+        self.patches = [
+            patch.dict(os.environ, {"HOME": str(self.home)}),
+            patch("builtins.input"),
+        ]  # type: List[Any]
+        _, self.input = [p.start() for p in self.patches]
+        self.input.return_value = "y"
+        config.COUNTERS.clear()
+
+    def tearDown(self) -> None:
+        config.COUNTERS.clear()
+        for p in self.patches:
+            p.stop()
+        self.tmpdir.cleanup()
+
+    def write(self, name: str, data: str) -> str:
+        path = self.root.joinpath(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(data)
+        return str(path)
+
+    def test_merge(self) -> None:
+        paths = [
+            self.write(
+                "a.toml", "x = 1\n[role]\ndefault = 'a'\n[role.a]\nk = 1"
+            ),
+            self.write("b.toml", "y = [1]\n[role.b]\nk = 2\n[role.a]\nj = 3"),
+            self.write("c.toml", "y = [2]\n[role]\ndefault = 'b'"),
+        ]
+        result = config.load(paths, munch.Munch)
+        self.assertEqual(
+            result, {
+                "x": 1,
+                "y": [2],
+                "role": {
+                    "default": "b",
+                    "a": {
+                        "k": 1,
+                        "j": 3
+                    },
+                    "b": {
+                        "k": 2
+                    },
+                },
+            }
+        )
+        self.assertIsInstance(result["role"]["a"], munch.Munch)
+
+    def test_include(self) -> None:
+        self.write("teams/a.toml", "[role.a]\nk = 1\nj = 1")
+        self.write("teams/b.toml", "[role.b]\nk = 2")
+        self.write("teams/c.txt", "invalid")
+        path = self.write(
+            "main.toml",
+            "include = ['teams/*.toml', 'missing.toml']\n[role.a]\nj = 2",
+        )
+
+        result = config.load(path)
+        self.assertEqual(
+            result, {"role": {
+                "a": {
+                    "k": 1,
+                    "j": 2
+                },
+                "b": {
+                    "k": 2
+                },
+            }}
+        )
+
+    def test_include_cycle(self) -> None:
+        self.write("a.toml", "include = ['b.toml']\na = 1")
+        self.write("b.toml", "include = ['a.toml']\nb = 2")
+        path = str(self.root.joinpath("a.toml"))
+        self.assertEqual(config.load([path, path]), {"a": 1, "b": 2})
+
+    def test_invalid_include(self) -> None:
+        for include in ["'a.toml'", "[1]"]:
+            path = self.write("a.toml", "include = {}".format(include))
+            with self.assertRaises(config.ConfigError) as ctx:
+                config.load(path)
+            self.assertEqual(
+                str(ctx.exception),
+                "{}: include must be a list of paths".format(path)
+            )
+
+    def test_missing_include(self) -> None:
+        path = self.write("a.toml", "include = ['b.toml']")
+        self.write("b.toml", "x = 1")
+        with patch("cloudie.config.open", create=True) as mock:
+            mock.side_effect = [open(path), PermissionError(13, "Denied")]
+            with self.assertRaises(config.ConfigError) as ctx:
+                config.load(path)
+        self.assertEqual(
+            str(ctx.exception),
+            "{}: Denied".format(self.root.joinpath("b.toml"))
+        )
+
+    def test_incremental(self) -> None:
+        paths = [
+            self.write("{}.toml".format(n), "{} = 1".format(n)) for n in "abc"
+        ]
+        config.load(paths)
+        self.assertEqual(config.COUNTERS.calls["parse"], 3)
+
+        self.write("b.toml", "b = 2")
+        config.COUNTERS.clear()
+        self.assertEqual(config.load(paths), {"a": 1, "b": 2, "c": 1})
+        self.assertEqual(config.COUNTERS.calls["parse"], 1)
+        self.assertEqual(config.COUNTERS.calls["load"], 1)
+
+    def test_commands(self) -> None:
+        paths = [
+            self.write("a.toml", "[role.a]\nkey = '$(echo a)'"),
+            self.write("b.toml", "[role.b]\nkey = '$(echo b)'"),
+        ]
+        with patch("subprocess.check_output") as mock:
+            mock.side_effect = lambda args, **_: args[1].encode()
+            result = config.load(paths, lazy=True)
+            self.assertEqual(config.resolve(result["role"]["b"]["key"]), "b")
+            self.assertEqual(mock.call_count, 1)
+        self.assertEqual(self.input.call_count, 2)
+
+    def test_commands_same_name(self) -> None:
+        paths = [
+            self.write("home/.cloudie.toml", "[role.a]\nkey = '$(echo a)'"),
+            self.write("home/x/.cloudie.toml", "[role.b]\nkey = '$(echo b)'"),
+        ]
+        with patch("subprocess.check_output") as mock:
+            mock.side_effect = lambda args, **_: args[1].encode()
+            for _ in range(3):
+                result = config.load(paths, lazy=True)
+                role = result["role"]
+                self.assertEqual(config.resolve(role["a"]["key"]), "a")
+                self.assertEqual(config.resolve(role["b"]["key"]), "b")
+
+        # Each file is approved once, since they're approved by path.
+        self.assertEqual(self.input.call_count, 2)
+
+    def test_layers(self) -> None:
+        user = self.write("home/.cloudie.toml", "")
+        cwd = self.root.joinpath("home", "x", "y")
+        cwd.mkdir(parents=True)
+        local = [
+            self.write("home/x/.cloudie.toml", ""),
+            self.write("home/x/y/.cloudie.toml", ""),
+        ]
+        system = self.write("etc/cloudie.toml", "")
+
+        with patch("pathlib.Path.cwd") as mock:
+            mock.return_value = cwd
+            self.assertEqual(
+                config.layers(config.USER_CONFIG), [config.USER_CONFIG] + local
+            )
+            self.assertEqual(config.layers(user), [user] + local)
+
+            with patch("cloudie.config.GLOBAL_CONFIG", system):
+                self.assertEqual(config.layers(user), [system, user] + local)
+
+    def test_layers_explicit(self) -> None:
+        self.write(
+            "home/.cloudie.toml", "[role.a]\nprovider = 'x'\nkey = 'HOME'"
+        )
+        self.write("home/x/.cloudie.toml", "[role.a]\nkey = 'LOCAL'")
+        explicit = self.write("explicit.toml", "[role.a]\nkey = 'EXPLICIT'")
+        cwd = self.root.joinpath("home", "x")
+
+        # Only the default user file is combined with local files.
+        with patch("pathlib.Path.cwd") as mock:
+            mock.return_value = cwd
+            paths = config.layers(explicit)
+            self.assertEqual(paths, [explicit])
+            result = config.load(paths)
+        self.assertEqual(result["role"]["a"], {"key": "EXPLICIT"})
+
+    def test_layers_untrusted(self) -> None:
+        cwd = self.root.joinpath("home", "x", "y", "z")
+        cwd.mkdir(parents=True)
+        local = self.write("home/x/.cloudie.toml", "")
+        writable = self.write("home/x/y/.cloudie.toml", "")
+        os.chmod(writable, 0o666)
+        other = self.write("home/x/y/z/.cloudie.toml", "")
+
+        uid = os.getuid()
+        with patch("pathlib.Path.cwd") as mock:
+            mock.return_value = cwd
+            with patch("os.stat", side_effect=self.stat(other, uid + 1)):
+                paths = config.layers(config.USER_CONFIG)
+        self.assertEqual(paths, [config.USER_CONFIG, local])
+
+    def test_layers_outside_home(self) -> None:
+        cwd = self.root.joinpath("project", "x")
+        cwd.mkdir(parents=True)
+        parent = self.write(".cloudie.toml", "")
+        local = self.write("project/.cloudie.toml", "")
+
+        # The walk stops at mount points.
+        def ismount(path: str) -> bool:
+            return path == str(self.root)
+
+        with patch("pathlib.Path.cwd") as mock:
+            mock.return_value = cwd
+            with patch("os.path.ismount", ismount):
+                paths = config.layers(config.USER_CONFIG)
+            self.assertEqual(paths, [config.USER_CONFIG, local])
+
+            with patch("os.path.ismount", return_value=False):
+                paths = config.layers(config.USER_CONFIG)
+            self.assertEqual(paths, [config.USER_CONFIG, parent, local])
+
+    @staticmethod
+    def stat(path: str, uid: int) -> Callable:
+        """
+        Return a replacement for `os.stat()` where `path` is owned by
+        `uid`.
+        """
+        orig = os.stat
+
+        def func(p: Any, *args: Any, **kwargs: Any) -> os.stat_result:
+            st = orig(p, *args, **kwargs)
+            if str(p) == path:
+                values = list(st)
+                values[4] = uid
+                return os.stat_result(values)
+            return st
+
+        return func
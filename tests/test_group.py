@@ -1,3 +1,6 @@
+import sys
+from unittest.mock import patch
+
 from libcloud.common.exceptions import BaseHTTPError
 from libcloud.common.types import InvalidCredsError
 from requests.exceptions import RequestException
@@ -62,3 +65,24 @@ class TestGroup(ClickTestCase):
 
         self.assertTrue("success" in result.output)
         self.assertEqual(result.exit_code, 0)
+
+    def test_other_exception(self) -> None:
+        @cli.cli.command()
+        def command() -> None:
+            raise ValueError("asdf")
+
+        args = ["--config-file", self.config.name, command.name]
+        result = self.runner.invoke(cli.cli, args)
+        self.assertEqual(type(result.exception), ValueError)
+
+        with patch.dict(sys.modules):
+            del sys.modules["libcloud"]
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(type(result.exception), ValueError)
+
+    def test_lazy_commands(self) -> None:
+        args = ["--config-file", self.config.name, "--help"]
+        result = self.runner.invoke(cli.cli, args)
+
+        self.assertTrue("compute" in result.output)
+        self.assertEqual(result.exit_code, 0)
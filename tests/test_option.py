@@ -1,5 +1,6 @@
-from typing import Any
-from unittest.mock import patch
+from typing import Any, List
+from unittest import TestCase
+from unittest.mock import Mock, patch
 
 import click
 from libcloud.common.base import BaseDriver
@@ -461,3 +462,220 @@ class TestPassDriver(ClickTestCase):
                 host=None,
                 port=None,
             )
+
+    def test_commands(self) -> None:
+        kw = Munch()
+
+        @cli.cli.command()
+        @option.add("--opt")
+        @option.pass_driver(ComputeProvider)
+        def command(driver: BaseDriver, **kwargs: Any) -> None:
+            kw.update(kwargs)
+            print(driver.creds)
+
+        self.config.write(
+            b"""
+            [role]
+            default = "$(echo x)"
+
+            [role.x]
+            provider = "$(echo dummy)"
+            key = "$(echo key)"
+            opt = "$(echo opt)"
+            unused = "$(echo unused)"
+
+            [role.y]
+            provider = "dummy"
+            key = "$(echo other)"
+            """
+        )
+        self.config.flush()
+
+        def check_output(args: List[str], **_kwargs: Any) -> bytes:
+            return args[1].encode()
+
+        args = ["--config-file", self.config.name, command.name]
+        with patch("cloudie.config.ConfigPermission.ask") as ask:
+            ask.return_value = True
+            with patch("subprocess.check_output") as mock:
+                mock.side_effect = check_output
+                result = self.runner.invoke(cli.cli, args)
+
+                executed = sorted(c[0][0][1] for c in mock.call_args_list)
+                self.assertEqual(executed, ["dummy", "key", "opt", "x"])
+
+        self.assertEqual(kw.opt, "opt")
+        self.assertEqual(result.output, "key\n")
+        self.assertEqual(result.exit_code, 0)
+
+    def test_command_failure(self) -> None:
+        @cli.cli.command()
+        @option.pass_driver(ComputeProvider)
+        def command(_driver: BaseDriver) -> None:
+            pass
+
+        self.config.write(b"[role.x]\nprovider='dummy'\nkey='$(false)'\n")
+        self.config.flush()
+
+        args = ["--config-file", self.config.name, command.name, "--role", "x"]
+        with patch("cloudie.config.ConfigPermission.ask") as ask:
+            ask.return_value = True
+            with patch("subprocess.check_output") as mock:
+                mock.side_effect = FileNotFoundError
+                result = self.runner.invoke(cli.cli, args)
+
+        self.assertEqual(result.output, "Error: $(false) failed\n")
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_cached(self) -> None:
+        drivers = []  # type: List[BaseDriver]
+
+        @cli.cli.command()
+        @option.pass_driver(ComputeProvider)
+        def command(driver: BaseDriver) -> None:
+            drivers.append(driver)
+
+        self.config.write(
+            b"""
+            [role.x]
+            provider = "dummy"
+            key = "abcd"
+
+            [role.y]
+            provider = "dummy"
+            key = "abcd"
+            """
+        )
+        self.config.flush()
+
+        for role in ["x", "x", "y", "x"]:
+            args = ["--config-file", self.config.name, command.name]
+            result = self.runner.invoke(cli.cli, args + ["--role", role])
+            self.assertEqual(result.exit_code, 0)
+
+        self.assertIs(drivers[0], drivers[1])
+        self.assertIsNot(drivers[0], drivers[2])
+        self.assertIs(drivers[0], drivers[3])
+
+        self.config.seek(0)
+        self.config.write(b"[role.x]\nprovider='dummy'\nkey='efgh'\n")
+        self.config.truncate()
+        self.config.flush()
+
+        args = ["--config-file", self.config.name, command.name, "--role", "x"]
+        result = self.runner.invoke(cli.cli, args)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIsNot(drivers[0], drivers[4])
+        self.assertEqual(drivers[4].creds, "efgh")
+
+
+class TestPassDrivers(ClickTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.config.write(
+            b"""
+            [role]
+            default = "y"
+
+            [role.x]
+            provider = "dummy"
+            key = "x"
+
+            [role.y]
+            provider = "dummy"
+            key = "y"
+            """
+        )
+        self.config.flush()
+
+        @cli.cli.command()
+        @option.pass_drivers(ComputeProvider)
+        def command(drivers: List[Any], jobs: int) -> None:
+            """
+            Help text.
+            """
+            for role, factory in drivers:
+                print("{} {} {}".format(role, factory().creds, jobs))
+
+        self.command = command
+
+    def invoke(self, *args: str) -> Any:
+        args = ("--config-file", self.config.name, self.command.name) + args
+        return self.runner.invoke(cli.cli, args)
+
+    def test_help(self) -> None:
+        result = self.invoke("--help")
+        self.assertTrue("Help text." in result.output)
+        self.assertTrue("--all-roles" in result.output)
+
+    def test_default_role(self) -> None:
+        result = self.invoke()
+        self.assertEqual(result.output, "y y 8\n")
+        self.assertEqual(result.exit_code, 0)
+
+    def test_roles(self) -> None:
+        result = self.invoke("--role", "y", "--role", "x", "--role", "y")
+        self.assertEqual(result.output, "y y 8\nx x 8\n")
+        self.assertEqual(result.exit_code, 0)
+
+    def test_all_roles(self) -> None:
+        result = self.invoke("--all-roles", "--jobs", "2")
+        self.assertEqual(result.output, "x x 2\ny y 2\n")
+        self.assertEqual(result.exit_code, 0)
+
+    def test_no_roles(self) -> None:
+        self.config.truncate(0)
+        self.config.flush()
+
+        result = self.invoke("--all-roles")
+        self.assertEqual(
+            result.output, "Error: no roles in the configuration\n"
+        )
+        self.assertNotEqual(result.exit_code, 0)
+
+    def test_unknown_role(self) -> None:
+        result = self.invoke("--role", "z")
+        self.assertEqual(result.output, "Error: unknown role 'z'\n")
+        self.assertNotEqual(result.exit_code, 0)
+
+
+class TestDriverCache(TestCase):
+    def test_get(self) -> None:
+        cache = option.DriverCache()
+        factory = Mock(side_effect=lambda: object())
+
+        driver = cache.get(("compute", "dummy", "x", "abcd"), factory)
+        self.assertIs(
+            cache.get(("compute", "dummy", "x", "abcd"), factory), driver
+        )
+        self.assertIsNot(
+            cache.get(("compute", "dummy", "x", "efgh"), factory), driver
+        )
+        self.assertEqual(factory.call_count, 2)
+
+    def test_size(self) -> None:
+        cache = option.DriverCache(2)
+        for key in [(1, ), (2, ), (1, ), (3, )]:
+            cache.get(key, object)
+        self.assertEqual(len(cache), 2)
+
+        factory = Mock(side_effect=lambda: object())
+        cache.get((1, ), factory)
+        cache.get((3, ), factory)
+        self.assertEqual(factory.call_count, 0)
+        cache.get((2, ), factory)
+        self.assertEqual(factory.call_count, 1)
+
+    def test_evict(self) -> None:
+        cache = option.DriverCache()
+        for role in ["x", "y", "x"]:
+            cache.get(("compute", "dummy", role, role), object)
+        cache.get(("compute", "dummy", "x", "other"), object)
+        self.assertEqual(len(cache), 3)
+
+        cache.evict("x")
+        self.assertEqual(len(cache), 1)
+        cache.evict("x")
+        self.assertEqual(len(cache), 1)
+        cache.evict()
+        self.assertEqual(len(cache), 0)
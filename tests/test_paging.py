@@ -0,0 +1,116 @@
+import threading
+import time
+from typing import Any, List
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from libcloud.compute.drivers.digitalocean import DigitalOceanNodeDriver
+from libcloud.compute.drivers.dummy import DummyNodeDriver
+
+from cloudie import cli, compute, paging
+
+from .helpers import ClickTestCase, DigitalOceanDummyNodeDriver
+
+
+class TestIterate(TestCase):
+    def setUp(self) -> None:
+        self.driver = DigitalOceanNodeDriver("token")
+        self.sizes = [
+            dict(DigitalOceanDummyNodeDriver.sizes[0], slug=str(i))
+            for i in range(1, 9)
+        ]
+        self.links = "next"
+        self.lock = threading.Lock()
+        self.threads = set()  # type: set
+
+        self.patch = patch.object(self.driver.connection, "request")
+        self.request = self.patch.start()
+        self.request.side_effect = self.response
+
+    def tearDown(self) -> None:
+        self.patch.stop()
+
+    def response(self, path: str, params: Any) -> Mock:
+        self.assertEqual(path, "/v2/sizes")
+
+        # Later pages are returned sooner.
+        page = params["page"]
+        time.sleep((len(self.sizes) - page) * 0.002)
+
+        data = {"sizes": [self.sizes[page - 1]]}  # type: dict
+        if page < len(self.sizes):
+            pages = data["links"] = {"pages": {"next": "..."}}
+            if self.links == "last":
+                pages["pages"]["last"] = "https://x/v2/sizes?page=8"
+            elif self.links == "meta":
+                data["meta"] = {"total": 8 * self.driver.ex_per_page}
+
+        with self.lock:
+            self.threads.add(threading.get_ident())
+        return Mock(object=data)
+
+    def pages(self) -> List[int]:
+        return sorted(
+            c[1]["params"]["page"] for c in self.request.call_args_list
+        )
+
+    def test_pages(self) -> None:
+        for links in ["next", "last", "meta"]:
+            self.links = links
+            self.request.reset_mock()
+
+            sizes = list(paging.iterate(self.driver.list_sizes))
+            self.assertEqual([s.id for s in sizes],
+                             [str(i) for i in range(1, 9)])
+            self.assertEqual(self.pages(), list(range(1, 9)))
+
+    def test_concurrent(self) -> None:
+        self.links = "last"
+        list(paging.iterate(self.driver.list_sizes, jobs=3))
+        self.assertEqual(len(self.threads), 4)
+
+    def test_early_termination(self) -> None:
+        for links in ["next", "last"]:
+            self.links = links
+            self.request.reset_mock()
+
+            sizes = iter(paging.iterate(self.driver.list_sizes, jobs=2))
+            self.assertEqual(next(sizes).id, "1")
+            self.assertEqual(self.pages(), [1])
+
+            self.assertEqual(next(sizes).id, "2")
+            sizes.close()  # type: ignore
+            self.assertTrue(len(self.pages()) <= 4)
+
+    def test_get(self) -> None:
+        size = compute._get(  # pylint: disable=protected-access
+            self.driver.list_sizes, lambda s: s.id == "1"
+        )
+        self.assertEqual(size.id, "1")
+        self.assertEqual(self.pages(), [1])
+
+    def test_no_links(self) -> None:
+        self.request.side_effect = None
+        self.request.return_value = Mock(object={"sizes": self.sizes})
+        self.assertEqual(len(list(paging.iterate(self.driver.list_sizes))), 8)
+
+    def test_other_drivers(self) -> None:
+        with patch.object(DummyNodeDriver, "list_nodes") as mock:
+            mock.return_value = []
+            driver = DummyNodeDriver(0)
+            self.assertEqual(paging.iterate(driver.list_nodes), [])
+            self.assertEqual(paging.iterate(mock), [])
+            self.assertEqual(mock.call_count, 2)
+
+
+class TestPageJobs(ClickTestCase):
+    def test_page_jobs(self) -> None:
+        args = [
+            "--config-file", self.config.name, "--page-jobs", "2", "providers"
+        ]
+        with patch("cloudie.providers.compute_matrix") as mock:
+            mock.return_value = []
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(result.exit_code, 0)
+        self.assertEqual(paging.JOBS, 2)
+        paging.JOBS = 4
@@ -0,0 +1,120 @@
+import pathlib
+import tempfile
+from unittest.mock import patch
+
+from libcloud.compute.drivers.digitalocean import DigitalOcean_v2_NodeDriver
+from libcloud.compute.drivers.dummy import DummyNodeDriver
+from libcloud.compute.drivers.gce import GCENodeDriver
+from libcloud.dns.drivers.dummy import DummyDNSDriver
+
+from cloudie import cli, providers
+
+from .helpers import (
+    ClickTestCase, DigitalOceanDummyNodeDriver, ExtendedDummyNodeDriver,
+    TableMock
+)
+
+
+class TestCapabilities(ClickTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.home = patch("pathlib.Path.home")
+        self.home.start().return_value = pathlib.Path(self.tmpdir.name)
+        providers.CAPABILITIES.clear()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        providers.CAPABILITIES.clear()
+        self.home.stop()
+        self.tmpdir.cleanup()
+
+    def test_inspect(self) -> None:
+        caps = providers.capabilities(ExtendedDummyNodeDriver)
+        self.assertEqual(caps.params, ("creds", ))
+        self.assertEqual(caps.key_import, "import_key_pair_from_string")
+        self.assertEqual(caps.auth, ("password", "ssh_key"))
+
+        caps = providers.capabilities(DigitalOceanDummyNodeDriver)
+        self.assertEqual(caps.key_import, "create_key_pair")
+
+        caps = providers.capabilities(DummyDNSDriver)
+        self.assertEqual(caps.key_import, "")
+        self.assertEqual(caps.auth, ())
+        self.assertEqual(caps.getters, ())
+
+    def test_getters(self) -> None:
+        caps = providers.capabilities(DigitalOcean_v2_NodeDriver)
+        self.assertEqual(
+            caps.getters, (
+                ("list_images", "get_image"),
+                ("list_nodes", "ex_get_node_details"),
+            )
+        )
+
+        # GCE looks up images and nodes by name.
+        self.assertEqual(providers.capabilities(GCENodeDriver).getters, ())
+        self.assertEqual(providers.capabilities(DummyNodeDriver).getters, ())
+
+    def test_cached(self) -> None:
+        caps = providers.capabilities(DummyNodeDriver)
+
+        with patch("cloudie.providers._inspect") as mock:
+            self.assertEqual(providers.capabilities(DummyNodeDriver), caps)
+            providers.CAPABILITIES.clear()
+            self.assertEqual(providers.capabilities(DummyNodeDriver), caps)
+            self.assertEqual(mock.call_count, 0)
+
+    def test_libcloud_version(self) -> None:
+        providers.capabilities(DummyNodeDriver)
+        providers.CAPABILITIES.clear()
+
+        with patch("libcloud.__version__", "0.0.0"):
+            with patch("cloudie.providers._inspect") as mock:
+                mock.return_value = ((), "", (), ())
+                providers.capabilities(DummyNodeDriver)
+                self.assertEqual(mock.call_count, 1)
+
+    def test_invalid_cache(self) -> None:
+        path = pathlib.Path(self.tmpdir.name, ".cache", "cloudie")
+        path.mkdir(parents=True)
+        path.joinpath("capabilities").write_bytes(b"garbage")
+
+        caps = providers.capabilities(DummyNodeDriver)
+        self.assertEqual(caps.params, ("creds", ))
+
+    def test_write_failure(self) -> None:
+        with patch("os.replace") as mock:
+            mock.side_effect = PermissionError
+            caps = providers.capabilities(DummyNodeDriver)
+        self.assertEqual(caps.params, ("creds", ))
+
+    def test_not_a_class(self) -> None:
+        def driver(key: str) -> None:
+            pass
+
+        self.assertEqual(providers.capabilities(driver).params, ("key", ))
+        # pylint: disable=protected-access
+        self.assertFalse(providers.CAPABILITIES._load())
+
+    def test_providers(self) -> None:
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
+            args = ["--config-file", self.config.name, "providers"]
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(result.exit_code, 0)
+
+        rows = {row[0]: row for row in t.rows}
+        self.assertEqual(
+            t.headers,
+            ["Provider", "Key import", "Auth", "Parameters", "Lookups"],
+        )
+        self.assertTrue("digitalocean" in rows)
+        self.assertEqual(rows["dummy"][1], "import_key_pair_from_string")
+        self.assertEqual(rows["dummy"][3], "creds")
+
+    def test_import_error(self) -> None:
+        with patch("libcloud.compute.providers.get_driver") as mock:
+            mock.side_effect = ImportError
+            self.assertEqual(providers.compute_matrix(), [])
@@ -1,9 +1,16 @@
+import io
+import json
+import os
+import shutil
+from typing import Any, Iterator, List
 from unittest import TestCase
 from unittest.mock import patch
 
-from cloudie import table
+from texttable import Texttable
 
-from .helpers import TexttableMock
+from cloudie import cli, table
+
+from .helpers import ClickTestCase, TableMock
 
 
 class Obj:
@@ -22,11 +29,26 @@ class Obj:
     }
 
 
+def texttable(columns: List[List[str]], rows: List[Any]) -> str:
+    """
+    Draw a table with `texttable`, the way `table.show()` used to.
+    """
+    # pylint: disable=protected-access
+    t = Texttable(max_width=shutil.get_terminal_size().columns)
+    t.set_deco(t.VLINES | t.HEADER)
+    t.header([column[0] for column in columns])
+    t.set_cols_dtype(["t" for _ in range(len(columns))])
+    values = table._compile(columns)
+    t.add_rows([table._cells(values(row)) for row in rows], False)
+    return str(t.draw()) + "\n"
+    # pylint: enable=protected-access
+
+
 class TestTable(TestCase):
     def test_values(self) -> None:
-        t = TexttableMock()
-        with patch("texttable.Texttable") as mock:
-            mock.return_value = t
+        t = TableMock()
+        with patch("cloudie.table._draw") as mock:
+            mock.side_effect = t.draw
             table.show([
                 ["String1", "no_string", "string1"],
                 ["String2", "string2", "string1"],
@@ -57,15 +79,350 @@ class TestTable(TestCase):
             self.assertEqual(t.rows, rows)
 
 
-class TestGetValue(TestCase):
+class TestCompile(TestCase):
     def test_values(self) -> None:
+        columns = [
+            ["String1", "no_string", "string1"],
+            ["Empty", "does", "not", "exist"],
+            ["Missing", "dct.fourth.int", "string1.nope"],
+            ["Dict", "dct.second"],
+            ["Int", "dct.third.int"],
+            ["Fallback", "dct.first.nope", "lst"],
+            ["None"],
+        ]
+        rows = [Obj(), {"string1": "dict", "dct": Obj.dct}, None]
+
         # pylint: disable=protected-access
-        self.assertEqual(table._get_value(Obj, "string1"), "abcd")
-        self.assertEqual(table._get_value(Obj, "string2"), "xyz")
-        self.assertEqual(table._get_value(Obj, "lst"), ["aa", 123])
-        self.assertEqual(table._get_value(Obj, "dct.first"), ["aaa", "bbb"])
-        self.assertEqual(table._get_value(Obj, "dct.second"), {"list": ["x"]})
-        self.assertEqual(table._get_value(Obj, "dct.second.list"), ["x"])
-        self.assertEqual(table._get_value(Obj, "dct.third"), {"int": 321})
-        self.assertEqual(table._get_value(Obj, "dct.third.int"), 321)
+        values = table._compile(columns)
+        second = Obj.dct["second"]
+        self.assertEqual(
+            values(Obj()),
+            ["abcd", None, None, second, 321, ["aa", 123], None],
+        )
+        self.assertEqual(
+            values(rows[1]),
+            ["dict", None, None, second, 321, None, None],
+        )
+        self.assertEqual(values(rows[2]), [None] * len(columns))
         # pylint: enable=protected-access
+
+    def test_paths(self) -> None:
+        paths = [
+            ("string1", "abcd"),
+            ("string2", "xyz"),
+            ("lst", ["aa", 123]),
+            ("dct.first", ["aaa", "bbb"]),
+            ("dct.second", Obj.dct["second"]),
+            ("dct.second.list", ["x"]),
+            ("dct.third", Obj.dct["third"]),
+            ("dct.third.int", 321),
+        ]
+        for name, value in paths:
+            # pylint: disable=protected-access
+            values = table._compile([["Column", name]])
+            self.assertEqual(values(Obj), [value])
+
+
+class TestStream(TestCase):
+    COLUMNS = [
+        ["ID", "id"],
+        ["A long header", "name"],
+        ["Values", "values", "dct.first"],
+    ]
+
+    def setUp(self) -> None:
+        self.patches = [
+            patch.object(table, "STREAM", True),
+            patch("shutil.get_terminal_size"),
+            patch("sys.stdout", new_callable=io.StringIO),
+        ]  # type: List[Any]
+        _, size, self.stdout = [p.start() for p in self.patches]
+        size.return_value = os.terminal_size((40, 24))
+
+    def tearDown(self) -> None:
+        for p in self.patches:
+            p.stop()
+
+    def rows(self, count: int) -> List[dict]:
+        return [{
+            "id": str(i),
+            "name": "name " * i,
+            "values": [i] * (i % 3),
+            "dct": Obj.dct,
+        } for i in range(count)]
+
+    def texttable(self, rows: List[dict]) -> str:
+        return texttable(self.COLUMNS, list(rows))
+
+    def test_same_as_texttable(self) -> None:
+        for count in [0, 1, 12]:
+            for width in [20, 40, 200]:
+                with patch("shutil.get_terminal_size") as size:
+                    size.return_value = os.terminal_size((width, 24))
+                    self.stdout.seek(0)
+                    self.stdout.truncate()
+
+                    rows = self.rows(count)
+                    table.show(self.COLUMNS, iter(rows))
+                    self.assertEqual(
+                        self.stdout.getvalue(), self.texttable(rows)
+                    )
+
+    def test_newlines(self) -> None:
+        rows = [{"id": "a\n\nb", "name": "c"}]
+        table.show(self.COLUMNS, rows)
+        self.assertEqual(self.stdout.getvalue(), self.texttable(rows))
+
+    def test_incremental(self) -> None:
+        written = []  # type: List[bool]
+
+        def rows() -> Iterator[dict]:
+            for i, row in enumerate(self.rows(10)):
+                if i > 2:
+                    text = self.stdout.getvalue()
+                    written.append("\n{} ".format(i - 1) in text)
+                yield row
+
+        with patch.object(table, "SAMPLE", 2):
+            table.show(self.COLUMNS, rows())
+
+        self.assertEqual(written, [True] * 7)
+        self.assertTrue("\n9 " in self.stdout.getvalue())
+
+    def test_widths(self) -> None:
+        table.show(self.COLUMNS, self.rows(2), widths=[2, 4, 6])
+        self.assertEqual(
+            self.stdout.getvalue().splitlines(), [
+                "ID |  A   | Values",
+                "   | long |       ",
+                "   | head |       ",
+                "   |  er  |       ",
+                "===+======+=======",
+                "0  |      | aaa,  ",
+                "   |      | bbb   ",
+                "1  | name | 1     ",
+            ]
+        )
+
+    def test_too_narrow(self) -> None:
+        with patch("shutil.get_terminal_size") as size:
+            size.return_value = os.terminal_size((8, 24))
+            with self.assertRaises(ValueError):
+                table.show(self.COLUMNS, self.rows(1))
+
+
+class TestLayout(TestCase):
+    COLUMNS = [
+        ["ID", "id"],
+        ["A long header", "name"],
+        ["Text", "text"],
+    ]
+
+    TEXTS = [
+        "",
+        "   ",
+        "trailing ",
+        "  leading",
+        "a\tb\t\tc",
+        "\ttab",
+        "carriage\rreturn",
+        "\u6f22\u5b57 \u6f22\u5b57\u6f22\u5b57 \u6f22",
+        "e\u0301e\u0301 combining",
+        "a-hyphenated-word and some more words",
+        "averyveryveryverylongwordwithoutspaces",
+        "first\n\n  second line\nthird",
+    ]
+
+    def setUp(self) -> None:
+        self.patches = [
+            patch("shutil.get_terminal_size"),
+            patch("sys.stdout", new_callable=io.StringIO),
+        ]  # type: List[Any]
+        self.size, self.stdout = [p.start() for p in self.patches]
+        self.size.return_value = os.terminal_size((40, 24))
+
+    def tearDown(self) -> None:
+        for p in self.patches:
+            p.stop()
+
+    def rows(self) -> List[object]:
+        return [{
+            "id": str(i),
+            "name": "name " * i,
+            "text": text,
+        } for i, text in enumerate(self.TEXTS)]
+
+    def test_same_as_texttable(self) -> None:
+        for width in [20, 30, 40, 80, 200]:
+            self.size.return_value = os.terminal_size((width, 24))
+            self.stdout.seek(0)
+            self.stdout.truncate()
+
+            table.show(self.COLUMNS, self.rows())
+            self.assertEqual(
+                self.stdout.getvalue(), texttable(self.COLUMNS, self.rows())
+            )
+
+    def test_empty(self) -> None:
+        table.show(self.COLUMNS, [])
+        self.assertEqual(self.stdout.getvalue(), texttable(self.COLUMNS, []))
+
+    def test_chunks(self) -> None:
+        with patch.object(table, "CHUNK", 2):
+            with patch("sys.stdout") as stdout:
+                table.show(self.COLUMNS, self.rows()[:5])
+                self.assertEqual(stdout.write.call_count, 4)
+
+    def test_truncate(self) -> None:
+        self.size.return_value = os.terminal_size((30, 24))
+        rows = [{
+            "id": "1",
+            "name": "a much longer name",
+            "text": "a\tb",
+        },
+                {
+                    "id": "2",
+                    "name": "\u6f22\u5b57\u6f22\u5b57\u6f22\u5b57\u6f22\u5b57",
+                    "text": "one\ntwo words",
+                }]
+        with patch.object(table, "TRUNCATE", True):
+            table.show(self.COLUMNS, rows)
+        self.assertEqual(
+            self.stdout.getvalue().splitlines(), [
+                "ID | A long header |   Text   ",
+                "===+===============+==========",
+                "1  | a much longer | a       b",
+                "2  | \u6f22\u5b57\u6f22\u5b57\u6f22\u5b57  | one      ",
+                "   |               | two words",
+            ]
+        )
+
+
+class TestTruncateOption(ClickTestCase):
+    def test_truncate(self) -> None:
+        args = ["--config-file", self.config.name, "--truncate", "providers"]
+        with patch("cloudie.providers.compute_matrix") as mock:
+            mock.return_value = []
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(result.exit_code, 0)
+            self.assertTrue(table.TRUNCATE)
+
+        table.TRUNCATE = False
+
+
+class TestStreamOption(ClickTestCase):
+    def test_stream(self) -> None:
+        args = ["--config-file", self.config.name, "--stream", "providers"]
+        with patch("cloudie.providers.compute_matrix") as mock:
+            mock.return_value = []
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(result.exit_code, 0)
+            self.assertTrue(table.STREAM)
+            self.assertTrue(result.output.startswith("Provider |"))
+
+        table.STREAM = False
+
+
+class TestFormats(TestCase):
+    COLUMNS = [
+        ["ID", "id"],
+        ["Values", "lst"],
+        ["Int", "dct.third.int"],
+        ["Missing", "missing"],
+        ["Text", "text"],
+    ]
+
+    def setUp(self) -> None:
+        self.patches = [
+            patch("shutil.get_terminal_size"),
+            patch("sys.stdout", new_callable=io.StringIO),
+        ]  # type: List[Any]
+        self.size, self.stdout = [p.start() for p in self.patches]
+
+    def tearDown(self) -> None:
+        for p in self.patches:
+            p.stop()
+
+    def show(self, fmt: str) -> List[str]:
+        obj = Obj()
+        obj.text = "a,\tb"  # type: ignore
+        with patch.object(table, "FORMAT", fmt):
+            table.show(self.COLUMNS, [{"id": "1"}, obj])
+        self.assertEqual(self.size.call_count, 0)
+        return list(self.stdout.getvalue().splitlines())
+
+    def test_jsonl(self) -> None:
+        lines = self.show("jsonl")
+        self.assertEqual([json.loads(line) for line in lines], [
+            {
+                "ID": "1",
+                "Values": None,
+                "Int": None,
+                "Missing": None,
+                "Text": None,
+            },
+            {
+                "ID": None,
+                "Values": ["aa", 123],
+                "Int": 321,
+                "Missing": None,
+                "Text": "a,\tb",
+            },
+        ])
+
+    def test_unsupported_value(self) -> None:
+        with patch.object(table, "FORMAT", "jsonl"):
+            table.show([["Obj", "obj"]], [{"obj": Obj}])
+        self.assertEqual(json.loads(self.stdout.getvalue()), {"Obj": str(Obj)})
+
+    def test_csv(self) -> None:
+        self.assertEqual(
+            self.show("csv"), [
+                "ID,Values,Int,Missing,Text",
+                "1,,,,",
+                ',"aa, 123",321,,"a,\tb"',
+            ]
+        )
+
+    def test_tsv(self) -> None:
+        self.assertEqual(
+            self.show("tsv"), [
+                "ID\tValues\tInt\tMissing\tText",
+                "1\t\t\t\t",
+                '\taa, 123\t321\t\t"a,\tb"',
+            ]
+        )
+
+    def test_incremental(self) -> None:
+        def rows() -> Iterator[dict]:
+            for i in range(3):
+                yield {"id": str(i)}
+                self.assertEqual(
+                    len(self.stdout.getvalue().splitlines()), i + 1
+                )
+
+        with patch.object(table, "FORMAT", "jsonl"):
+            table.show([["ID", "id"]], rows())
+
+
+class TestOutputOption(ClickTestCase):
+    def test_output(self) -> None:
+        args = [
+            "--config-file", self.config.name, "--output", "csv", "providers"
+        ]
+        with patch("cloudie.providers.compute_matrix") as mock:
+            mock.return_value = []
+            result = self.runner.invoke(cli.cli, args)
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(
+                result.output,
+                "Provider,Key import,Auth,Parameters,Lookups\n",
+            )
+
+        table.FORMAT = "table"
+
+    def test_invalid(self) -> None:
+        args = ["--config-file", self.config.name, "--output", "x"]
+        result = self.runner.invoke(cli.cli, args)
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertEqual(table.FORMAT, "table")
@@ -3,6 +3,8 @@ import tempfile
 from unittest import TestCase
 
 import click
+from libcloud.compute.drivers.digitalocean import DigitalOceanNodeDriver
+from libcloud.compute.drivers.dummy import DummyNodeDriver
 
 from cloudie import utils
 
@@ -79,3 +81,42 @@ class TestSha256(TestCase):
             "042f01ade2c5988edbe230efc3f48fdcdbbe493931de8cae8bd02156802b77cd"
         )
         self.assertEqual(pos, f.tell())
+
+    def test_chunked(self) -> None:
+        f = io.StringIO("abc\nxyz\u00e5" * 100)
+        self.assertEqual(utils.sha256(f, 7), utils.sha256(f))
+        self.assertEqual(f.tell(), 0)
+
+
+class TestCopyDriver(TestCase):
+    def test_copy(self) -> None:
+        for driver in [DummyNodeDriver(0), DigitalOceanNodeDriver("token")]:
+            driver.connection.connection = object()
+
+            copied = utils.copy_driver(driver)
+            self.assertIs(type(copied), type(driver))
+            self.assertIsNot(copied, driver)
+            self.assertEqual(sorted(vars(copied)), sorted(vars(driver)))
+
+            # The HTTP connection is established again by the copy.
+            self.assertIsNot(copied.connection, driver.connection)
+            self.assertIsNone(copied.connection.connection)
+            self.assertIsNotNone(driver.connection.connection)
+
+
+class TestCounters(TestCase):
+    def test_timed(self) -> None:
+        counters = utils.Counters()
+        for _ in range(2):
+            with counters.timed("a"):
+                pass
+        with self.assertRaises(ValueError):
+            with counters.timed("b"):
+                raise ValueError
+
+        self.assertEqual(dict(counters.calls), {"a": 2, "b": 1})
+        self.assertEqual(sorted(counters.time), ["a", "b"])
+
+        counters.clear()
+        self.assertEqual(dict(counters.calls), {})
+        self.assertEqual(dict(counters.time), {})
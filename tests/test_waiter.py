@@ -0,0 +1,168 @@
+import pathlib
+import tempfile
+from typing import Any, List
+from unittest import TestCase
+from unittest.mock import patch
+
+from libcloud.compute.base import Node
+from libcloud.compute.drivers.dummy import DummyNodeDriver
+from libcloud.compute.types import NodeState
+
+from cloudie import waiter
+
+
+class PollingDriver(DummyNodeDriver):  # type: ignore
+    """
+    Nodes become running after `polls` polls for each of them.
+    """
+
+    # pylint: disable=abstract-method
+    def __init__(self, polls: int, count: int) -> None:
+        super().__init__(0)
+        self.polls = polls
+        self.listings = 0
+        self.nl = [
+            self.node(str(i), NodeState.PENDING) for i in range(1, count + 1)
+        ]
+        self.seen = {node.id: 0 for node in self.nl}
+
+    def node(self, id_: str, state: str) -> Node:
+        ips = ["127.0.0.1"] if state == NodeState.RUNNING else []
+        return Node(id_, "node-" + id_, state, ips, [], self)
+
+    def poll(self, id_: str) -> Node:
+        self.seen[id_] += 1
+        if self.seen[id_] >= self.polls:
+            return self.node(id_, NodeState.RUNNING)
+        return self.node(id_, NodeState.PENDING)
+
+    def list_nodes(self) -> List[Node]:
+        self.listings += 1
+        return [self.poll(node.id) for node in self.nl]
+
+    # pylint: enable=abstract-method
+
+
+class GetterDriver(PollingDriver):
+    # pylint: disable=abstract-method
+    def ex_get_node(self, node_id: str) -> Node:
+        if node_id == "3":
+            raise ValueError(node_id)
+        if node_id == "4":
+            return self.node("1", NodeState.RUNNING)
+        return self.poll(node_id)
+
+    # pylint: enable=abstract-method
+
+
+class TestWaitUntilRunning(TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.sleeps = []  # type: List[float]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch("time.monotonic"),
+            patch("time.sleep"),
+            patch("pathlib.Path.home"),
+        ]
+        monotonic, sleep, home = [p.start() for p in self.patches]
+        monotonic.side_effect = lambda: self.now
+        sleep.side_effect = self.sleep
+        home.return_value = pathlib.Path(self.tmpdir.name)
+
+    def tearDown(self) -> None:
+        for p in self.patches:
+            p.stop()
+        self.tmpdir.cleanup()
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def test_running(self) -> None:
+        driver = DummyNodeDriver(0)
+        nodes = waiter.wait_until_running(driver, driver.list_nodes())
+        self.assertEqual([n.id for n in nodes], ["1", "2"])
+        self.assertEqual(self.sleeps, [])
+
+    def test_backoff(self) -> None:
+        driver = PollingDriver(8, 1)
+        waiter.wait_until_running(driver, driver.nl)
+        self.assertEqual(self.sleeps[:4], [0, 1.0, 1.5, 2.25])
+        self.assertEqual(len(self.sleeps), 8)
+
+        with patch.object(waiter, "MAXIMUM", 2):
+            self.sleeps.clear()
+            driver = PollingDriver(8, 1)
+            waiter.wait_until_running(driver, driver.nl)
+            self.assertEqual(max(self.sleeps), 2)
+
+    def test_callback(self) -> None:
+        transitions = []  # type: List[Any]
+
+        def callback(node: Node, previous: str) -> None:
+            transitions.append((node.id, previous, node.state))
+
+        driver = PollingDriver(3, 4)
+        nodes = waiter.wait_until_running(driver, driver.nl, callback=callback)
+
+        self.assertEqual([n.state for n in nodes], [NodeState.RUNNING] * 4)
+        self.assertEqual(
+            sorted(transitions),
+            [(str(i), NodeState.PENDING, NodeState.RUNNING)
+             for i in range(1, 5)],
+        )
+
+    def test_shared_listing(self) -> None:
+        driver = PollingDriver(3, 10)
+        waiter.wait_until_running(driver, driver.nl)
+        self.assertEqual(driver.listings, 3)
+
+    def test_early_termination(self) -> None:
+        driver = PollingDriver(1, 10)
+        listed = []
+
+        def list_nodes() -> Any:
+            for node in driver.nl:
+                listed.append(node.id)
+                yield driver.poll(node.id)
+
+        with patch.object(driver, "list_nodes", list_nodes):
+            waiter.wait_until_running(driver, driver.nl[:2])
+        self.assertEqual(listed, ["1", "2"])
+
+    def test_missing(self) -> None:
+        driver = PollingDriver(1, 10)
+        nodes = driver.nl[8:] + [driver.node("11", NodeState.PENDING)]
+        with self.assertRaises(waiter.WaitTimeout) as ctx:
+            waiter.wait_until_running(driver, nodes, timeout=5)
+        self.assertTrue(str(ctx.exception).endswith("waiting for node-11"))
+
+    def test_getter(self) -> None:
+        driver = GetterDriver(2, 2)
+        with patch.object(driver, "list_nodes") as mock:
+            waiter.wait_until_running(driver, driver.nl)
+            self.assertEqual(mock.call_count, 0)
+        self.assertEqual(driver.seen, {"1": 2, "2": 2})
+
+        # Nodes are listed while there are too many of them.
+        driver = GetterDriver(2, 5)
+        waiter.wait_until_running(driver, driver.nl)
+        self.assertEqual(driver.listings, 2)
+
+    def test_getter_failure(self) -> None:
+        driver = GetterDriver(1, 4)
+        with self.assertRaises(waiter.WaitTimeout):
+            waiter.wait_until_running(driver, driver.nl[2:], timeout=5)
+
+    def test_timeout(self) -> None:
+        driver = PollingDriver(100, 2)
+        with self.assertRaises(waiter.WaitTimeout) as ctx:
+            waiter.wait_until_running(driver, driver.nl, timeout=10)
+
+        self.assertEqual(
+            str(ctx.exception),
+            "timed out after 10 seconds waiting for node-1, node-2",
+        )
+        self.assertEqual([n.id for n in ctx.exception.nodes], ["1", "2"])
+        self.assertEqual(self.now, 10)